@@ -0,0 +1,213 @@
+import numpy as np
+from datetime import datetime, timedelta, tzinfo
+from match import Match
+from timezones import get_timezone
+from typing import List, Optional, Sequence
+
+# Bucket sizes accepted by aggregate()
+BUCKETS = ("hour", "day", "week")
+
+# Report windows in days
+WINDOWS = {"day": 1, "week": 7, "month": 30, "season": 91}
+
+# Bucket size the charts of each window are drawn in
+WINDOW_BUCKETS = {"day": "hour", "week": "day", "month": "day", "season": "week"}
+
+def window_range(window: str, end: float) -> tuple:
+    """
+    Return the (start, end) epoch seconds of the window ending at end
+
+    Args:
+        window: one of WINDOWS
+        end: end of the window in epoch seconds
+
+    Return:
+        (start, end) in epoch seconds
+    """
+    return (end - WINDOWS[window] * 24 * 60 * 60, end)
+
+
+def bucket_edges(start: float, end: float, bucket: str, tz: Optional[tzinfo]) -> np.ndarray:
+    """
+    Return the epoch second edges of the buckets covering [start, end).
+    Buckets start on the hour, at midnight, or at Monday midnight in tz, so they follow daylight saving changes.
+
+    Args:
+        start: start of the range in epoch seconds
+        end: end of the range in epoch seconds
+        bucket: one of BUCKETS
+        tz: timezone the buckets are aligned to, None for local time
+
+    Return:
+        An int64 array of len(buckets) + 1 edges
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(
+            f"Unknown bucket '{bucket}', expected one of {', '.join(BUCKETS)}")
+
+    first = datetime.fromtimestamp(start, tz)
+    if bucket == "hour":
+        first = first.replace(minute=0, second=0, microsecond=0)
+        step = timedelta(hours=1)
+    else:
+        first = first.replace(hour=0, minute=0, second=0, microsecond=0)
+        step = timedelta(days=1)
+        if bucket == "week":
+            first -= timedelta(days=first.weekday())
+            step = timedelta(weeks=1)
+
+    edges = []
+    # Step in wall-clock time, then convert, so a 23 or 25 hour day stays one day
+    local = first.replace(tzinfo=None)
+    while True:
+        edge = int(local.replace(tzinfo=tz).timestamp())
+        edges.append(edge)
+        if edge >= end:
+            break
+        local += step
+
+    return np.array(edges, dtype=np.int64)
+
+
+class MatchArrays():
+    """
+    Match start times and durations stored as NumPy arrays for aggregation
+
+    === Instance Attributes ===
+    start_times: Match start times in epoch seconds
+    durations: Match durations in seconds
+    """
+    start_times: np.ndarray
+    durations: np.ndarray
+
+    def __init__(self, start_times: Sequence[int], durations: Sequence[int]) -> None:
+        """
+        Initialize a MatchArrays object
+
+        Args:
+            start_times: Match start times in epoch seconds
+            durations: Match durations in seconds
+
+        Return:
+            None
+        """
+        self.start_times = np.asarray(start_times, dtype=np.int64)
+        self.durations = np.asarray(durations, dtype=np.int64)
+
+    @classmethod
+    def from_matches(cls, matches: List[Match]) -> "MatchArrays":
+        """
+        Return the arrays of matches
+
+        Args:
+            matches: a list of matches
+
+        Return:
+            A MatchArrays object
+        """
+        return cls([int(match.start_time.timestamp()) for match in matches],
+                   [int(match.duration.total_seconds()) for match in matches])
+
+    def __len__(self) -> int:
+        """
+        Return the number of matches
+
+        Args:
+            None
+
+        Return:
+            The number of matches
+        """
+        return len(self.start_times)
+
+
+class Buckets():
+    """
+    Matches aggregated into time buckets
+
+    === Instance Attributes ===
+    edges: Bucket edges in epoch seconds, one more than the number of buckets
+    tz: Timezone the buckets are aligned to, None for local time
+    indices: Bucket of every match, -1 for matches outside the range
+    counts: Number of matches per bucket
+    total_seconds: Total time played per bucket in seconds
+    """
+    edges: np.ndarray
+    tz: Optional[tzinfo]
+    indices: np.ndarray
+    counts: np.ndarray
+    total_seconds: np.ndarray
+
+    def __init__(self, edges: np.ndarray, tz: Optional[tzinfo], indices: np.ndarray, counts: np.ndarray, total_seconds: np.ndarray) -> None:
+        """
+        Initialize a Buckets object
+
+        Args:
+            edges: Bucket edges in epoch seconds
+            tz: Timezone the buckets are aligned to
+            indices: Bucket of every match, -1 for matches outside the range
+            counts: Number of matches per bucket
+            total_seconds: Total time played per bucket in seconds
+
+        Return:
+            None
+        """
+        self.edges = edges
+        self.tz = tz
+        self.indices = indices
+        self.counts = counts
+        self.total_seconds = total_seconds
+
+    def labels(self, fmt: str) -> List[str]:
+        """
+        Return the start of every bucket formatted with fmt in the buckets' timezone
+
+        Args:
+            fmt: strftime format
+
+        Return:
+            A list of bucket labels
+        """
+        return [datetime.fromtimestamp(int(edge), self.tz).strftime(fmt) for edge in self.edges[:-1]]
+
+    def __len__(self) -> int:
+        """
+        Return the number of buckets
+
+        Args:
+            None
+
+        Return:
+            The number of buckets
+        """
+        return len(self.counts)
+
+
+def aggregate(matches: MatchArrays, start: float, end: float, bucket: str = "day", tz: Optional[tzinfo] = None) -> Buckets:
+    """
+    Return the number of matches and time played per bucket between start and end
+
+    Args:
+        matches: match start times and durations
+        start: start of the range in epoch seconds
+        end: end of the range in epoch seconds
+        bucket: one of BUCKETS
+        tz: timezone the buckets are aligned to, REPORT_TIMEZONE or local time by default
+
+    Return:
+        The aggregated buckets
+    """
+    if tz is None:
+        tz = get_timezone()
+    edges = bucket_edges(start, end, bucket, tz)
+    number_of_buckets = len(edges) - 1
+
+    indices = np.searchsorted(edges, matches.start_times, side="right") - 1
+    inside = (indices >= 0) & (indices < number_of_buckets)
+    indices = np.where(inside, indices, -1)
+
+    counts = np.bincount(indices[inside], minlength=number_of_buckets)
+    total_seconds = np.bincount(indices[inside], weights=matches.durations[inside],
+                                minlength=number_of_buckets).astype(np.int64)
+
+    return Buckets(edges, tz, indices, counts, total_seconds)
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from aggregation import MatchArrays, aggregate, bucket_edges, window_range
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+toronto = ZoneInfo("America/Toronto")
+
+
+def epoch(*args, tz=toronto) -> int:
+    return int(datetime(*args, tzinfo=tz).timestamp())
+
+
+def test_day_buckets_follow_daylight_saving():
+    """
+    Test day buckets start at local midnight across the spring daylight saving change.
+    """
+    edges = bucket_edges(epoch(2023, 3, 11, 15), epoch(2023, 3, 13, 9), "day", toronto)
+
+    assert edges.tolist() == [epoch(2023, 3, 11), epoch(2023, 3, 12),
+                              epoch(2023, 3, 13), epoch(2023, 3, 14)]
+    assert edges[2] - edges[1] == 23 * 60 * 60
+
+
+def test_aggregate_counts_and_durations():
+    """
+    Test aggregate() counts matches and sums durations per day, and ignores matches outside the range.
+    """
+    matches = MatchArrays([epoch(2023, 4, 3, 23, 7), epoch(2023, 4, 3, 20), epoch(2023, 4, 5, 1), epoch(2023, 5, 1)],
+                          [1042, 1800, 600, 900])
+    buckets = aggregate(matches, epoch(2023, 4, 3, 12), epoch(2023, 4, 6), "day", toronto)
+
+    assert buckets.counts.tolist() == [2, 0, 1]
+    assert buckets.total_seconds.tolist() == [2842, 0, 600]
+    assert buckets.indices.tolist() == [0, 0, 2, -1]
+    assert buckets.labels("%m-%d") == ["04-03", "04-04", "04-05"]
+
+
+def test_aggregate_week_buckets_over_a_season():
+    """
+    Test week buckets start on Monday and cover a season of matches.
+    """
+    start, end = window_range("season", epoch(2023, 6, 30))
+    rng = np.random.default_rng(0)
+    matches = MatchArrays(rng.integers(start, end, 10000), rng.integers(900, 2400, 10000))
+    buckets = aggregate(matches, start, end, "week", toronto)
+
+    assert all(datetime.fromtimestamp(int(edge), toronto).weekday() == 0 for edge in buckets.edges)
+    assert buckets.counts.sum() == 10000
+    assert buckets.total_seconds.sum() == matches.durations.sum()
+
+
+def test_unknown_bucket():
+    """
+    Test bucket_edges() rejects unknown bucket sizes.
+    """
+    with pytest.raises(ValueError):
+        bucket_edges(0, 10, "minute", toronto)
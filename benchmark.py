@@ -0,0 +1,267 @@
+import argparse
+import asyncio
+import contextlib
+import math
+import time
+import rate_limiter
+import regions
+import responses
+import riot_requests
+import riot_requests_async
+import riot_session
+import singletons
+from mock_riot_server import MockRiotServer
+from typing import Iterator, List, Sequence
+from unittest.mock import patch
+
+# Commands benchmarked by default, each a coroutine function of responses
+COMMANDS = ("past", "weekly_report", "active")
+
+
+def percentile(samples: Sequence[float], q: float) -> float:
+    """
+    Return the q-th percentile of samples by the nearest rank method
+
+    Args:
+        samples: the samples
+        q: percentile between 0 and 100
+
+    Return:
+        The percentile, 0 if there are no samples
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(math.ceil(q / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class BenchmarkResult():
+    """
+    Latencies of one command run by concurrent callers
+
+    === Instance Attributes ===
+    command: Name of the command in responses
+    callers: Number of concurrent callers
+    latencies: Seconds every call took, failed calls included
+    errors: Number of calls that raised
+    elapsed: Wall clock seconds of the whole run
+    """
+    command: str
+    callers: int
+    latencies: List[float]
+    errors: int
+    elapsed: float
+
+    def __init__(self, command: str, callers: int, latencies: List[float], errors: int, elapsed: float) -> None:
+        """
+        Initialize a BenchmarkResult object
+
+        Args:
+            command: Name of the command in responses
+            callers: Number of concurrent callers
+            latencies: Seconds every call took
+            errors: Number of calls that raised
+            elapsed: Wall clock seconds of the whole run
+
+        Return:
+            None
+        """
+        self.command = command
+        self.callers = callers
+        self.latencies = latencies
+        self.errors = errors
+        self.elapsed = elapsed
+
+    @property
+    def throughput(self) -> float:
+        """
+        Return the calls completed per second
+
+        Args:
+            None
+
+        Return:
+            The calls per second
+        """
+        return len(self.latencies) / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def p50(self) -> float:
+        """
+        Return the median latency in seconds
+
+        Args:
+            None
+
+        Return:
+            The median latency
+        """
+        return percentile(self.latencies, 50)
+
+    @property
+    def p99(self) -> float:
+        """
+        Return the 99th percentile latency in seconds
+
+        Args:
+            None
+
+        Return:
+            The 99th percentile latency
+        """
+        return percentile(self.latencies, 99)
+
+    def __str__(self) -> str:
+        """
+        Return a row of the benchmark table
+
+        Args:
+            None
+
+        Return:
+            The command's calls, errors, throughput, p50 and p99
+        """
+        return (f"{self.command:<15}{len(self.latencies):>7}{self.errors:>8}"
+                f"{self.throughput:>13.1f}{self.p50 * 1000:>10.1f}{self.p99 * 1000:>10.1f}")
+
+
+@contextlib.contextmanager
+def pointed_at(url: str) -> Iterator[None]:
+    """
+    Point both Riot clients at url and give them fresh caches and rate limits
+
+    Args:
+        url: base URL of the stand-in server
+
+    Return:
+        A context manager restoring the clients on exit
+    """
+    with contextlib.ExitStack() as stack:
+        for urls in (regions.platform_urls, regions.cluster_urls):
+            stack.enter_context(patch.dict(urls, dict.fromkeys(urls, url)))
+        stack.enter_context(singletons.isolated())
+        limiter = rate_limiter.RateLimiter()
+        for module in (riot_requests, riot_requests_async):
+            stack.enter_context(patch.object(module, "limiter", limiter))
+        yield
+
+
+async def run_command(command: str, callers: int, calls_per_caller: int, summoners: int) -> BenchmarkResult:
+    """
+    Run command from callers concurrent callers, each calling it calls_per_caller times in a row.
+    Callers cycle through summoners names, so later calls find warm caches.
+
+    Args:
+        command: name of a coroutine function of responses
+        callers: number of concurrent callers
+        calls_per_caller: calls each caller makes
+        summoners: number of distinct summoner names
+
+    Return:
+        The benchmark result
+    """
+    func = getattr(responses, command)
+    latencies = []
+    errors = 0
+
+    async def caller(number: int) -> None:
+        nonlocal errors
+        for call in range(calls_per_caller):
+            summoner_name = f"Summoner {(number * calls_per_caller + call) % summoners}"
+            start = time.perf_counter()
+            try:
+                await func(summoner_name)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(caller(number) for number in range(callers)))
+    finally:
+        await riot_session.close()
+
+    return BenchmarkResult(command, callers, latencies, errors, time.perf_counter() - start)
+
+
+def run_benchmark(commands: Sequence[str] = COMMANDS, callers: int = 10, calls_per_caller: int = 5,
+                  summoners: int = 20, server: MockRiotServer = None) -> List[BenchmarkResult]:
+    """
+    Run every command against the stand-in server, each starting from empty caches
+
+    Args:
+        commands: names of coroutine functions of responses
+        callers: number of concurrent callers
+        calls_per_caller: calls each caller makes
+        summoners: number of distinct summoner names
+        server: stand-in server to use, a default MockRiotServer if None
+
+    Return:
+        One result per command
+    """
+    if server is None:
+        server = MockRiotServer()
+
+    results = []
+    with server, pointed_at(server.url):
+        for command in commands:
+            # Every benchmark starts cold
+            singletons.reset()
+            results.append(asyncio.run(run_command(
+                command, callers, calls_per_caller, summoners)))
+    return results
+
+
+def main(argv: Sequence[str] = None) -> None:
+    """
+    Run the benchmark from the command line and print its table
+
+    Args:
+        argv: command line arguments, sys.argv by default
+
+    Return:
+        None
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark responses against a local mock Riot API server")
+    parser.add_argument("--commands", nargs="+",
+                        choices=COMMANDS, default=list(COMMANDS))
+    parser.add_argument("--callers", type=int, default=10,
+                        help="concurrent callers")
+    parser.add_argument("--calls", type=int, default=5,
+                        help="calls per caller")
+    parser.add_argument("--summoners", type=int, default=20,
+                        help="distinct summoner names")
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="seconds every response is delayed")
+    parser.add_argument("--jitter", type=float, default=0.01,
+                        help="extra random delay in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0,
+                        help="fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=0.0,
+                        help="Retry-After of the 429 responses")
+    parser.add_argument("--in-game-rate", type=float, default=0.5,
+                        help="fraction of summoners in game")
+    parser.add_argument("--matches", type=int, default=20,
+                        help="matches every summoner played last week")
+    args = parser.parse_args(argv)
+
+    server = MockRiotServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                            rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after,
+                            in_game_rate=args.in_game_rate, matches_per_summoner=args.matches)
+    results = run_benchmark(args.commands, args.callers,
+                            args.calls, args.summoners, server)
+
+    print(f"{'command':<15}{'calls':>7}{'errors':>8}{'calls/s':>13}{'p50 ms':>10}{'p99 ms':>10}")
+    for result in results:
+        print(result)
+    print("\nRequests served:")
+    for (endpoint, status), count in sorted(server.requests.items()):
+        print(f"  {endpoint:<28}{status:>5}{count:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+from benchmark import percentile, run_benchmark
+from mock_riot_server import MockRiotServer
+
+
+def test_percentile():
+    """
+    Test percentiles use the nearest rank.
+    """
+    samples = list(range(1, 101))
+
+    assert percentile(samples, 50) == 50
+    assert percentile(samples, 99) == 99
+    assert percentile([3.0], 99) == 3.0
+    assert percentile([], 50) == 0.0
+
+
+def test_run_benchmark():
+    """
+    Test every command is timed once per call against the stand-in server.
+    """
+    server = MockRiotServer(in_game_rate=0.0, matches_per_summoner=5)
+
+    results = run_benchmark(("past", "weekly_report", "active"),
+                            callers=3, calls_per_caller=2, summoners=4, server=server)
+
+    assert [result.command for result in results] == [
+        "past", "weekly_report", "active"]
+    for result in results:
+        assert len(result.latencies) == 6
+        assert result.errors == 0
+        assert result.throughput > 0
+        assert result.p50 <= result.p99
+    assert server.requests[("summoner-v4.by-name", 200)] == 3 * 4
@@ -0,0 +1,210 @@
+import metrics
+import os
+import random
+import threading
+import time
+from typing import Dict, Hashable, Set
+
+# Number of times a call is sent again after a server error or timeout
+riot_max_retries = int(os.getenv('RIOT_MAX_RETRIES', '2'))
+
+# Backoff between those retries in seconds, doubled per attempt and capped
+riot_retry_base_delay = float(os.getenv('RIOT_RETRY_BASE_DELAY', '0.5'))
+riot_retry_max_delay = float(os.getenv('RIOT_RETRY_MAX_DELAY', '8'))
+
+# Consecutive failures that open an endpoint's circuit and seconds it stays open
+breaker_failure_threshold = int(os.getenv('RIOT_BREAKER_FAILURES', '5'))
+breaker_reset_timeout = float(os.getenv('RIOT_BREAKER_RESET_TIMEOUT', '30'))
+
+# Statuses of a Riot server failing, worth retrying and counted by the breaker
+server_error_statuses = frozenset({500, 502, 503, 504})
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def backoff_delay(attempt: int, base: float = None, cap: float = None) -> float:
+    """
+    Return a random delay before retry number attempt + 1, with full jitter so
+    calls that failed together do not retry together
+
+    Args:
+        attempt: number of the attempt that failed, from 0
+        base: delay of the first retry before jitter, riot_retry_base_delay by default
+        cap: largest delay before jitter, riot_retry_max_delay by default
+
+    Return:
+        The delay in seconds
+    """
+    base = riot_retry_base_delay if base is None else base
+    cap = riot_retry_max_delay if cap is None else cap
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker():
+    """
+    Circuit breaker per endpoint. After failure_threshold consecutive failures an endpoint's
+    circuit opens and calls to it fail fast for reset_timeout seconds instead of waiting on timeouts.
+    Once reset_timeout has passed a single probe call is let through: its success closes the
+    circuit and its failure opens it again.
+
+    === Instance Attributes ===
+    failure_threshold: Consecutive failures that open a circuit
+    reset_timeout: Seconds a circuit stays open before a probe is let through
+    """
+    failure_threshold: int
+    reset_timeout: float
+
+    def __init__(self, failure_threshold: int = breaker_failure_threshold,
+                 reset_timeout: float = breaker_reset_timeout) -> None:
+        """
+        Initialize a CircuitBreaker object with every circuit closed
+
+        Args:
+            failure_threshold: Consecutive failures that open a circuit
+            reset_timeout: Seconds a circuit stays open before a probe is let through
+
+        Return:
+            None
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures: Dict[Hashable, int] = {}
+        self._opened_at: Dict[Hashable, float] = {}
+        self._probing: Set[Hashable] = set()
+        self._lock = threading.Lock()
+
+    def state(self, endpoint: Hashable) -> str:
+        """
+        Return the state of endpoint's circuit
+
+        Args:
+            endpoint: endpoint key, e.g. (host, method)
+
+        Return:
+            CLOSED, OPEN or HALF_OPEN
+        """
+        with self._lock:
+            return self._state(endpoint)
+
+    def _state(self, endpoint: Hashable) -> str:
+        """
+        Return the state of endpoint's circuit, the caller holds the lock
+
+        Args:
+            endpoint: endpoint key
+
+        Return:
+            CLOSED, OPEN or HALF_OPEN
+        """
+        opened_at = self._opened_at.get(endpoint)
+        if opened_at is None:
+            return CLOSED
+        if time.monotonic() - opened_at < self.reset_timeout:
+            return OPEN
+        return HALF_OPEN
+
+    def allow(self, endpoint: Hashable) -> bool:
+        """
+        Return whether a call to endpoint may be sent now.
+        A half open circuit lets one probe through at a time.
+
+        Args:
+            endpoint: endpoint key
+
+        Return:
+            True if the call may be sent
+        """
+        with self._lock:
+            state = self._state(endpoint)
+            if state == CLOSED:
+                return True
+            if state == OPEN or endpoint in self._probing:
+                return False
+            self._probing.add(endpoint)
+            return True
+
+    def record_success(self, endpoint: Hashable) -> None:
+        """
+        Record a call to endpoint that got an answer, closing its circuit
+
+        Args:
+            endpoint: endpoint key
+
+        Return:
+            None
+        """
+        with self._lock:
+            self._failures.pop(endpoint, None)
+            self._probing.discard(endpoint)
+            if self._opened_at.pop(endpoint, None) is not None:
+                _record_transition(endpoint, CLOSED)
+
+    def record_failure(self, endpoint: Hashable) -> None:
+        """
+        Record a call to endpoint that failed, opening its circuit after failure_threshold
+        consecutive failures or when a probe fails
+
+        Args:
+            endpoint: endpoint key
+
+        Return:
+            None
+        """
+        with self._lock:
+            failures = self._failures.get(endpoint, 0) + 1
+            self._failures[endpoint] = failures
+            probe = endpoint in self._probing
+            self._probing.discard(endpoint)
+            if probe or (endpoint not in self._opened_at and failures >= self.failure_threshold):
+                self._opened_at[endpoint] = time.monotonic()
+                _record_transition(endpoint, OPEN)
+
+    def release(self, endpoint: Hashable) -> None:
+        """
+        Give back the probe slot of a call to endpoint that ended without an answer or a
+        failure, e.g. one that was cancelled, so the next call can probe instead
+
+        Args:
+            endpoint: endpoint key
+
+        Return:
+            None
+        """
+        with self._lock:
+            self._probing.discard(endpoint)
+
+    def reset(self) -> None:
+        """
+        Close every circuit
+
+        Args:
+            None
+
+        Return:
+            None
+        """
+        with self._lock:
+            self._failures.clear()
+            self._opened_at.clear()
+            self._probing.clear()
+
+
+def _record_transition(endpoint: Hashable, state: str) -> None:
+    """
+    Count a circuit opening or closing
+
+    Args:
+        endpoint: endpoint key, a (host, method) pair for the Riot clients
+        state: the new state
+
+    Return:
+        None
+    """
+    method = endpoint[-1] if isinstance(endpoint, tuple) else str(endpoint)
+    metrics.circuit_breaker_transitions_total.inc(method=method, state=state)
+
+
+# Shared breaker used by riot_requests and riot_requests_async, keyed by (host, method)
+breaker = CircuitBreaker()
@@ -0,0 +1,163 @@
+import asyncio
+import circuit_breaker
+import json
+import match_history
+import pytest
+import responses
+import riot_requests_async
+from circuit_breaker import CircuitBreaker, backoff_delay
+from exceptions import RiotUnavailable
+from riot_requests import parse_past_match
+from summoner import Summoner
+from unittest.mock import patch
+
+kid_orpheus = Summoner("Kid Orpheus", "ii9IPVp8k7MZ33wazChECinTlHDRzgkMMF5VCY-sFRjcnOg",
+                       "pfB-gQaB5s62NVK_YTWT7w6Y1NKIjpdzB38-8rFS2cssK-P6i5lFqqT2iVZHZ_rKmGceVc72TTU9Gw")
+
+
+@pytest.fixture
+def no_backoff():
+    """
+    Retry at once instead of sleeping between attempts.
+    """
+    with patch("riot_requests_async.backoff_delay", return_value=0):
+        yield
+
+
+def test_backoff_delay_is_jittered_and_capped():
+    """
+    Test every delay falls between 0 and the doubled base delay, capped.
+    """
+    for attempt in range(10):
+        delay = backoff_delay(attempt, base=0.5, cap=4)
+        assert 0 <= delay <= min(4, 0.5 * 2 ** attempt)
+
+
+def test_circuit_opens_after_failures_and_probes_after_reset_timeout():
+    """
+    Test a circuit opens after failure_threshold failures, lets one probe through once
+    reset_timeout has passed, and closes when the probe succeeds.
+    """
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    endpoint = ("https://na1.api.riotgames.com", "spectator-v4.by-summoner")
+
+    with patch("time.monotonic", return_value=100.0):
+        breaker.record_failure(endpoint)
+        assert breaker.allow(endpoint)
+        breaker.record_failure(endpoint)
+        assert breaker.state(endpoint) == circuit_breaker.OPEN
+        assert not breaker.allow(endpoint)
+        # Other endpoints are not affected
+        assert breaker.allow(("https://na1.api.riotgames.com", "summoner-v4.by-name"))
+
+    with patch("time.monotonic", return_value=131.0):
+        assert breaker.allow(endpoint)
+        assert not breaker.allow(endpoint)
+        breaker.record_success(endpoint)
+        assert breaker.state(endpoint) == circuit_breaker.CLOSED
+        assert breaker.allow(endpoint)
+
+
+def test_failed_probe_reopens_circuit():
+    """
+    Test a failed probe opens the circuit for another reset_timeout.
+    """
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+
+    with patch("time.monotonic", return_value=100.0):
+        breaker.record_failure("endpoint")
+    with patch("time.monotonic", return_value=131.0):
+        assert breaker.allow("endpoint")
+        breaker.record_failure("endpoint")
+        assert not breaker.allow("endpoint")
+
+
+def test_server_errors_are_retried(no_backoff):
+    """
+    Test 503 and timeouts are sent again and the first good answer is returned.
+    """
+    answers = [asyncio.TimeoutError(), (503, None), (200, {"ok": True})]
+
+    async def _send(host, method, path, params=None):
+        answer = answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    with patch("riot_requests_async._send", _send):
+        assert asyncio.run(riot_requests_async._get("host", "method", "/path")) == (200, {"ok": True})
+
+
+def test_open_circuit_fails_fast(no_backoff):
+    """
+    Test an endpoint that keeps failing raises RiotUnavailable, and once its circuit is open
+    calls fail without reaching Riot.
+    """
+    sent = []
+
+    async def _send(host, method, path, params=None):
+        sent.append(path)
+        return (500, None)
+
+    with patch("riot_requests_async._send", _send), \
+            patch("circuit_breaker.breaker", CircuitBreaker(failure_threshold=3)):
+        with pytest.raises(RiotUnavailable):
+            asyncio.run(riot_requests_async._get("host", "method", "/path"))
+        assert len(sent) == 3
+
+        with pytest.raises(RiotUnavailable) as e:
+            asyncio.run(riot_requests_async._get("host", "method", "/other"))
+        assert len(sent) == 3
+        assert e.value.path == "/other"
+
+
+def test_cancelled_probe_releases_its_slot():
+    """
+    Test a probe cancelled while waiting on Riot lets the next call probe instead
+    of leaving the endpoint blocked.
+    """
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure(("host", "method"))
+
+    async def _send(host, method, path, params=None):
+        await asyncio.sleep(10)
+
+    async def run():
+        probe = asyncio.create_task(riot_requests_async._get("host", "method", "/path"))
+        await asyncio.sleep(0)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+    with patch("riot_requests_async._send", _send), patch("circuit_breaker.breaker", breaker):
+        asyncio.run(run())
+
+    assert breaker.allow(("host", "method"))
+
+
+def test_weekly_report_is_served_stale_while_riot_is_failing():
+    """
+    Test a weekly report is built from the local match history and marked stale when
+    Riot can not list the summoner's matches.
+    """
+    with open("test/mock_get_matches_by_match_id.json") as f:
+        past_match = parse_past_match(json.load(f))
+
+    async def get_summoners_by_name(summoner_name, platform=None):
+        return kid_orpheus
+
+    async def iter_match_ids_by_puuid(puuid, start_time=None, end_time=None, platform=None):
+        raise RiotUnavailable("/lol/match/v5/matches/by-puuid/ids")
+        yield
+
+    start = past_match.start_time.timestamp() - 60 * 60
+    match_history.history.add(["NA1_1"], [past_match])
+    with patch("riot_requests_async.get_summoners_by_name", get_summoners_by_name), \
+            patch("riot_requests_async.iter_match_ids_by_puuid", iter_match_ids_by_puuid), \
+            patch("responses.get_last_week_range", return_value=(start, start + 7 * 24 * 60 * 60)):
+        report = asyncio.run(responses.weekly_report("Kid Orpheus"))
+        played = asyncio.run(responses.playtime("Kid Orpheus", start, start + 24 * 60 * 60))
+
+    assert report.stale
+    assert report.number_of_matches == 1
+    assert played.startswith(responses.stale_notice)
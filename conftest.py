@@ -0,0 +1,22 @@
+import riot_session
+import singletons
+import pytest
+from unittest.mock import patch
+
+
+@pytest.fixture(autouse=True)
+def riot_api_key():
+    """
+    Give the Riot clients a key, so no test depends on API_KEY being set.
+    """
+    with patch("riot_session.api_key", "RGAPI-test"):
+        yield riot_session.api_key
+
+
+@pytest.fixture(autouse=True)
+def isolated_singletons():
+    """
+    Give every test its own empty in-memory caches, stores and circuit breaker instead of the shared ones.
+    """
+    with singletons.isolated():
+        yield
@@ -1,14 +1,43 @@
-import asyncio
 import discord
 import responses
 import os
+from io import BytesIO
 from discord import app_commands
 from discord.ext import commands
 from dotenv import load_dotenv
-from exceptions import MessageNotSend
+from exceptions import MessageNotSend, RiotAPIError, SummonerNotFound
+from message_composer import message_char_limit, outbound, pack_embeds, pack_messages
+from timezones import day_start
+from typing import Dict, Optional
+from watchlist import Watchlist, WatchedSummoner
+from worker_pool import pool
+import asyncio
+import metrics
+import regions
+import report_state
+import riot_requests_async
 
 load_dotenv()
 
+# Platforms a summoner can be looked up on, the default one is used when none is picked
+region_choices = [app_commands.Choice(name=platform, value=platform)
+                  for platform in regions.platform_clusters]
+region_description = f"Region, {regions.default_platform} by default"
+
+
+def log_task_error(task: asyncio.Task) -> None:
+    """
+    Prints why a background task stopped, as nothing else awaits it
+
+    Args:
+        task (asyncio.Task): The finished task
+
+    Returns:
+        None
+    """
+    if not task.cancelled() and task.exception() is not None:
+        print(f"{task.get_name()} stopped: {task.exception()!r}")
+
 
 def run_discord_bot() -> None:
     """
@@ -25,6 +54,33 @@ def run_discord_bot() -> None:
     intents.message_content = True
     client = commands.Bot(command_prefix="!", intents=intents)
 
+    async def notify_watchers(watched: WatchedSummoner, event: str, match_info: Optional[Dict]) -> None:
+        """
+        Sends a live game alert to every channel subscribed to the summoner
+
+        Args:
+            watched (WatchedSummoner): The watched summoner
+            event (str): "started" or "ended"
+            match_info (Optional[Dict]): The Spectator-V4 payload, None when the game ended
+
+        Returns:
+            None
+        """
+        if event == "started":
+            message = f"{watched.summoner.name} just started a game of League of Legends."
+        else:
+            message = f"{watched.summoner.name}'s game just ended."
+
+        for channel_id in watched.channel_ids:
+            channel = client.get_channel(channel_id)
+            if channel is not None:
+                await outbound.send(channel_id, channel.send, message)
+
+    watchers = Watchlist(notify_watchers, state=report_state.state)
+    watchers.restore()
+    # The poller's task, kept so it is not garbage collected while running
+    client.watchlist_task = None
+
     @client.event
     async def on_ready() -> None:
         """
@@ -37,112 +93,291 @@ def run_discord_bot() -> None:
             None
         """
         print(f"{client.user} is now running!")
+        # on_ready fires again after reconnects, only start the poller once, or again if it crashed
+        if client.watchlist_task is None or client.watchlist_task.done():
+            client.watchlist_task = asyncio.create_task(watchers.run(), name="watchlist")
+            client.watchlist_task.add_done_callback(log_task_error)
         try:
             synced = await client.tree.sync()
         except Exception as e:
             print(e)
 
+    @client.tree.error
+    async def on_app_command_error(interaction: discord.Interaction, error: app_commands.AppCommandError) -> None:
+        """
+        Answers a command that failed instead of leaving the user waiting on it
+
+        Args:
+            interaction (discord.Interaction): The Discord interaction object representing the original message
+            error (app_commands.AppCommandError): The error, wrapping what the command raised
+
+        Returns:
+            None
+        """
+        original = getattr(error, "original", error)
+        if isinstance(original, SummonerNotFound):
+            message = original.message
+        elif isinstance(original, RiotAPIError):
+            message = "Riot is not answering right now, please try again in a few minutes."
+        elif isinstance(error, app_commands.CheckFailure):
+            message = "You are not allowed to use this command."
+        else:
+            print(error)
+            message = "Something went wrong, please try again later."
+
+        if interaction.response.is_done():
+            await interaction.followup.send(message)
+        else:
+            await interaction.response.send_message(message, ephemeral=True)
+
     @client.tree.command(name="active")
-    @app_commands.describe(summoner_name="Summoner Name")
-    async def active(interaction: discord.Interaction, summoner_name: str) -> None:
+    @app_commands.describe(summoner_name="Summoner Name, or several separated by commas", region=region_description)
+    @app_commands.choices(region=region_choices)
+    async def active(interaction: discord.Interaction, summoner_name: str, region: Optional[str] = None) -> None:
         """
-        Sends a message to the user with the active game of the summoner
+        Sends a message to the user with the active game of the summoner, or of each of several summoners
 
         Args:
             interaction (discord.Interaction): The Discord interaction object representing the original message
-            summoner_name (str): The summoner name
+            summoner_name (str): The summoner name, or several separated by commas
+            region (Optional[str]): The summoner's platform, None for the default one
 
         Returns:
             None
         """
-        active_game = responses.active(summoner_name)
-        await interaction.response.send_message(active_game)
+        with metrics.command_seconds.time(command="active"):
+            await interaction.response.defer()
+            summoner_names = [name.strip() for name in summoner_name.split(",") if name.strip()]
+            if not summoner_names:
+                await interaction.followup.send("Please enter at least one summoner name.")
+                return
+            if len(summoner_names) == 1:
+                async with pool.guild_limit(interaction.guild_id):
+                    active_game = await responses.active(summoner_names[0], region)
+                await interaction.followup.send(active_game)
+                return
+
+            async with pool.guild_limit(interaction.guild_id):
+                active_games = await responses.active_group(summoner_names, region)
+            for message in pack_messages(active_games):
+                await outbound.send(interaction.channel_id, interaction.followup.send, message)
 
     @client.tree.command(name="past")
-    @app_commands.describe(summoner_name="Summoner Name")
-    async def past(interaction: discord.Interaction, summoner_name: str) -> None:
+    @app_commands.describe(summoner_name="Summoner Name", region=region_description)
+    @app_commands.choices(region=region_choices)
+    async def past(interaction: discord.Interaction, summoner_name: str, region: Optional[str] = None) -> None:
         """
         Sends a message to the user with the past 10 games of the summoner
 
         Args:
             interaction (discord.Interaction): The Discord interaction object representing the original message
             summoner_name (str): The summoner name
+            region (Optional[str]): The summoner's platform, None for the default one
 
         Returns:
             None
         """
-        await interaction.response.defer()
-        past_games = responses.past(summoner_name)
-        await asyncio.sleep(10)
-        await interaction.followup.send(past_games)
+        with metrics.command_seconds.time(command="past"):
+            await interaction.response.defer()
+            async with pool.guild_limit(interaction.guild_id):
+                past_games = await responses.past(summoner_name, region)
+            await interaction.followup.send(past_games)
 
     @client.tree.command(name="graph")
-    @app_commands.describe(summoner_name="Summoner Name")
-    async def graph(interaction: discord.Interaction, summoner_name: str) -> None:
+    @app_commands.describe(summoner_name="Summoner Name", chart="Chart to draw",
+                           window="Period to draw, last calendar week by default", region=region_description)
+    @app_commands.choices(chart=[
+        app_commands.Choice(name="Games played", value="games_played"),
+        app_commands.Choice(name="Time played", value="total_time_played"),
+    ], window=[
+        app_commands.Choice(name="Past day", value="day"),
+        app_commands.Choice(name="Past week", value="week"),
+        app_commands.Choice(name="Past month", value="month"),
+        app_commands.Choice(name="Past season", value="season"),
+    ], region=region_choices)
+    async def graph(interaction: discord.Interaction, summoner_name: str, chart: str = "games_played",
+                    window: Optional[str] = None, region: Optional[str] = None) -> None:
         """
-        Sends a graph to the user with games played in last week of the summoner
+        Sends a graph to the user with games played by the summoner in last week, or in the chosen window
 
         Args:
             interaction (discord.Interaction): The Discord interaction object representing the original message
             summoner_name (str): The summoner name
+            chart (str): The chart to send, one of WeeklyReport.CHARTS
+            window (Optional[str]): One of aggregation.WINDOWS ending now, None for last calendar week
+            region (Optional[str]): The summoner's platform, None for the default one
 
         Returns:
             None
         """
 
-        await interaction.response.defer()
-        weekly_report = responses.weekly_report(summoner_name)
-        graph = weekly_report.graph
-        # Save graph as image
-        graph.savefig("graph.png")
-        # Send graph to user
-        try:
-            # await interaction.followup.send(f"Total Number of Games Played by {weekly_report.summoner.name} last Week: {weekly_report.number_of_matches}")
-            # for i, match in enumerate(weekly_report.matches):
-            #     await interaction.followup.send(f"Match {i + 1}\n" + str(match))
-            await interaction.followup.send(file=discord.File("graph.png"))
+        with metrics.command_seconds.time(command="graph"):
+            await interaction.response.defer()
+            async with pool.guild_limit(interaction.guild_id):
+                if window is None:
+                    weekly_report = await responses.weekly_report(summoner_name, region)
+                else:
+                    weekly_report = await responses.window_report(summoner_name, window, region)
+                # Only the requested chart is rendered
+                graph = await pool.run(weekly_report.chart, chart)
+            # Send graph to user
+            try:
+                notice = responses.stale_notice if weekly_report.stale else None
+                await interaction.followup.send(notice, file=discord.File(BytesIO(graph), filename=f"{chart}_graph.png"))
 
-        except Exception as e:
-            raise MessageNotSend(
-                "Message could not be send. Please try again later.")
-        # Delete graph
-        os.remove("graph.png")
+            except Exception as e:
+                raise MessageNotSend() from e
 
     @client.tree.command(name="weekly_report")
-    @app_commands.describe(summoner_name="Summoner Name")
-    async def weekly_report(interaction: discord.Interaction, summoner_name: str) -> None:
+    @app_commands.describe(summoner_name="Summoner Name", region=region_description)
+    @app_commands.choices(region=region_choices)
+    async def weekly_report(interaction: discord.Interaction, summoner_name: str, region: Optional[str] = None) -> None:
         """
-        Sends a graph to the user with games played in last week of the summoner
+        Sends the user the last week's matches of the summoner and both charts in as few messages as fit
 
         Args:
             interaction (discord.Interaction): The Discord interaction object representing the original message
             summoner_name (str): The summoner name
+            region (Optional[str]): The summoner's platform, None for the default one
 
         Returns:
             None
         """
 
-        await interaction.response.defer()
-        weekly_report = responses.weekly_report(summoner_name)
-        games_played_graph = weekly_report.games_played_graph
-        # Save graph as image
-        games_played_graph.savefig("games_played_graph.png")
-        # Send graph to user
-        total_time_played_graph = weekly_report.total_time_played_graph
-        total_time_played_graph.savefig("total_time_played_graph.png")
+        with metrics.command_seconds.time(command="weekly_report"):
+            await interaction.response.defer()
+            async with pool.guild_limit(interaction.guild_id):
+                weekly_report = await responses.weekly_report(summoner_name, region)
+                games_played_graph = await pool.run(weekly_report.chart, "games_played")
+                total_time_played_graph = await pool.run(weekly_report.chart, "total_time_played")
 
-        try:
-            await interaction.followup.send(f"Total Number of Games Played by {weekly_report.summoner.name} last Week: {weekly_report.number_of_matches}")
-            for i, match in enumerate(weekly_report.matches):
-                await interaction.followup.send(f"Match {i + 1}\n" + str(match))
-            await interaction.followup.send(file=discord.File("games_played_graph.png"))
-            await interaction.followup.send(file=discord.File("total_time_played_graph.png"))
+            # Match summaries are packed into as few embeds as fit, both charts ride on the first message
+            header = f"Total Number of Games Played by {weekly_report.summoner.name} last Week: {weekly_report.number_of_matches}"
+            if weekly_report.stale:
+                header = responses.stale_notice + header
+            summaries = [f"Match {i + 1}\n" + str(match)
+                         for i, match in enumerate(weekly_report.matches)]
+            messages = pack_embeds(summaries) or [[]]
 
-        except Exception as e:
-            raise MessageNotSend(
-                "Message could not be send. Please try again later.")
-        # Delete graph
-        os.remove("games_played_graph.png")
-        os.remove("total_time_played_graph.png")
+            async def send_first() -> None:
+                # Charts are PNG bytes rendered in memory, a retried send needs fresh buffers
+                files = [discord.File(BytesIO(games_played_graph), filename="games_played_graph.png"),
+                         discord.File(BytesIO(total_time_played_graph), filename="total_time_played_graph.png")]
+                await interaction.followup.send(header, files=files,
+                                                embeds=[discord.Embed(description=description) for description in messages[0]])
+
+            try:
+                await outbound.send(interaction.channel_id, send_first)
+                for descriptions in messages[1:]:
+                    await outbound.send(interaction.channel_id, interaction.followup.send,
+                                        embeds=[discord.Embed(description=description) for description in descriptions])
+
+            except Exception as e:
+                raise MessageNotSend() from e
+
+    @client.tree.command(name="playtime")
+    @app_commands.describe(summoner_name="Summoner Name", from_date="First day, YYYY-MM-DD",
+                           to_date="Last day, YYYY-MM-DD", region=region_description)
+    @app_commands.choices(region=region_choices)
+    async def playtime(interaction: discord.Interaction, summoner_name: str, from_date: str, to_date: str,
+                       region: Optional[str] = None) -> None:
+        """
+        Sends the user how much the summoner played between two days, read from the local match history
+
+        Args:
+            interaction (discord.Interaction): The Discord interaction object representing the original message
+            summoner_name (str): The summoner name
+            from_date (str): The first day, "YYYY-MM-DD"
+            to_date (str): The last day, "YYYY-MM-DD", included
+            region (Optional[str]): The summoner's platform, None for the default one
+
+        Returns:
+            None
+        """
+        with metrics.command_seconds.time(command="playtime"):
+            await interaction.response.defer()
+            try:
+                start_date = day_start(from_date)
+                end_date = day_start(to_date) + 24 * 60 * 60
+            except ValueError:
+                await interaction.followup.send("Dates must be written as YYYY-MM-DD.")
+                return
+
+            async with pool.guild_limit(interaction.guild_id):
+                played = await responses.playtime(summoner_name, start_date, end_date, region)
+            await interaction.followup.send(played)
+
+    @client.tree.command(name="watch")
+    @app_commands.describe(summoner_name="Summoner Name", region=region_description)
+    @app_commands.choices(region=region_choices)
+    async def watch(interaction: discord.Interaction, summoner_name: str, region: Optional[str] = None) -> None:
+        """
+        Subscribes the channel to alerts when the summoner starts or ends a game
+
+        Args:
+            interaction (discord.Interaction): The Discord interaction object representing the original message
+            summoner_name (str): The summoner name
+            region (Optional[str]): The summoner's platform, None for the default one
+
+        Returns:
+            None
+        """
+        with metrics.command_seconds.time(command="watch"):
+            await interaction.response.defer()
+            try:
+                summoner = await riot_requests_async.get_summoners_by_name(summoner_name, region)
+            except SummonerNotFound as e:
+                await interaction.followup.send(e.message)
+                return
+
+            watchers.watch(summoner, interaction.channel_id)
+            await interaction.followup.send(f"This channel will be notified when {summoner.name} starts or ends a game.")
+
+    @client.tree.command(name="unwatch")
+    @app_commands.describe(summoner_name="Summoner Name", region=region_description)
+    @app_commands.choices(region=region_choices)
+    async def unwatch(interaction: discord.Interaction, summoner_name: str, region: Optional[str] = None) -> None:
+        """
+        Unsubscribes the channel from the summoner's game alerts
+
+        Args:
+            interaction (discord.Interaction): The Discord interaction object representing the original message
+            summoner_name (str): The summoner name
+            region (Optional[str]): The summoner's platform, None for the default one
+
+        Returns:
+            None
+        """
+        with metrics.command_seconds.time(command="unwatch"):
+            await interaction.response.defer()
+            try:
+                summoner = await riot_requests_async.get_summoners_by_name(summoner_name, region)
+            except SummonerNotFound as e:
+                await interaction.followup.send(e.message)
+                return
+
+            if watchers.unwatch(summoner.id, interaction.channel_id):
+                await interaction.followup.send(f"This channel will no longer be notified about {summoner.name}.")
+            else:
+                await interaction.followup.send(f"This channel is not watching {summoner.name}.")
+
+    @client.tree.command(name="stats")
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.checks.has_permissions(administrator=True)
+    async def stats(interaction: discord.Interaction) -> None:
+        """
+        Sends the administrator a summary of the bot's latencies, cache hit rates and queues
+
+        Args:
+            interaction (discord.Interaction): The Discord interaction object representing the original message
+
+        Returns:
+            None
+        """
+        gauges = {**pool.stats(), "outbound_pending": outbound.pending}
+        # The code block fence takes 8 of the message's characters
+        text = metrics.stats_text(gauges)[:message_char_limit - 8]
+        await interaction.response.send_message(f"```\n{text}\n```", ephemeral=True)
 
+    metrics.serve()
     client.run((str(TOKEN)))
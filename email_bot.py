@@ -1,11 +1,454 @@
+import asyncio
+import csv
+import itertools
+import metrics
+import os
 import smtplib
+import responses
+import riot_session
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.image import MIMEImage
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from worker_pool import pool
 
+if TYPE_CHECKING:
+    from weekly_report import WeeklyReport
 
-def send_email(recipient: str):
+# SMTP relay the weekly reports are mailed through
+smtp_host = os.getenv('SMTP_HOST', 'localhost')
+smtp_port = int(os.getenv('SMTP_PORT', '587'))
+smtp_username = os.getenv('SMTP_USERNAME')
+smtp_password = os.getenv('SMTP_PASSWORD')
+smtp_starttls = os.getenv('SMTP_STARTTLS', '1') == '1'
+email_sender = os.getenv('EMAIL_SENDER', '')
+
+# Messages sent over one connection before it is recycled, relays cap messages per session
+email_batch_size = int(os.getenv('EMAIL_BATCH_SIZE', '50'))
+# Reports built together ahead of the sender, which holds at most this many more in memory
+email_prefetch = int(os.getenv('EMAIL_PREFETCH', '8'))
+email_max_retries = int(os.getenv('EMAIL_MAX_RETRIES', '3'))
+email_retry_delay = float(os.getenv('EMAIL_RETRY_DELAY', '30'))
+
+
+class Recipient():
+    """
+    A parent subscribed to a summoner's weekly report, with its delivery state
+
+    === Instance Attributes ===
+    address: Email address of the parent
+    summoner_name: Summoner the report is about
+    attempts: Number of times the message was handed to the SMTP server
+    sent: Whether the message was accepted
+    error: Why the last attempt failed, None if it did not
+    """
+    address: str
+    summoner_name: str
+    attempts: int
+    sent: bool
+    error: Optional[str]
+
+    def __init__(self, address: str, summoner_name: str) -> None:
+        """
+        Initialize a Recipient object
+
+        Args:
+            address: Email address of the parent
+            summoner_name: Summoner the report is about
+
+        Return:
+            None
+        """
+        self.address = address
+        self.summoner_name = summoner_name
+        self.attempts = 0
+        self.sent = False
+        self.error = None
+
+    def __repr__(self) -> str:
+        return f"Recipient({self.address!r}, {self.summoner_name!r})"
+
+
+def read_recipients(path: str) -> Iterator[Recipient]:
+    """
+    Yield the recipients of a CSV file of address,summoner_name rows, one row at a time
+
+    Args:
+        path: path of the CSV file
+
+    Yields:
+        The next recipient
+    """
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            if len(row) >= 2 and "@" in row[0]:
+                yield Recipient(row[0].strip(), row[1].strip())
+
+
+def build_message(report: "WeeklyReport", recipient: Recipient, sender: str) -> bytes:
+    """
+    Return the email of report for recipient, with both charts attached.
+    Rendering the charts is CPU work, run it on the worker pool.
+
+    Args:
+        report: the weekly report
+        recipient: who the email is for
+        sender: From address
+
+    Return:
+        The email, ready for the SMTP DATA command
+    """
     msg = MIMEMultipart()
-    msg['Subject'] = 'Weekly Report'
-    msg['From'] = ""
-    msg['To'] = recipient
+    msg['Subject'] = f'Weekly Report of {report.summoner.name}'
+    msg['From'] = sender
+    msg['To'] = recipient.address
+    msg.attach(MIMEText((responses.stale_notice if report.stale else "") + str(report)))
+
+    for chart in report.CHARTS:
+        image = MIMEImage(report.chart(chart), _subtype="png")
+        image.add_header('Content-Disposition', 'attachment',
+                         filename=f"{chart}_graph.png")
+        msg.attach(image)
+
+    # Flattened here so the report and its charts can be dropped before the message is sent
+    return msg.as_bytes()
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Return whether a failed send is worth retrying
+
+    Args:
+        error: what the send raised
+
+    Return:
+        True for dropped connections and 4xx replies, False for permanent failures
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return isinstance(error, (smtplib.SMTPServerDisconnected, OSError))
+
+
+class BulkMailer():
+    """
+    Mails weekly reports to many recipients. Reports are built prefetch recipients at a time,
+    so a group's shared matches are fetched once, and rendered on the worker pool ahead of the sender, and sent over one authenticated SMTP connection
+    that is reused for batch_size messages. Recipients refused with a temporary error are
+    retried after the rest, with exponential backoff.
+
+    === Instance Attributes ===
+    host: SMTP server host
+    port: SMTP server port
+    username: SMTP login, None to send without authenticating
+    password: SMTP password
+    sender: From address
+    starttls: Whether to upgrade the connection with STARTTLS
+    batch_size: Messages sent over one connection
+    prefetch: Reports built together ahead of the sender
+    max_retries: Times a temporarily refused message is retried
+    retry_delay: Seconds before the first retry, doubled every retry
+    """
+    host: str
+    port: int
+    username: Optional[str]
+    password: Optional[str]
+    sender: str
+    starttls: bool
+    batch_size: int
+    prefetch: int
+    max_retries: int
+    retry_delay: float
+
+    def __init__(self, host: str = smtp_host, port: int = smtp_port, username: Optional[str] = smtp_username,
+                 password: Optional[str] = smtp_password, sender: str = email_sender,
+                 starttls: bool = smtp_starttls, batch_size: int = email_batch_size,
+                 prefetch: int = email_prefetch, max_retries: int = email_max_retries,
+                 retry_delay: float = email_retry_delay) -> None:
+        """
+        Initialize a BulkMailer object. The connection is opened by the first send.
+
+        Args:
+            host: SMTP server host
+            port: SMTP server port
+            username: SMTP login, None to send without authenticating
+            password: SMTP password
+            sender: From address
+            starttls: Whether to upgrade the connection with STARTTLS
+            batch_size: Messages sent over one connection
+            prefetch: Reports built together ahead of the sender
+            max_retries: Times a temporarily refused message is retried
+            retry_delay: Seconds before the first retry, doubled every retry
+
+        Return:
+            None
+        """
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.sender = sender
+        self.starttls = starttls
+        self.batch_size = batch_size
+        self.prefetch = prefetch
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._connection = None
+        self._sent_on_connection = 0
+
+    def connect(self) -> smtplib.SMTP:
+        """
+        Open and authenticate a connection to the SMTP server
+
+        Args:
+            None
+
+        Return:
+            The connection
+        """
+        connection = smtplib.SMTP(self.host, self.port, timeout=30)
+        try:
+            if self.starttls:
+                connection.starttls()
+            if self.username:
+                connection.login(self.username, self.password)
+        except BaseException:
+            connection.close()
+            raise
+        return connection
+
+    def close(self) -> None:
+        """
+        Say QUIT on the open connection, if any
+
+        Args:
+            None
+
+        Return:
+            None
+        """
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                connection.quit()
+            except (smtplib.SMTPException, OSError):
+                connection.close()
+
+    def deliver(self, recipient: Recipient, message: bytes) -> None:
+        """
+        Send message to recipient over the open connection, opening a new one
+        first when there is none or the current one sent a full batch.
+        Blocking, run it on the worker pool.
+
+        Args:
+            recipient: who the message is for
+            message: the flattened email
+
+        Return:
+            None
+
+        Raises:
+            smtplib.SMTPException or OSError: if the message was not accepted
+        """
+        if self._connection is not None and self._sent_on_connection >= self.batch_size:
+            self.close()
+        if self._connection is None:
+            self._connection = self.connect()
+            self._sent_on_connection = 0
+
+        self._sent_on_connection += 1
+        try:
+            self._connection.sendmail(
+                self.sender, [recipient.address], message)
+        except (smtplib.SMTPServerDisconnected, OSError):
+            self._connection = None
+            raise
+        except smtplib.SMTPResponseException as e:
+            # 421 means the server is closing the connection
+            if e.smtp_code == 421:
+                self.close()
+            raise
+
+    async def _send(self, recipient: Recipient, message: bytes) -> bool:
+        """
+        Make one attempt at sending message and record the outcome on recipient
+
+        Args:
+            recipient: who the message is for
+            message: the flattened email
+
+        Return:
+            Whether the message should be retried
+        """
+        recipient.attempts += 1
+        try:
+            await pool.run(self.deliver, recipient, message)
+        except (smtplib.SMTPException, OSError) as e:
+            recipient.error = str(e) or type(e).__name__
+            retry = is_transient(e) and recipient.attempts <= self.max_retries
+            metrics.email_sends_total.inc(
+                outcome="retried" if retry else "failed")
+            return retry
+
+        recipient.sent = True
+        recipient.error = None
+        metrics.email_sends_total.inc(outcome="sent")
+        return False
+
+    async def _reports(self, recipients: List[Recipient]) -> Dict[str, Union["WeeklyReport", Exception]]:
+        """
+        Return the weekly report of every summoner of recipients, built together so summoners who
+        play together have their shared matches fetched once
+
+        Args:
+            recipients: the recipients
+
+        Return:
+            The report by summoner name, or the exception that stopped it from being built
+        """
+        summoner_names = list(dict.fromkeys(recipient.summoner_name for recipient in recipients))
+        try:
+            return dict(zip(summoner_names, await responses.weekly_reports(summoner_names)))
+        except Exception:
+            # One summoner failing must not hold up everyone else's report, build them one by one instead
+            reports = await asyncio.gather(*(responses.weekly_report(summoner_name)
+                                             for summoner_name in summoner_names), return_exceptions=True)
+            return dict(zip(summoner_names, reports))
+
+    async def _build(self, recipients: Iterator[Recipient], queue: asyncio.Queue,
+                     failed: List[Recipient]) -> None:
+        """
+        Build the messages of recipients prefetch at a time and put them on queue, until recipients runs out
+
+        Args:
+            recipients: the recipients
+            queue: bounded queue the sender reads from
+            failed: list recipients whose report could not be built are appended to
+
+        Return:
+            None
+        """
+        while group := list(itertools.islice(recipients, self.prefetch)):
+            reports = await self._reports(group)
+            messages = await asyncio.gather(*(pool.run(build_message, reports[recipient.summoner_name],
+                                                       recipient, self.sender)
+                                              for recipient in group
+                                              if not isinstance(reports[recipient.summoner_name], Exception)),
+                                            return_exceptions=True)
+            messages = iter(messages)
+            for recipient in group:
+                report = reports[recipient.summoner_name]
+                message = report if isinstance(report, Exception) else next(messages)
+                if isinstance(message, Exception):
+                    recipient.error = getattr(message, "message", None) or str(message) or type(message).__name__
+                    metrics.email_sends_total.inc(outcome="failed")
+                    failed.append(recipient)
+                    continue
+                # Waits while the sender is prefetch messages behind, which bounds memory
+                await queue.put((recipient, message))
+
+    async def send_reports(self, recipients: Iterable[Recipient]) -> List[Recipient]:
+        """
+        Build and mail the weekly report of every recipient.
+        recipients may be a generator, it is read as the sender catches up.
+
+        Args:
+            recipients: the recipients
+
+        Return:
+            Every recipient, with its delivery state
+        """
+        recipients = iter(recipients)
+        queue: asyncio.Queue[Optional[Tuple[Recipient, bytes]]] = asyncio.Queue(
+            maxsize=self.prefetch)
+        done = []
+        retries = []
+
+        async def build_all() -> None:
+            try:
+                await self._build(recipients, queue, done)
+            finally:
+                # Also queued when building fails, so the sender stops and awaiting builders raises
+                await queue.put(None)
+
+        builders = asyncio.create_task(build_all())
+        try:
+            while (item := await queue.get()) is not None:
+                recipient, message = item
+                if await self._send(recipient, message):
+                    retries.append((recipient, message))
+                else:
+                    done.append(recipient)
+            await builders
+
+            # Temporary refusals are retried once everyone else was sent, with growing delays
+            delay = self.retry_delay
+            while retries:
+                await asyncio.sleep(delay)
+                delay *= 2
+                pending, retries = retries, []
+                for recipient, message in pending:
+                    if await self._send(recipient, message):
+                        retries.append((recipient, message))
+                    else:
+                        done.append(recipient)
+        finally:
+            builders.cancel()
+            await pool.run(self.close)
+        return done
+
+
+async def _send_weekly_reports(recipients: Iterable[Recipient], mailer: BulkMailer) -> List[Recipient]:
+    """
+    Mail every recipient's weekly report, then close the Riot sessions of this event loop
+
+    Args:
+        recipients: the recipients
+        mailer: the mailer to send with
+
+    Return:
+        Every recipient, with its delivery state
+    """
+    try:
+        return await mailer.send_reports(recipients)
+    finally:
+        await riot_session.close()
+
+
+def send_weekly_reports(recipients: Iterable[Recipient], mailer: Optional[BulkMailer] = None) -> List[Recipient]:
+    """
+    Mail every recipient's weekly report
+
+    Args:
+        recipients: the recipients
+        mailer: the mailer to send with, one configured from the environment by default
+
+    Return:
+        Every recipient, with its delivery state
+    """
+    return asyncio.run(_send_weekly_reports(recipients, mailer or BulkMailer()))
+
+
+def send_email(recipient: str, summoner_name: str) -> Recipient:
+    """
+    Mail summoner_name's weekly report to one recipient
+
+    Args:
+        recipient: email address
+        summoner_name: summoner name
+
+    Return:
+        The recipient, with its delivery state
+    """
+    return send_weekly_reports([Recipient(recipient, summoner_name)])[0]
+
+
+if __name__ == '__main__':
+    import sys
+
+    results = send_weekly_reports(read_recipients(sys.argv[1]))
+    for result in results:
+        if not result.sent:
+            print(f"{result.address}: {result.error}")
+    print(f"Sent {sum(result.sent for result in results)} of {len(results)} weekly reports")
@@ -0,0 +1,220 @@
+import asyncio
+import email
+import json
+import pytest
+from email_bot import BulkMailer, Recipient, read_recipients
+from exceptions import SummonerNotFound
+from mock_smtp_server import MockSMTPServer
+from riot_requests import parse_past_match
+from summoner import Summoner
+from unittest.mock import patch
+from weekly_report import WeeklyReport
+
+
+@pytest.fixture
+def fake_weekly_report():
+    """
+    Patch responses.weekly_report and responses.weekly_reports with a report of the recorded
+    match for any summoner but "Nobody", and yield the groups passed to weekly_reports.
+    """
+    with open("test/mock_get_matches_by_match_id.json") as f:
+        past_match = parse_past_match(json.load(f))
+
+    async def weekly_report(summoner_name):
+        if summoner_name == "Nobody":
+            raise SummonerNotFound(summoner_name)
+        summoner = Summoner(summoner_name, "id", "puuid")
+        return WeeklyReport(summoner, [past_match], past_match.start_time.timestamp() - 60 * 60)
+
+    groups = []
+
+    async def weekly_reports(summoner_names):
+        groups.append(summoner_names)
+        return [await weekly_report(summoner_name) for summoner_name in summoner_names]
+
+    with patch("responses.weekly_report", weekly_report), patch("responses.weekly_reports", weekly_reports):
+        yield groups
+
+
+def mailer_for(server: MockSMTPServer, **kwargs) -> BulkMailer:
+    options = {"username": "bot", "password": "secret", "sender": "reports@example.com",
+               "starttls": False, "retry_delay": 0, **kwargs}
+    return BulkMailer("127.0.0.1", server.port, **options)
+
+
+def test_reports_are_sent_in_batches_over_one_connection(fake_weekly_report):
+    """
+    Test every recipient gets their report with both charts, over one authenticated
+    connection per batch_size messages.
+    """
+    recipients = [Recipient(f"parent{i}@example.com", f"Summoner {i}")
+                  for i in range(5)]
+
+    with MockSMTPServer() as server:
+        results = asyncio.run(mailer_for(
+            server, batch_size=2).send_reports(recipients))
+
+    assert all(recipient.sent for recipient in results)
+    assert server.connections == 3
+    assert server.logins == ["bot"] * 3
+    assert sorted(recipients for _, recipients, _ in server.messages) == \
+        [[f"parent{i}@example.com"] for i in range(5)]
+
+    message = email.message_from_bytes(server.messages[0][2])
+    attachments = [part.get_filename() for part in message.walk()
+                   if part.get_content_type() == "image/png"]
+    assert message["From"] == "reports@example.com"
+    assert attachments == ["games_played_graph.png",
+                           "total_time_played_graph.png"]
+
+
+def test_temporary_refusal_is_retried(fake_weekly_report):
+    """
+    Test a recipient refused with 451 is sent again, and others are not held up by it.
+    """
+    recipients = [Recipient("greylisted@example.com", "Summoner 0"),
+                  Recipient("parent@example.com", "Summoner 1")]
+
+    with MockSMTPServer(transient_failures={"greylisted@example.com": 2}) as server:
+        results = asyncio.run(mailer_for(server).send_reports(recipients))
+
+    assert all(recipient.sent for recipient in results)
+    assert recipients[0].attempts == 3
+    assert recipients[1].attempts == 1
+    assert [recipients for _, recipients, _ in server.messages][-1] == [
+        "greylisted@example.com"]
+
+
+def test_retries_are_bounded(fake_weekly_report):
+    """
+    Test a recipient that keeps being refused with 451 gives up after max_retries.
+    """
+    recipient = Recipient("greylisted@example.com", "Summoner 0")
+
+    with MockSMTPServer(transient_failures={"greylisted@example.com": 10}) as server:
+        asyncio.run(mailer_for(server, max_retries=2).send_reports([recipient]))
+
+    assert not recipient.sent
+    assert recipient.attempts == 3
+    assert "451" in recipient.error
+
+
+def test_permanent_refusal_is_not_retried(fake_weekly_report):
+    """
+    Test a recipient refused with 550 is tried once and the rest are still sent.
+    """
+    recipients = [Recipient("gone@example.com", "Summoner 0"),
+                  Recipient("parent@example.com", "Summoner 1")]
+
+    with MockSMTPServer(rejected={"gone@example.com"}) as server:
+        asyncio.run(mailer_for(server).send_reports(recipients))
+
+    assert not recipients[0].sent
+    assert recipients[0].attempts == 1
+    assert recipients[1].sent
+    assert len(server.messages) == 1
+
+
+def test_closed_connection_is_reopened(fake_weekly_report):
+    """
+    Test a server that closes the connection with 421 gets a new connection and the message again.
+    """
+    recipients = [Recipient(f"parent{i}@example.com", f"Summoner {i}")
+                  for i in range(3)]
+
+    with MockSMTPServer(max_messages_per_connection=1) as server:
+        results = asyncio.run(mailer_for(server).send_reports(recipients))
+
+    assert all(recipient.sent for recipient in results)
+    assert len(server.messages) == 3
+
+
+def test_missing_summoner_is_reported(fake_weekly_report):
+    """
+    Test a recipient whose summoner does not exist gets no email and says why.
+    """
+    recipients = [Recipient("parent@example.com", "Nobody")]
+
+    with MockSMTPServer() as server:
+        asyncio.run(mailer_for(server).send_reports(recipients))
+
+    assert not recipients[0].sent
+    assert recipients[0].error == "Summoner 'Nobody' not found"
+    assert server.messages == []
+
+
+def test_reports_are_built_in_groups(fake_weekly_report):
+    """
+    Test reports are built prefetch recipients at a time, each summoner once per group, and a
+    summoner missing from a group does not stop the others' reports.
+    """
+    recipients = [Recipient("parent0@example.com", "Summoner 0"),
+                  Recipient("parent1@example.com", "Summoner 0"),
+                  Recipient("parent2@example.com", "Summoner 1"),
+                  Recipient("parent3@example.com", "Nobody"),
+                  Recipient("parent4@example.com", "Summoner 2")]
+
+    with MockSMTPServer() as server:
+        asyncio.run(mailer_for(server, prefetch=4).send_reports(recipients))
+
+    assert fake_weekly_report == [["Summoner 0", "Summoner 1", "Nobody"], ["Summoner 2"]]
+    assert [recipient.sent for recipient in recipients] == [True, True, True, False, True]
+
+
+def test_recipients_are_read_as_needed(fake_weekly_report):
+    """
+    Test recipients are built at most prefetch messages ahead of the sender.
+    """
+    prefetch = 2
+    read = 0
+
+    def recipients():
+        nonlocal read
+        for i in range(8):
+            read += 1
+            yield Recipient(f"parent{i}@example.com", f"Summoner {i}")
+
+    leads = []
+    with MockSMTPServer() as server:
+        mailer = mailer_for(server, prefetch=prefetch)
+        deliver = mailer.deliver
+
+        def counting_deliver(recipient, message):
+            leads.append(read - len(server.messages))
+            deliver(recipient, message)
+
+        mailer.deliver = counting_deliver
+        asyncio.run(mailer.send_reports(recipients()))
+
+    assert len(server.messages) == 8
+    # prefetch queued, one being sent and a group of prefetch being built
+    assert max(leads) <= 2 * prefetch + 1
+
+
+def test_failed_build_is_raised(fake_weekly_report):
+    """
+    Test an error reading recipients stops the sender after what was built and is raised.
+    """
+    def recipients():
+        yield Recipient("parent0@example.com", "Summoner 0")
+        raise ValueError("bad recipients line")
+
+    with MockSMTPServer() as server:
+        with pytest.raises(ValueError):
+            asyncio.run(asyncio.wait_for(mailer_for(server, prefetch=1).send_reports(recipients()), 5))
+
+    assert len(server.messages) == 1
+
+
+def test_read_recipients(tmp_path):
+    """
+    Test recipients are read from address,summoner_name rows, skipping a header.
+    """
+    path = tmp_path / "recipients.csv"
+    path.write_text(
+        "address,summoner_name\nparent@example.com, Kid Orpheus\n")
+
+    recipients = list(read_recipients(str(path)))
+
+    assert [(recipient.address, recipient.summoner_name)
+            for recipient in recipients] == [("parent@example.com", "Kid Orpheus")]
@@ -38,3 +38,33 @@ class MessageNotSend(Exception):
         """
         self.message = "Message not send"
         super().__init__(self.message)
+
+
+class RiotAPIError(Exception):
+    """
+    Raised when the Riot API answers with an error status.
+    """
+
+    def __init__(self, status_code, path):
+        """
+        Initialize a RiotAPIError object
+        """
+        self.status_code = status_code
+        self.path = path
+        self.message = f"Riot API returned {status_code} for '{path}'"
+        super().__init__(self.message)
+
+
+class RiotUnavailable(RiotAPIError):
+    """
+    Raised when the Riot API keeps failing with server errors or timeouts, or the
+    circuit breaker of the endpoint is open.
+    """
+
+    def __init__(self, path, status_code=None):
+        """
+        Initialize a RiotUnavailable object
+        """
+        super().__init__(status_code, path)
+        self.message = f"Riot API is unavailable for '{path}'"
+        self.args = (self.message,)
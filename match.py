@@ -1,6 +1,7 @@
 from datetime import datetime, timedelta
+from participant import ParticipantStats
 from team import Team
-from typing import List
+from typing import List, Sequence, Tuple
 
 
 class Match():
@@ -12,6 +13,8 @@ class Match():
     duration: Match duration
     teams: Teams that participated in the match
     """
+    # Slots drop the per-instance __dict__, long match histories are kept in memory
+    __slots__ = ("start_time", "duration", "teams")
 
     start_time: datetime
     duration: timedelta
@@ -22,6 +25,21 @@ class Match():
         self.duration = duration
         self.teams = teams
 
+    def __eq__(self, other: object) -> bool:
+        """
+        Return True if self and other are equal, and False otherwise
+
+        Args:
+            other: object to compare self to
+
+        Return:
+            True if self and other are equal, and False otherwise
+        """
+        if type(self) is not type(other):
+            return False
+        return self.start_time == other.start_time and self.duration == other.duration \
+            and self.teams == other.teams
+
 
 class PastMatch(Match):
     """
@@ -32,17 +50,35 @@ class PastMatch(Match):
     end_time: Match end time
     duration: Match duration
     teams: Teams that participated in the match
+    participants: Champion and KDA of every player, empty if not known
     """
+    __slots__ = ("end_time", "participants")
 
     start_time: datetime
     end_time: datetime
     duration: timedelta
     teams: List[Team]
+    participants: Tuple[ParticipantStats, ...]
 
-    def __init__(self, start_time: datetime, end_time: datetime, duration: timedelta, teams: List[Team]) -> None:
+    def __init__(self, start_time: datetime, end_time: datetime, duration: timedelta, teams: List[Team],
+                 participants: Sequence[ParticipantStats] = ()) -> None:
         self.end_time = end_time
+        self.participants = tuple(participants)
         super().__init__(start_time, duration, teams)
 
+    def __eq__(self, other: object) -> bool:
+        """
+        Return True if self and other are equal, and False otherwise
+
+        Args:
+            other: object to compare self to
+
+        Return:
+            True if self and other are equal, and False otherwise
+        """
+        return super().__eq__(other) and self.end_time == other.end_time \
+            and self.participants == other.participants
+
     def __str__(self) -> str:
         game_start_str = self.start_time.strftime("%m/%d/%Y, %H:%M:%S")
         game_end_str = self.end_time.strftime("%m/%d/%Y, %H:%M:%S")
@@ -60,6 +96,7 @@ class ActiveMatch(Match):
     duration: Match duration
     teams: Teams that participated in the match
     """
+    __slots__ = ()
 
     start_time: datetime
     duration: timedelta
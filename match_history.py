@@ -0,0 +1,312 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from match import PastMatch
+from participant import ParticipantStats
+from team import Team
+from typing import Dict, List, Optional, Tuple
+
+# Location of the local match history
+match_history_path = os.getenv('MATCH_HISTORY_PATH', 'match_history.sqlite3')
+
+# Match-V5 only lists finished games, so a listing is only known complete up to this many seconds
+# before it was made, the longest a game still running then can have been going on
+match_history_settle_seconds = int(os.getenv('MATCH_HISTORY_SETTLE_SECONDS', str(2 * 60 * 60)))
+
+
+def participant_rows(match_id: str, match: PastMatch, puuid: Optional[str] = None) -> List[Tuple]:
+    """
+    Return one compact row per participant of match
+
+    Args:
+        match_id: match id
+        match: a past match
+        puuid: summoner known to have played match, given a bare row if match has no participant stats
+
+    Return:
+        (match_id, puuid, summoner_name, team_id, win, champion, kills, deaths, assists,
+         start_time, duration) rows
+    """
+    start_time = int(match.start_time.timestamp())
+    duration = int(match.duration.total_seconds())
+
+    # Riot lists participants team by team, the same order get_teams_info fills the teams in
+    seats = [(team, name) for team in match.teams for name in team.participants]
+    if len(seats) != len(match.participants):
+        seats = [(None, None)] * len(match.participants)
+
+    # Matches cached before participant stats were kept only know who listed them
+    if not match.participants and puuid is not None:
+        return [(match_id, puuid, None, None, None, None, None, None, None, start_time, duration)]
+
+    rows = []
+    for stats, (team, name) in zip(match.participants, seats):
+        win = None if team is None or team.win is None else int(team.win)
+        rows.append((match_id, stats.puuid, name, team.id if team is not None else None, win,
+                     stats.champion, stats.kills, stats.deaths, stats.assists, start_time, duration))
+    return rows
+
+
+class MatchHistory():
+    """
+    Local match history kept in SQLite, one compact row per participant of every ingested match,
+    indexed on (puuid, start_time) so date range questions are answered without calling Riot.
+    Also records the span of time each puuid's history is complete for.
+
+    === Instance Attributes ===
+    path: SQLite database file, or ":memory:"
+    """
+    path: str
+
+    def __init__(self, path: str = match_history_path) -> None:
+        """
+        Initialize a MatchHistory object. The database is opened on first use.
+
+        Args:
+            path: SQLite database file, or ":memory:"
+
+        Return:
+            None
+        """
+        self.path = path
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Return the database connection, creating the tables on first use
+
+        Args:
+            None
+
+        Return:
+            The database connection
+        """
+        if self._connection is None:
+            self._connection = sqlite3.connect(
+                self.path, check_same_thread=False)
+            self._connection.executescript(
+                "CREATE TABLE IF NOT EXISTS history_matches ("
+                " match_id TEXT PRIMARY KEY, start_time INTEGER NOT NULL, end_time INTEGER NOT NULL,"
+                " duration INTEGER NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS participants ("
+                " match_id TEXT NOT NULL, puuid TEXT NOT NULL, summoner_name TEXT, team_id INTEGER,"
+                " win INTEGER, champion TEXT, kills INTEGER, deaths INTEGER, assists INTEGER,"
+                " start_time INTEGER NOT NULL, duration INTEGER NOT NULL, PRIMARY KEY (match_id, puuid));"
+                "CREATE INDEX IF NOT EXISTS participants_puuid_start_time"
+                " ON participants (puuid, start_time);"
+                "CREATE TABLE IF NOT EXISTS history_coverage ("
+                " puuid TEXT PRIMARY KEY, start_time INTEGER NOT NULL, end_time INTEGER NOT NULL);")
+        return self._connection
+
+    def add(self, match_ids: List[str], matches: List[PastMatch], puuid: Optional[str] = None) -> int:
+        """
+        Store matches, skipping the ones already stored
+
+        Args:
+            match_ids: ids of the matches
+            matches: the matches, in the same order as match_ids
+            puuid: summoner known to have played every match, None if unknown
+
+        Return:
+            The number of matches that were new
+        """
+        with self._lock:
+            new = self._add(match_ids, matches, puuid)
+            self._connect().commit()
+        return new
+
+    def _add(self, match_ids: List[str], matches: List[PastMatch], puuid: Optional[str] = None) -> int:
+        """
+        Store matches without committing, the caller holds the lock
+
+        Args:
+            match_ids: ids of the matches
+            matches: the matches, in the same order as match_ids
+            puuid: summoner known to have played every match
+
+        Return:
+            The number of matches that were new
+        """
+        connection = self._connect()
+        new = 0
+        for match_id, match in zip(match_ids, matches):
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO history_matches (match_id, start_time, end_time, duration) VALUES (?, ?, ?, ?)",
+                (match_id, int(match.start_time.timestamp()), int(match.end_time.timestamp()),
+                 int(match.duration.total_seconds())))
+            new += cursor.rowcount
+            if cursor.rowcount == 0 and match.participants:
+                # A match stored bare, from a cached copy without stats, gains its participants now
+                cursor = connection.execute(
+                    "DELETE FROM participants WHERE match_id = ? AND champion IS NULL", (match_id,))
+                if cursor.rowcount == 0:
+                    continue
+            connection.executemany(
+                "INSERT OR IGNORE INTO participants (match_id, puuid, summoner_name, team_id, win, champion,"
+                " kills, deaths, assists, start_time, duration) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                participant_rows(match_id, match, puuid))
+        return new
+
+    def ingest(self, puuid: str, start: float, end: float, match_ids: List[str], matches: List[PastMatch]) -> int:
+        """
+        Store every match puuid played between start and end, and record that
+        puuid's history is complete over that span, up to match_history_settle_seconds ago
+        as games still running are not listed yet
+
+        Args:
+            puuid: summoner puuid
+            start: start of the listed span in epoch seconds
+            end: end of the listed span in epoch seconds
+            match_ids: ids of every match puuid started in the span
+            matches: the matches, in the same order as match_ids
+
+        Return:
+            The number of matches that were new
+        """
+        start, end = int(start), min(int(end), int(time.time()) - match_history_settle_seconds)
+        with self._lock:
+            connection = self._connect()
+            new = self._add(match_ids, matches, puuid)
+            if end <= start:
+                connection.commit()
+                return new
+
+            row = connection.execute(
+                "SELECT start_time, end_time FROM history_coverage WHERE puuid = ?", (puuid,)).fetchone()
+            if row is not None and start <= row[1] and end >= row[0]:
+                # Overlapping spans merge into one
+                start, end = min(start, row[0]), max(end, row[1])
+            elif row is not None and end < row[1]:
+                # A span apart from and older than the recorded one does not replace it
+                connection.commit()
+                return new
+            connection.execute(
+                "INSERT INTO history_coverage (puuid, start_time, end_time) VALUES (?, ?, ?) "
+                "ON CONFLICT (puuid) DO UPDATE SET start_time = excluded.start_time, end_time = excluded.end_time",
+                (puuid, start, end))
+            connection.commit()
+        return new
+
+    def covers(self, puuid: str, start: float, end: float) -> bool:
+        """
+        Return whether every match puuid played between start and end is stored
+
+        Args:
+            puuid: summoner puuid
+            start: start of the range in epoch seconds
+            end: end of the range in epoch seconds
+
+        Return:
+            True if the range is within the span puuid's history is complete for
+        """
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT start_time, end_time FROM history_coverage WHERE puuid = ?", (puuid,)).fetchone()
+        return row is not None and row[0] <= int(start) and int(end) <= row[1]
+
+    def match_ids(self, puuid: str, start: float, end: float) -> List[str]:
+        """
+        Return the ids of the stored matches puuid started between start and end, newest first
+
+        Args:
+            puuid: summoner puuid
+            start: start of the range in epoch seconds
+            end: end of the range in epoch seconds
+
+        Return:
+            A list of match ids
+        """
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT match_id FROM participants WHERE puuid = ? AND start_time >= ? AND start_time < ? "
+                "ORDER BY start_time DESC", (puuid, int(start), int(end))).fetchall()
+        return [row[0] for row in rows]
+
+    def matches(self, puuid: str, start: float, end: float, limit: Optional[int] = None) -> List[PastMatch]:
+        """
+        Return the stored matches puuid started between start and end, newest first,
+        rebuilt from their participant rows
+
+        Args:
+            puuid: summoner puuid
+            start: start of the range in epoch seconds
+            end: end of the range in epoch seconds
+            limit: return only the newest limit matches, None for all of them
+
+        Return:
+            A list of past matches
+        """
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT m.match_id, m.start_time, m.end_time, m.duration, p.puuid, p.summoner_name, p.team_id,"
+                " p.win, p.champion, p.kills, p.deaths, p.assists"
+                " FROM (SELECT match_id, start_time FROM participants"
+                "       WHERE puuid = ? AND start_time >= ? AND start_time < ?"
+                "       ORDER BY start_time DESC LIMIT ?) AS mine"
+                " JOIN history_matches AS m ON m.match_id = mine.match_id"
+                " JOIN participants AS p ON p.match_id = mine.match_id"
+                " ORDER BY mine.start_time DESC, m.match_id, p.rowid",
+                (puuid, int(start), int(end), -1 if limit is None else limit)).fetchall()
+
+        matches = []
+        current = None
+        for match_id, start_time, end_time, duration, participant, name, team_id, win, champion, kills, deaths, assists in rows:
+            if current != match_id:
+                current = match_id
+                teams: Dict[int, Team] = {}
+                stats = []
+                matches.append((start_time, end_time, duration, teams, stats))
+            if team_id is not None:
+                team = teams.setdefault(team_id, Team(
+                    team_id, [], None if win is None else bool(win)))
+                team.participants.append(sys.intern(name))
+            if champion is not None:
+                stats.append(ParticipantStats(
+                    sys.intern(participant), sys.intern(champion), kills, deaths, assists))
+
+        return [PastMatch(datetime.fromtimestamp(start_time), datetime.fromtimestamp(end_time),
+                          timedelta(seconds=duration), list(teams.values()), stats)
+                for start_time, end_time, duration, teams, stats in matches]
+
+    def totals(self, puuid: str, start: float, end: float) -> Dict[str, int]:
+        """
+        Return what puuid played between start and end, summed in the database
+
+        Args:
+            puuid: summoner puuid
+            start: start of the range in epoch seconds
+            end: end of the range in epoch seconds
+
+        Return:
+            A dictionary of "games", "seconds", "wins", "kills", "deaths" and "assists"
+        """
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(duration), 0), COALESCE(SUM(win), 0), COALESCE(SUM(kills), 0),"
+                " COALESCE(SUM(deaths), 0), COALESCE(SUM(assists), 0)"
+                " FROM participants WHERE puuid = ? AND start_time >= ? AND start_time < ?",
+                (puuid, int(start), int(end))).fetchone()
+        return dict(zip(("games", "seconds", "wins", "kills", "deaths", "assists"), row))
+
+    def close(self) -> None:
+        """
+        Close the database connection
+
+        Args:
+            None
+
+        Return:
+            None
+        """
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+# Shared history used by responses
+history = MatchHistory()
@@ -0,0 +1,200 @@
+import asyncio
+import json
+import pytest
+import responses
+import time
+from datetime import datetime, timedelta
+from match import PastMatch
+from match_history import MatchHistory
+from riot_requests import parse_past_match
+from summoner import Summoner
+from team import Team
+from unittest.mock import patch
+
+kid_orpheus = Summoner("Kid Orpheus", "ii9IPVp8k7MZ33wazChECinTlHDRzgkMMF5VCY-sFRjcnOg",
+                       "pfB-gQaB5s62NVK_YTWT7w6Y1NKIjpdzB38-8rFS2cssK-P6i5lFqqT2iVZHZ_rKmGceVc72TTU9Gw")
+
+
+@pytest.fixture
+def past_match():
+    with open("test/mock_get_matches_by_match_id.json") as f:
+        return parse_past_match(json.load(f))
+
+
+def test_matches_are_rebuilt_from_participant_rows(past_match):
+    """
+    Test a stored match comes back with the same times, teams and participant stats.
+    """
+    history = MatchHistory(":memory:")
+    start = past_match.start_time.timestamp()
+
+    assert history.add(["NA1_1"], [past_match]) == 1
+    assert history.add(["NA1_1"], [past_match]) == 0
+    matches = history.matches(kid_orpheus.puuid, start, start + 1)
+
+    assert len(matches) == 1
+    assert matches[0].start_time == past_match.start_time
+    assert matches[0].end_time == past_match.end_time
+    assert matches[0].duration == past_match.duration
+    assert matches[0].teams == past_match.teams
+    assert matches[0].participants == past_match.participants
+    assert history.matches(kid_orpheus.puuid, start + 1, start + 2) == []
+
+
+def test_totals(past_match):
+    """
+    Test totals() sums games, time played, wins and KDA of the summoner over the range.
+    """
+    history = MatchHistory(":memory:")
+    history.add(["NA1_1"], [past_match])
+    start = past_match.start_time.timestamp()
+    mine = next(stats for stats in past_match.participants
+                if stats.puuid == kid_orpheus.puuid)
+    won = next(team.win for team in past_match.teams
+               if "Kid Orpheus" in team.participants)
+
+    totals = history.totals(kid_orpheus.puuid, start, start + 1)
+
+    assert totals == {"games": 1, "seconds": int(past_match.duration.total_seconds()), "wins": int(won),
+                      "kills": mine.kills, "deaths": mine.deaths, "assists": mine.assists}
+    assert history.totals("nobody", start, start + 1)["games"] == 0
+
+
+def test_match_without_stats_is_listed_under_puuid():
+    """
+    Test a match cached before participant stats were kept is found from the summoner who listed it.
+    """
+    history = MatchHistory(":memory:")
+    match = PastMatch(datetime(2023, 4, 3, 23, 7, 19), datetime(2023, 4, 3, 23, 24, 42),
+                      timedelta(minutes=17, seconds=22), [Team(100, ["Kid Orpheus"], True)])
+    start = match.start_time.timestamp()
+
+    history.add(["NA1_1"], [match], "puuid")
+
+    assert history.match_ids("puuid", start, start + 1) == ["NA1_1"]
+    assert history.matches("puuid", start, start + 1)[0].participants == ()
+
+
+def test_bare_match_gains_participants(past_match):
+    """
+    Test a match first stored without stats gets its participant rows once a copy with stats
+    is added, and a later copy without stats does not wipe them.
+    """
+    history = MatchHistory(":memory:")
+    bare = PastMatch(past_match.start_time, past_match.end_time, past_match.duration, past_match.teams)
+    start = past_match.start_time.timestamp()
+
+    history.add(["NA1_1"], [bare], kid_orpheus.puuid)
+    assert history.add(["NA1_1"], [past_match]) == 0
+    history.add(["NA1_1"], [bare], kid_orpheus.puuid)
+
+    match = history.matches(kid_orpheus.puuid, start, start + 1)[0]
+    assert match.participants == past_match.participants
+    assert history.totals(kid_orpheus.puuid, start, start + 1)["games"] == 1
+
+
+def test_coverage_merges_overlapping_spans():
+    """
+    Test ingested spans that overlap merge, and a range is covered only inside the merged span.
+    """
+    history = MatchHistory(":memory:")
+    history.ingest("puuid", 100, 200, [], [])
+    history.ingest("puuid", 150, 300, [], [])
+
+    assert history.covers("puuid", 100, 300)
+    assert not history.covers("puuid", 50, 300)
+
+    # A newer span that does not touch the recorded one replaces it
+    history.ingest("puuid", 400, 500, [], [])
+    assert history.covers("puuid", 400, 500)
+    assert not history.covers("puuid", 100, 200)
+
+
+def test_game_running_when_listed_is_found_later(past_match):
+    """
+    Test a game still running when a range was first listed, and so not listed by Riot,
+    is counted once a later query lists it.
+    """
+    now = time.time()
+    start = now - 60 * 60
+    recent = PastMatch(datetime.fromtimestamp(now - 30 * 60), datetime.fromtimestamp(now),
+                       past_match.duration, past_match.teams, past_match.participants)
+    finished = []
+
+    async def get_summoners_by_name(summoner_name, platform=None):
+        return kid_orpheus
+
+    async def iter_match_ids_by_puuid(puuid, start_time=None, end_time=None, platform=None):
+        for match_id in finished:
+            yield match_id
+
+    async def fetch_match(match_id):
+        return recent
+
+    with patch("riot_requests_async.get_summoners_by_name", get_summoners_by_name), \
+            patch("riot_requests_async.iter_match_ids_by_puuid", iter_match_ids_by_puuid), \
+            patch("riot_requests_async._fetch_match_by_match_id", fetch_match):
+        before = asyncio.run(responses.playtime("Kid Orpheus", start, now))
+        finished.append("NA1_1")
+        after = asyncio.run(responses.playtime("Kid Orpheus", start, now))
+
+    assert before.startswith("Kid Orpheus played 0 games")
+    assert after.startswith("Kid Orpheus played 1 games")
+
+
+def test_history_report_reads_covered_range_locally(past_match):
+    """
+    Test a report over a range fetches from Riot once, and a second report of the range is a local read.
+    """
+    listed = []
+    start = past_match.start_time.timestamp() - 60 * 60
+    end = start + 7 * 24 * 60 * 60
+
+    async def get_summoners_by_name(summoner_name, platform=None):
+        return kid_orpheus
+
+    async def iter_match_ids_by_puuid(puuid, start_time=None, end_time=None, platform=None):
+        listed.append((start_time, end_time))
+        yield "NA1_1"
+
+    async def fetch_match(match_id):
+        return past_match
+
+    with patch("riot_requests_async.get_summoners_by_name", get_summoners_by_name), \
+            patch("riot_requests_async.iter_match_ids_by_puuid", iter_match_ids_by_puuid), \
+            patch("riot_requests_async._fetch_match_by_match_id", fetch_match):
+        first = asyncio.run(responses.history_report("Kid Orpheus", start, end))
+        second = asyncio.run(responses.history_report("Kid Orpheus", start, end))
+        played = asyncio.run(responses.playtime("Kid Orpheus", start, end))
+
+    assert listed == [(start, end)]
+    assert first.number_of_matches == second.number_of_matches == 1
+    assert played.startswith("Kid Orpheus played 1 games (0h 17m)")
+
+
+def test_window_report_covers_the_window_ending_now(past_match):
+    """
+    Test a season report covers the 91 days up to now in week buckets.
+    """
+    listed = []
+    now = past_match.start_time.timestamp() + 24 * 60 * 60
+
+    async def get_summoners_by_name(summoner_name, platform=None):
+        return kid_orpheus
+
+    async def iter_match_ids_by_puuid(puuid, start_time=None, end_time=None, platform=None):
+        listed.append(start_time)
+        yield "NA1_1"
+
+    async def fetch_match(match_id):
+        return past_match
+
+    with patch("riot_requests_async.get_summoners_by_name", get_summoners_by_name), \
+            patch("riot_requests_async.iter_match_ids_by_puuid", iter_match_ids_by_puuid), \
+            patch("riot_requests_async._fetch_match_by_match_id", fetch_match), \
+            patch("time.time", return_value=now):
+        report = asyncio.run(responses.window_report("Kid Orpheus", "season"))
+
+    assert listed == [now - 91 * 24 * 60 * 60]
+    assert report.bucket == "week"
+    assert report.number_of_matches == 1
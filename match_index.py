@@ -0,0 +1,143 @@
+import metrics
+import os
+import threading
+from collections import OrderedDict
+from match import PastMatch
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Number of parsed matches kept in memory
+match_index_max_entries = int(os.getenv('MATCH_INDEX_MAX_ENTRIES', '20000'))
+
+
+class MatchIndex():
+    """
+    In-memory index of parsed matches keyed by match id, shared by every report,
+    with a reverse index from puuid to the matches that puuid played in.
+    The reverse index is built from each match's participants, so a match played by
+    several tracked summoners is fetched, parsed and held once and found from any of them.
+    The least recently used matches are dropped once max_entries is exceeded.
+
+    === Instance Attributes ===
+    max_entries: Maximum number of matches kept
+    """
+    max_entries: int
+
+    def __init__(self, max_entries: int = match_index_max_entries) -> None:
+        """
+        Initialize an empty MatchIndex object
+
+        Args:
+            max_entries: Maximum number of matches kept
+
+        Return:
+            None
+        """
+        self.max_entries = max_entries
+        self._matches: OrderedDict[str, PastMatch] = OrderedDict()
+        # puuid -> {match_id: start time in epoch seconds}
+        self._by_puuid: Dict[str, Dict[str, float]] = {}
+        # match_id -> puuids it is listed under, so eviction can unlist it
+        self._puuids: Dict[str, Tuple[str, ...]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, match_id: str) -> Optional[PastMatch]:
+        """
+        Return the match with match_id, or None if it is not indexed
+
+        Args:
+            match_id: match id
+
+        Return:
+            The past match, or None
+        """
+        with self._lock:
+            match = self._matches.get(match_id)
+            if match is not None:
+                self._matches.move_to_end(match_id)
+        metrics.cache_requests_total.inc(
+            cache="match_index", result="miss" if match is None else "hit")
+        return match
+
+    def add(self, match_id: str, match: PastMatch, puuids: Iterable[str] = ()) -> None:
+        """
+        Index match under every participant's puuid and under puuids.
+        Adding a match again only lists it under puuids it was not listed under yet.
+
+        Args:
+            match_id: match id
+            match: the past match
+            puuids: extra puuids to list the match under, e.g. the summoner whose
+                    match list it came from when the match has no participant stats
+
+        Return:
+            None
+        """
+        start_time = match.start_time.timestamp()
+        with self._lock:
+            listed = self._puuids.get(match_id, ())
+            new = [puuid for puuid in dict.fromkeys(
+                [stats.puuid for stats in match.participants] + list(puuids)) if puuid not in listed]
+
+            self._matches[match_id] = match
+            self._matches.move_to_end(match_id)
+            for puuid in new:
+                self._by_puuid.setdefault(puuid, {})[match_id] = start_time
+            if new:
+                self._puuids[match_id] = listed + tuple(new)
+
+            while len(self._matches) > self.max_entries:
+                evicted, _ = self._matches.popitem(last=False)
+                for puuid in self._puuids.pop(evicted, ()):
+                    matches = self._by_puuid[puuid]
+                    del matches[evicted]
+                    if not matches:
+                        del self._by_puuid[puuid]
+
+    def match_ids(self, puuid: str, start: Optional[float] = None, end: Optional[float] = None) -> List[str]:
+        """
+        Return the ids of the indexed matches puuid played that started between start and end, newest first
+
+        Args:
+            puuid: summoner puuid
+            start: start of the range in epoch seconds, None for no lower bound
+            end: end of the range in epoch seconds, None for no upper bound
+
+        Return:
+            A list of match ids
+        """
+        with self._lock:
+            matches = list(self._by_puuid.get(puuid, {}).items())
+        return [match_id for match_id, start_time in sorted(matches, key=lambda item: item[1], reverse=True)
+                if (start is None or start_time >= start) and (end is None or start_time < end)]
+
+    def matches(self, puuid: str, start: Optional[float] = None, end: Optional[float] = None) -> List[PastMatch]:
+        """
+        Return the indexed matches puuid played that started between start and end, newest first
+
+        Args:
+            puuid: summoner puuid
+            start: start of the range in epoch seconds, None for no lower bound
+            end: end of the range in epoch seconds, None for no upper bound
+
+        Return:
+            A list of past matches
+        """
+        match_ids = self.match_ids(puuid, start, end)
+        with self._lock:
+            return [self._matches[match_id] for match_id in match_ids if match_id in self._matches]
+
+    def __len__(self) -> int:
+        """
+        Return the number of matches indexed
+
+        Args:
+            None
+
+        Return:
+            The number of matches indexed
+        """
+        return len(self._matches)
+
+
+# Shared index used by riot_requests and riot_requests_async
+index = MatchIndex()
@@ -0,0 +1,120 @@
+import asyncio
+import json
+import responses
+import time
+from datetime import datetime, timedelta
+from match import PastMatch
+from match_index import MatchIndex
+from match_table import MatchTable
+from participant import ParticipantStats
+from riot_requests import parse_past_match
+from summoner import Summoner
+from team import Team
+from unittest.mock import patch
+
+kid_orpheus = Summoner("Kid Orpheus", "ii9IPVp8k7MZ33wazChECinTlHDRzgkMMF5VCY-sFRjcnOg",
+                       "pfB-gQaB5s62NVK_YTWT7w6Y1NKIjpdzB38-8rFS2cssK-P6i5lFqqT2iVZHZ_rKmGceVc72TTU9Gw")
+aeras = Summoner("Aeras", "aeras-id",
+                 "1sy67hhvsVH1g5JdZ2rd7HAi4upgqMExwII78-eZ_4nSrijJJrvLMJQxJL7wyM8i-mzBhbUOxluD0Q")
+
+
+def match_at(start: float, puuids=()) -> PastMatch:
+    return PastMatch(datetime.fromtimestamp(start), datetime.fromtimestamp(start + 1200),
+                     timedelta(minutes=20), [Team(100, ["Aeras"], True)],
+                     [ParticipantStats(puuid, "Ahri", 1, 2, 3) for puuid in puuids])
+
+
+def test_reverse_index_is_built_from_participants():
+    """
+    Test a match is found from the puuid of every participant, newest first.
+    """
+    index = MatchIndex()
+    index.add("NA1_1", match_at(1000, ["a", "b"]))
+    index.add("NA1_2", match_at(2000, ["b"]))
+
+    assert index.match_ids("a") == ["NA1_1"]
+    assert index.match_ids("b") == ["NA1_2", "NA1_1"]
+    assert index.match_ids("b", start=1500) == ["NA1_2"]
+    assert index.match_ids("b", end=1500) == ["NA1_1"]
+    assert index.match_ids("c") == []
+    assert index.get("NA1_1") is index.matches("a")[0]
+
+
+def test_extra_puuids_are_merged():
+    """
+    Test adding a match again lists it under the extra puuids without listing it twice.
+    """
+    index = MatchIndex()
+    match = match_at(1000)
+    index.add("NA1_1", match)
+    index.add("NA1_1", match, ("a",))
+    index.add("NA1_1", match, ("a",))
+
+    assert index.match_ids("a") == ["NA1_1"]
+    assert len(index) == 1
+
+
+def test_eviction_unlists_matches():
+    """
+    Test the least recently used match is dropped from both indexes once max_entries is exceeded.
+    """
+    index = MatchIndex(max_entries=2)
+    index.add("NA1_1", match_at(1000, ["a"]))
+    index.add("NA1_2", match_at(2000, ["a"]))
+    index.get("NA1_1")
+    index.add("NA1_3", match_at(3000, ["a"]))
+
+    assert index.get("NA1_2") is None
+    assert index.match_ids("a") == ["NA1_3", "NA1_1"]
+
+
+def test_weekly_reports_fetch_shared_matches_once():
+    """
+    Test a batch of reports fetches a match played by several summoners once,
+    and gives each summoner only the matches they played.
+    """
+    with open("test/mock_get_matches_by_match_id.json") as f:
+        recorded = json.load(f)
+    start = int(time.time() - 24 * 60 * 60) * 1000
+
+    def payload(offset: int, absent: str = None) -> dict:
+        info = {**recorded["info"], "gameStartTimestamp": start + offset,
+                "gameEndTimestamp": start + offset + 1000 * 1000}
+        # A stranger takes the absent summoner's place
+        info["participants"] = [{**participant, "puuid": "stranger"} if participant["puuid"] == absent
+                                else participant for participant in info["participants"]]
+        return {**recorded, "info": info}
+
+    # Both summoners played NA1_shared, each also played one match without the other
+    payloads = {"NA1_shared": payload(0),
+                "NA1_kid": payload(60 * 60 * 1000, aeras.puuid),
+                "NA1_aeras": payload(2 * 60 * 60 * 1000, kid_orpheus.puuid)}
+    lists = {kid_orpheus.puuid: ["NA1_kid", "NA1_shared"],
+             aeras.puuid: ["NA1_aeras", "NA1_shared"]}
+    fetched = []
+
+    async def get_summoners_by_name(summoner_name, platform=None):
+        return kid_orpheus if summoner_name == "Kid Orpheus" else aeras
+
+    async def iter_match_ids_by_puuid(puuid, start_time=None, end_time=None, platform=None):
+        for match_id in lists[puuid]:
+            yield match_id
+
+    async def fetch_match(match_id):
+        fetched.append(match_id)
+        return parse_past_match(payloads[match_id])
+
+    with patch("riot_requests_async.get_summoners_by_name", get_summoners_by_name), \
+            patch("riot_requests_async.iter_match_ids_by_puuid", iter_match_ids_by_puuid), \
+            patch("riot_requests_async._fetch_match_by_match_id", fetch_match):
+        kid_report, aeras_report = asyncio.run(
+            responses.weekly_reports(["Kid Orpheus", "Aeras"]))
+
+    assert sorted(fetched) == ["NA1_aeras", "NA1_kid", "NA1_shared"]
+    assert kid_report.number_of_matches == 2
+    assert aeras_report.number_of_matches == 2
+    assert sorted(match.start_time for match in kid_report.matches) == \
+        sorted(parse_past_match(payloads[match_id]).start_time for match_id in ("NA1_kid", "NA1_shared"))
+    # Both reports keep their matches in tables interning names in one shared index
+    assert isinstance(kid_report.matches, MatchTable)
+    assert kid_report.matches.index is aeras_report.matches.index
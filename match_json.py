@@ -0,0 +1,26 @@
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:
+    # orjson is optional, the standard library decoder is used without it
+    orjson = None
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    Decode a JSON document with orjson when it is installed, otherwise with the json module
+
+    Args:
+        data: the raw JSON body
+
+    Return:
+        The decoded document
+
+    Raises:
+        ValueError: if data is not valid JSON
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
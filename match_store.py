@@ -0,0 +1,208 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+import match_json
+import metrics
+from match import PastMatch
+from participant import ParticipantStats
+from team import Team
+from typing import Dict, Optional
+
+# Location and size cap of the on-disk match cache
+match_store_path = os.getenv('MATCH_STORE_PATH', 'match_cache.sqlite3')
+match_store_max_entries = int(os.getenv('MATCH_STORE_MAX_ENTRIES', '10000'))
+
+
+def serialize_match(match: PastMatch) -> str:
+    """
+    Return a JSON string holding everything needed to rebuild match
+
+    Args:
+        match: a past match
+
+    Return:
+        The JSON representation of match
+    """
+    return json.dumps({
+        "start_time": match.start_time.timestamp(),
+        "end_time": match.end_time.timestamp(),
+        "duration": match.duration.total_seconds(),
+        "teams": [{"id": team.id, "participants": team.participants, "win": team.win}
+                  for team in match.teams],
+        # Stats as compact [puuid, champion, kills, deaths, assists] rows
+        "stats": [[stats.puuid, stats.champion, stats.kills, stats.deaths, stats.assists]
+                  for stats in match.participants],
+    })
+
+
+def deserialize_match(data: str) -> PastMatch:
+    """
+    Return the past match stored in data
+
+    Args:
+        data: a JSON string made by serialize_match
+
+    Return:
+        The past match
+    """
+    match_info = match_json.loads(data)
+    teams = [Team(team["id"], [sys.intern(name) for name in team["participants"]], team["win"])
+             for team in match_info["teams"]]
+    # Matches stored before stats were kept have none
+    stats = [ParticipantStats(sys.intern(puuid), sys.intern(champion), kills, deaths, assists)
+             for puuid, champion, kills, deaths, assists in match_info.get("stats", [])]
+
+    return PastMatch(datetime.fromtimestamp(match_info["start_time"]),
+                     datetime.fromtimestamp(match_info["end_time"]),
+                     timedelta(seconds=match_info["duration"]),
+                     teams, stats)
+
+
+class MatchStore():
+    """
+    Persistent SQLite cache of finished matches keyed by match id.
+    The least recently used matches are evicted once max_entries is exceeded.
+    Hits only note their access time in memory, it is written on the next put() or close().
+
+    === Instance Attributes ===
+    path: SQLite database file, or ":memory:"
+    max_entries: Maximum number of matches kept
+    """
+    path: str
+    max_entries: int
+
+    def __init__(self, path: str = match_store_path, max_entries: int = match_store_max_entries) -> None:
+        """
+        Initialize a MatchStore object. The database is opened on first use.
+
+        Args:
+            path: SQLite database file, or ":memory:"
+            max_entries: Maximum number of matches kept
+
+        Return:
+            None
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self._connection = None
+        self._accessed: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Return the database connection, creating the table on first use
+
+        Args:
+            None
+
+        Return:
+            The database connection
+        """
+        if self._connection is None:
+            self._connection = sqlite3.connect(
+                self.path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS matches ("
+                "match_id TEXT PRIMARY KEY, data TEXT NOT NULL, last_access REAL NOT NULL)")
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS matches_last_access ON matches (last_access)")
+        return self._connection
+
+    def get(self, match_id: str) -> Optional[PastMatch]:
+        """
+        Return the cached match with match_id, or None if it is not cached
+
+        Args:
+            match_id: match id
+
+        Return:
+            The cached match or None
+        """
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT data FROM matches WHERE match_id = ?", (match_id,)).fetchone()
+            metrics.cache_requests_total.inc(
+                cache="match", result="miss" if row is None else "hit")
+            if row is None:
+                return None
+            self._accessed[match_id] = time.time()
+
+        return deserialize_match(row[0])
+
+    def put(self, match_id: str, match: PastMatch) -> None:
+        """
+        Cache match under match_id and evict the least recently used matches above max_entries
+
+        Args:
+            match_id: match id
+            match: the past match
+
+        Return:
+            None
+        """
+        with self._lock:
+            connection = self._connect()
+            self._flush_accesses(connection)
+            connection.execute(
+                "INSERT OR REPLACE INTO matches (match_id, data, last_access) VALUES (?, ?, ?)",
+                (match_id, serialize_match(match), time.time()))
+            connection.execute(
+                "DELETE FROM matches WHERE match_id IN ("
+                "SELECT match_id FROM matches ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,))
+            connection.commit()
+
+    def _flush_accesses(self, connection: sqlite3.Connection) -> None:
+        """
+        Write the access times noted by get() in one batch, the caller holds the lock and commits
+
+        Args:
+            connection: the database connection
+
+        Return:
+            None
+        """
+        if self._accessed:
+            connection.executemany(
+                "UPDATE matches SET last_access = ? WHERE match_id = ?",
+                [(last_access, match_id) for match_id, last_access in self._accessed.items()])
+            self._accessed.clear()
+
+    def __len__(self) -> int:
+        """
+        Return the number of cached matches
+
+        Args:
+            None
+
+        Return:
+            The number of cached matches
+        """
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM matches").fetchone()[0]
+
+    def close(self) -> None:
+        """
+        Close the database connection
+
+        Args:
+            None
+
+        Return:
+            None
+        """
+        with self._lock:
+            if self._connection is not None:
+                self._flush_accesses(self._connection)
+                self._connection.commit()
+                self._connection.close()
+                self._connection = None
+
+
+# Shared store used by riot_requests and riot_requests_async
+store = MatchStore()
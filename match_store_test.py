@@ -0,0 +1,112 @@
+import json
+import pytest
+from datetime import datetime, timedelta
+from match_store import MatchStore
+from match import PastMatch
+from metrics import Counter
+from participant import ParticipantStats
+from riot_requests import get_matches_by_match_id
+from team import Team
+from unittest.mock import patch
+
+teams = [Team(100, ['Aeras', 'Kid Orpheus'], False),
+         Team(200, ['Raymmp', 'uselessbody'], True)]
+
+past_match = PastMatch(datetime(2023, 4, 3, 23, 7, 19), datetime(2023, 4, 3, 23, 24, 42),
+                       timedelta(minutes=17, seconds=22), teams)
+
+
+@pytest.fixture
+def mock_get_matches_by_match_id():
+    with open("test/mock_get_matches_by_match_id.json") as f:
+        return json.load(f)
+
+
+def test_put_and_get():
+    """
+    Test a match stored with put() comes back unchanged from get().
+    """
+    store = MatchStore(":memory:")
+    store.put("NA1_1", past_match)
+    match = store.get("NA1_1")
+
+    assert match.start_time == past_match.start_time
+    assert match.end_time == past_match.end_time
+    assert match.duration == past_match.duration
+    assert match.teams == past_match.teams
+    assert store.get("NA1_2") is None
+
+
+def test_put_and_get_keeps_stats():
+    """
+    Test participant stats survive the store, and matches stored without them load with none.
+    """
+    store = MatchStore(":memory:")
+    stats = [ParticipantStats("puuid", "Mordekaiser", 15, 10, 16)]
+    store.put("NA1_1", PastMatch(past_match.start_time, past_match.end_time,
+                                 past_match.duration, teams, stats))
+    store.put("NA1_2", past_match)
+
+    assert list(store.get("NA1_1").participants) == stats
+    assert store.get("NA1_2").participants == ()
+
+
+def test_eviction_keeps_recently_used():
+    """
+    Test the least recently used match is evicted once max_entries is exceeded.
+    """
+    store = MatchStore(":memory:", max_entries=2)
+    store.put("NA1_1", past_match)
+    store.put("NA1_2", past_match)
+    store.get("NA1_1")
+    store.put("NA1_3", past_match)
+
+    assert len(store) == 2
+    assert store.get("NA1_1") is not None
+    assert store.get("NA1_2") is None
+
+
+def test_hits_write_last_access_on_put():
+    """
+    Test a hit does not write to the database, and its access time is written by the next put().
+    """
+    store = MatchStore(":memory:")
+    store.put("NA1_1", past_match)
+    changes = store._connect().total_changes
+    store.get("NA1_1")
+
+    assert store._connect().total_changes == changes
+    assert "NA1_1" in store._accessed
+    store.put("NA1_2", past_match)
+    assert store._accessed == {}
+
+
+def test_get_matches_by_match_id_uses_store(mock_get_matches_by_match_id):
+    """
+    Test get_matches_by_match_id() only calls Riot for matches that are not cached.
+    """
+    with patch("requests.Session.get") as mock_get:
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.content = json.dumps(
+            mock_get_matches_by_match_id).encode()
+        first = get_matches_by_match_id("NA1_4620414214")
+        second = get_matches_by_match_id("NA1_4620414214")
+
+    assert mock_get.call_count == 1
+    assert first.teams == second.teams
+
+
+def test_match_store_counts_hits_and_misses():
+    """
+    Test MatchStore.get() counts a hit for a stored match and a miss otherwise.
+    """
+    counter = Counter("cache_requests_total", "Lookups", ("cache", "result"))
+    store = MatchStore(":memory:")
+    store.put("NA1_1", past_match)
+
+    with patch("metrics.cache_requests_total", counter):
+        store.get("NA1_1")
+        store.get("NA1_2")
+
+    assert counter.value(cache="match", result="hit") == 1
+    assert counter.value(cache="match", result="miss") == 1
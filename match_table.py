@@ -0,0 +1,352 @@
+import threading
+import numpy as np
+from aggregation import MatchArrays
+from datetime import datetime, timedelta
+from match import PastMatch
+from participant import ParticipantStats
+from team import Team
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+
+def ragged_rows(offsets: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the child rows of rows in a ragged column, and how many each row has
+
+    Args:
+        offsets: children of row i are offsets[i]:offsets[i + 1]
+        rows: parent rows
+
+    Return:
+        (child rows in order, number of children of every parent row)
+    """
+    starts = offsets[rows]
+    counts = offsets[rows + 1] - starts
+    # Every child is its parent's first child plus its position among its siblings
+    firsts = np.cumsum(counts) - counts
+    children = np.repeat(starts - firsts, counts) + \
+        np.arange(counts.sum(), dtype=np.int64)
+    return children, counts
+
+
+class ParticipantIndex():
+    """
+    Interns participant names as small integer ids.
+    Tables built with the same index share one copy of every name.
+
+    === Instance Attributes ===
+    names: Participant names by id
+    ids: Participant ids by name
+    """
+    names: List[str]
+    ids: Dict[str, int]
+
+    def __init__(self) -> None:
+        """
+        Initialize an empty ParticipantIndex object
+
+        Return:
+            None
+        """
+        self.names = []
+        self.ids = {}
+        self._lock = threading.Lock()
+
+    def intern(self, name: str) -> int:
+        """
+        Return the id of name, assigning the next id to a new name
+
+        Args:
+            name: participant name
+
+        Return:
+            The id of name
+        """
+        participant_id = self.ids.get(name)
+        if participant_id is None:
+            with self._lock:
+                participant_id = self.ids.get(name)
+                if participant_id is None:
+                    participant_id = len(self.names)
+                    self.names.append(name)
+                    self.ids[name] = participant_id
+        return participant_id
+
+    def __len__(self) -> int:
+        """
+        Return the number of names interned
+
+        Args:
+            None
+
+        Return:
+            The number of names interned
+        """
+        return len(self.names)
+
+
+class MatchTable(MatchArrays):
+    """
+    Past matches stored column by column in NumPy arrays, so long histories
+    are a handful of arrays instead of millions of small objects.
+    Teams, participants and participant stats are ragged, each match's rows are found through offsets.
+    Indexing a row rebuilds its PastMatch, slicing returns a new table.
+
+    === Instance Attributes ===
+    start_times: Match start times in epoch seconds
+    durations: Match durations in seconds
+    start_stamps: Exact match start times in epoch seconds
+    end_stamps: Exact match end times in epoch seconds
+    team_offsets: Teams of match i are rows team_offsets[i]:team_offsets[i + 1]
+    team_ids: Team id of every team row
+    team_wins: 1 if the team won, 0 if it lost, -1 if unknown
+    participant_offsets: Participants of team row j are participant_offsets[j]:participant_offsets[j + 1]
+    participant_ids: Interned id of every participant
+    index: Names of the participant ids
+    stats_offsets: Participant stats of match i are rows stats_offsets[i]:stats_offsets[i + 1]
+    stats_puuids: Puuid of every stats row, the interned strings themselves
+    stats_champions: Champion of every stats row, the interned strings themselves
+    stats_kda: Kills, deaths and assists of every stats row
+    """
+    start_stamps: np.ndarray
+    end_stamps: np.ndarray
+    team_offsets: np.ndarray
+    team_ids: np.ndarray
+    team_wins: np.ndarray
+    participant_offsets: np.ndarray
+    participant_ids: np.ndarray
+    index: ParticipantIndex
+    stats_offsets: np.ndarray
+    stats_puuids: np.ndarray
+    stats_champions: np.ndarray
+    stats_kda: np.ndarray
+
+    def __init__(self, start_stamps: Sequence[float], end_stamps: Sequence[float], durations: Sequence[int],
+                 team_offsets: Sequence[int], team_ids: Sequence[int], team_wins: Sequence[int],
+                 participant_offsets: Sequence[int], participant_ids: Sequence[int],
+                 index: ParticipantIndex, stats_offsets: Optional[Sequence[int]] = None,
+                 stats_puuids: Sequence[str] = (), stats_champions: Sequence[str] = (),
+                 stats_kda: Sequence[Sequence[int]] = ()) -> None:
+        """
+        Initialize a MatchTable object from its columns
+
+        Args:
+            start_stamps: Exact match start times in epoch seconds
+            end_stamps: Exact match end times in epoch seconds
+            durations: Match durations in seconds
+            team_offsets: Start of every match's team rows, plus the total
+            team_ids: Team id of every team row
+            team_wins: 1 if the team won, 0 if it lost, -1 if unknown
+            participant_offsets: Start of every team row's participants, plus the total
+            participant_ids: Interned id of every participant
+            index: Names of the participant ids
+            stats_offsets: Start of every match's participant stats, plus the total, None if no match has any
+            stats_puuids: Puuid of every stats row
+            stats_champions: Champion of every stats row
+            stats_kda: (kills, deaths, assists) of every stats row
+
+        Return:
+            None
+        """
+        self.start_stamps = np.asarray(start_stamps, dtype=np.float64)
+        self.end_stamps = np.asarray(end_stamps, dtype=np.float64)
+        super().__init__(self.start_stamps.astype(np.int64), durations)
+        self.team_offsets = np.asarray(team_offsets, dtype=np.int64)
+        self.team_ids = np.asarray(team_ids, dtype=np.int16)
+        self.team_wins = np.asarray(team_wins, dtype=np.int8)
+        self.participant_offsets = np.asarray(
+            participant_offsets, dtype=np.int64)
+        self.participant_ids = np.asarray(participant_ids, dtype=np.int32)
+        self.index = index
+        self.stats_offsets = np.zeros(len(self.start_stamps) + 1, dtype=np.int64) if stats_offsets is None \
+            else np.asarray(stats_offsets, dtype=np.int64)
+        self.stats_puuids = np.asarray(stats_puuids, dtype=object)
+        self.stats_champions = np.asarray(stats_champions, dtype=object)
+        self.stats_kda = np.asarray(stats_kda, dtype=np.int32).reshape(-1, 3)
+
+    @classmethod
+    def from_matches(cls, matches: List[PastMatch], index: Optional[ParticipantIndex] = None) -> "MatchTable":
+        """
+        Return the table of matches
+
+        Args:
+            matches: a list of past matches
+            index: participant index to intern names in, a new one by default
+
+        Return:
+            A MatchTable object
+        """
+        if index is None:
+            index = ParticipantIndex()
+
+        team_offsets = [0]
+        team_ids = []
+        team_wins = []
+        participant_offsets = [0]
+        participant_ids = []
+        stats_offsets = [0]
+        stats_puuids = []
+        stats_champions = []
+        stats_kda = []
+        for match in matches:
+            for team in match.teams:
+                team_ids.append(team.id)
+                team_wins.append(-1 if team.win is None else int(team.win))
+                participant_ids.extend(index.intern(name)
+                                       for name in team.participants)
+                participant_offsets.append(len(participant_ids))
+            team_offsets.append(len(team_ids))
+            for stats in match.participants:
+                stats_puuids.append(stats.puuid)
+                stats_champions.append(stats.champion)
+                stats_kda.append((stats.kills, stats.deaths, stats.assists))
+            stats_offsets.append(len(stats_puuids))
+
+        return cls([match.start_time.timestamp() for match in matches],
+                   [match.end_time.timestamp() for match in matches],
+                   [int(match.duration.total_seconds()) for match in matches],
+                   team_offsets, team_ids, team_wins, participant_offsets, participant_ids, index,
+                   stats_offsets, stats_puuids, stats_champions, stats_kda)
+
+    def _team_matches(self) -> np.ndarray:
+        """
+        Return the match of every team row
+
+        Args:
+            None
+
+        Return:
+            An array of match rows, one per team row
+        """
+        return np.repeat(np.arange(len(self)), np.diff(self.team_offsets))
+
+    def _participant_teams(self) -> np.ndarray:
+        """
+        Return the team row of every participant
+
+        Args:
+            None
+
+        Return:
+            An array of team rows, one per participant
+        """
+        return np.repeat(np.arange(len(self.team_ids)), np.diff(self.participant_offsets))
+
+    def played(self, name: str) -> np.ndarray:
+        """
+        Return which matches name played in
+
+        Args:
+            name: participant name
+
+        Return:
+            A boolean array, one per match
+        """
+        result = np.zeros(len(self), dtype=bool)
+        participant_id = self.index.ids.get(name)
+        if participant_id is not None:
+            teams = self._participant_teams()[
+                self.participant_ids == participant_id]
+            result[self._team_matches()[teams]] = True
+        return result
+
+    def won(self, name: str) -> np.ndarray:
+        """
+        Return whether name's team won every match
+
+        Args:
+            name: participant name
+
+        Return:
+            An int8 array, one per match: 1 won, 0 lost, -1 did not play or unknown
+        """
+        result = np.full(len(self), -1, dtype=np.int8)
+        participant_id = self.index.ids.get(name)
+        if participant_id is not None:
+            teams = self._participant_teams()[
+                self.participant_ids == participant_id]
+            result[self._team_matches()[teams]] = self.team_wins[teams]
+        return result
+
+    def take(self, rows: Sequence[int]) -> "MatchTable":
+        """
+        Return a table of the matches at rows, in that order
+
+        Args:
+            rows: match rows
+
+        Return:
+            A MatchTable object sharing this table's participant index
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        team_rows, team_counts = ragged_rows(self.team_offsets, rows)
+        participant_rows, participant_counts = ragged_rows(
+            self.participant_offsets, team_rows)
+        stats_rows, stats_counts = ragged_rows(self.stats_offsets, rows)
+
+        return MatchTable(self.start_stamps[rows], self.end_stamps[rows], self.durations[rows],
+                          np.concatenate(([0], np.cumsum(team_counts))),
+                          self.team_ids[team_rows], self.team_wins[team_rows],
+                          np.concatenate(
+                              ([0], np.cumsum(participant_counts))),
+                          self.participant_ids[participant_rows], self.index,
+                          np.concatenate(([0], np.cumsum(stats_counts))), self.stats_puuids[stats_rows],
+                          self.stats_champions[stats_rows], self.stats_kda[stats_rows])
+
+    def match(self, row: int) -> PastMatch:
+        """
+        Return the PastMatch at row
+
+        Args:
+            row: match row
+
+        Return:
+            The past match
+        """
+        teams = []
+        for team in range(self.team_offsets[row], self.team_offsets[row + 1]):
+            participants = self.participant_ids[self.participant_offsets[team]:
+                                                self.participant_offsets[team + 1]]
+            win = int(self.team_wins[team])
+            teams.append(Team(int(self.team_ids[team]),
+                              [self.index.names[participant]
+                                  for participant in participants],
+                              None if win < 0 else bool(win)))
+
+        stats = [ParticipantStats(self.stats_puuids[i], self.stats_champions[i], *map(int, self.stats_kda[i]))
+                 for i in range(self.stats_offsets[row], self.stats_offsets[row + 1])]
+
+        return PastMatch(datetime.fromtimestamp(float(self.start_stamps[row])),
+                         datetime.fromtimestamp(
+                             float(self.end_stamps[row])),
+                         timedelta(seconds=int(self.durations[row])),
+                         teams, stats)
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[PastMatch, "MatchTable"]:
+        """
+        Return the PastMatch at an int key, or a table of the matches in a slice
+
+        Args:
+            key: match row or slice of rows
+
+        Return:
+            A past match or a MatchTable object
+        """
+        if isinstance(key, slice):
+            return self.take(range(*key.indices(len(self))))
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("match row out of range")
+        return self.match(key)
+
+    def __iter__(self) -> Iterator[PastMatch]:
+        """
+        Return an iterator of the table's matches, rebuilt one at a time
+
+        Args:
+            None
+
+        Return:
+            An iterator of past matches
+        """
+        return (self.match(row) for row in range(len(self)))
@@ -0,0 +1,106 @@
+import json
+import pytest
+from datetime import timedelta
+from match_table import MatchTable, ParticipantIndex
+from riot_requests import parse_past_match
+from summoner import Summoner
+from team import Team
+from weekly_report import WeeklyReport
+
+summoner = Summoner("Kid Orpheus", "ii9IPVp8k7MZ33wazChECinTlHDRzgkMMF5VCY-sFRjcnOg",
+                    "pfB-gQaB5s62NVK_YTWT7w6Y1NKIjpdzB38-8rFS2cssK-P6i5lFqqT2iVZHZ_rKmGceVc72TTU9Gw")
+
+
+@pytest.fixture
+def past_match():
+    with open("test/mock_get_matches_by_match_id.json") as f:
+        return parse_past_match(json.load(f))
+
+
+def test_dtos_have_no_instance_dict(past_match):
+    """
+    Test the DTOs are slotted and keep no per-instance __dict__.
+    """
+    for dto in (summoner, past_match, past_match.teams[0]):
+        assert not hasattr(dto, "__dict__")
+
+
+def test_from_matches_round_trips(past_match):
+    """
+    Test a match rebuilt from its table row equals the original.
+    """
+    table = MatchTable.from_matches([past_match])
+    match = table[0]
+
+    assert len(table) == 1
+    assert str(match) == str(past_match)
+    assert match.teams == past_match.teams
+    assert match.duration == past_match.duration
+    assert table.start_times[0] == int(past_match.start_time.timestamp())
+    assert match.participants == past_match.participants
+
+
+def test_participants_are_interned_once(past_match):
+    """
+    Test tables sharing an index store each participant name once.
+    """
+    index = ParticipantIndex()
+    first = MatchTable.from_matches([past_match] * 3, index)
+    second = MatchTable.from_matches([past_match], index)
+
+    names = sum(len(team.participants) for team in past_match.teams)
+    assert len(index) == names
+    assert len(first.participant_ids) == 3 * names
+    assert first.participant_ids.max() < names
+    assert second.index is first.index
+
+
+def test_won_and_played(past_match):
+    """
+    Test win flags are looked up per participant without rebuilding matches.
+    """
+    lost = type(past_match)(past_match.start_time, past_match.end_time, past_match.duration,
+                            [Team(team.id, team.participants, not team.win) for team in past_match.teams])
+    table = MatchTable.from_matches([past_match, lost])
+    player = past_match.teams[0].participants[0]
+    won = 1 if past_match.teams[0].win else 0
+
+    assert table.won(player).tolist() == [won, 1 - won]
+    assert table.played(player).tolist() == [True, True]
+    assert table.won("nobody").tolist() == [-1, -1]
+    assert table.played("nobody").tolist() == [False, False]
+
+
+def test_slices_keep_rows_in_order(past_match):
+    """
+    Test slicing gathers the ragged team and participant rows of the selected matches.
+    """
+    later = type(past_match)(past_match.start_time + timedelta(hours=1), past_match.end_time + timedelta(hours=1),
+                             past_match.duration, [Team(100, ["a"], True), Team(200, ["b", "c"], False)])
+    table = MatchTable.from_matches([past_match, later])
+
+    reversed_table = table[::-1]
+
+    assert [match.teams for match in reversed_table] == [later.teams, past_match.teams]
+    assert reversed_table.team_offsets.tolist() == [0, 2, 4]
+    assert reversed_table.participant_offsets[:3].tolist() == [0, 1, 3]
+    assert [match.participants for match in reversed_table] == [(), past_match.participants]
+    assert reversed_table.stats_offsets.tolist() == [0, 0, len(past_match.participants)]
+    assert len(table[5:]) == 0
+    with pytest.raises(IndexError):
+        table[2]
+
+
+def test_weekly_report_consumes_table(past_match):
+    """
+    Test a WeeklyReport built from a MatchTable aggregates like one built from a list.
+    """
+    start = past_match.start_time.timestamp() - 60 * 60
+    from_list = WeeklyReport(summoner, [past_match], start)
+    from_table = WeeklyReport(
+        summoner, MatchTable.from_matches([past_match]), start)
+
+    assert from_table.number_of_matches == 1
+    assert from_table.buckets.counts.tolist() == from_list.buckets.counts.tolist()
+    assert from_table.buckets.total_seconds.tolist() == from_list.buckets.total_seconds.tolist()
+    assert str(from_table) == str(from_list)
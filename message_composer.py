@@ -0,0 +1,230 @@
+import asyncio
+import metrics
+import os
+import time
+from rate_limiter import TokenBucket
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+
+# Discord message limits
+message_char_limit = 2000
+embed_description_limit = 4096
+embed_total_limit = 6000
+embeds_per_message = 10
+files_per_message = 10
+
+# Outbound pace per destination, Discord allows bursts of about 5 messages per channel
+discord_messages_per_second = float(
+    os.getenv('DISCORD_MESSAGES_PER_SECOND', '1'))
+discord_message_burst = int(os.getenv('DISCORD_MESSAGE_BURST', '5'))
+discord_max_retries = int(os.getenv('DISCORD_MAX_RETRIES', '3'))
+
+# Seconds to wait after a 429 that carries no retry_after
+default_retry_after = 1.0
+
+
+def split_block(block: str, limit: int) -> List[str]:
+    """
+    Split block into pieces of at most limit characters, on line breaks where possible
+
+    Args:
+        block: text to split
+        limit: maximum characters per piece
+
+    Return:
+        A list of pieces
+    """
+    if len(block) <= limit:
+        return [block]
+
+    pieces = []
+    current = ""
+    for line in block.splitlines(keepends=True):
+        # A single line over the limit is cut wherever it has to be
+        while len(line) > limit:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(line[:limit])
+            line = line[limit:]
+        if len(current) + len(line) > limit:
+            pieces.append(current)
+            current = ""
+        current += line
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def pack_blocks(blocks: List[str], limit: int, separator: str = "\n") -> List[str]:
+    """
+    Pack blocks into as few texts of at most limit characters as possible, keeping their order.
+    Blocks are only split when one alone is over the limit.
+
+    Args:
+        blocks: texts to pack, e.g. one match summary each
+        limit: maximum characters per text
+        separator: text put between two blocks of the same text
+
+    Return:
+        A list of packed texts
+    """
+    packed = []
+    current = None
+    for block in blocks:
+        for piece in split_block(block, limit):
+            if current is not None and len(current) + len(separator) + len(piece) <= limit:
+                current += separator + piece
+            else:
+                if current is not None:
+                    packed.append(current)
+                current = piece
+    if current is not None:
+        packed.append(current)
+    return packed
+
+
+def pack_messages(blocks: List[str], limit: int = message_char_limit) -> List[str]:
+    """
+    Pack blocks into as few plain text messages as fit Discord's message limit
+
+    Args:
+        blocks: texts to pack
+        limit: maximum characters per message
+
+    Return:
+        A list of message contents
+    """
+    return pack_blocks(blocks, limit)
+
+
+def pack_embeds(blocks: List[str], description_limit: int = embed_description_limit,
+                total_limit: int = embed_total_limit, per_message: int = embeds_per_message) -> List[List[str]]:
+    """
+    Pack blocks into embed descriptions, then group the embeds into as few messages as
+    fit Discord's per-embed, per-message character and embed count limits
+
+    Args:
+        blocks: texts to pack
+        description_limit: maximum characters per embed description
+        total_limit: maximum characters of all embeds of a message
+        per_message: maximum embeds per message
+
+    Return:
+        A list of messages, each a list of embed descriptions
+    """
+    descriptions = pack_blocks(
+        blocks, min(description_limit, total_limit))
+
+    messages = []
+    current = []
+    current_length = 0
+    for description in descriptions:
+        if current and (len(current) == per_message or current_length + len(description) > total_limit):
+            messages.append(current)
+            current = []
+            current_length = 0
+        current.append(description)
+        current_length += len(description)
+    if current:
+        messages.append(current)
+    return messages
+
+
+class OutboundQueue():
+    """
+    Sends Discord messages in order, one at a time per destination, paced by a token bucket.
+    A send rejected with 429 waits for Discord's retry_after and is retried.
+
+    === Instance Attributes ===
+    messages_per_second: Sustained messages per second per destination
+    burst: Messages a destination may send back to back
+    max_retries: Times a rate limited send is retried
+    pending: Number of sends waiting or in flight
+    """
+    messages_per_second: float
+    burst: int
+    max_retries: int
+    pending: int
+
+    def __init__(self, messages_per_second: float = discord_messages_per_second,
+                 burst: int = discord_message_burst, max_retries: int = discord_max_retries) -> None:
+        """
+        Initialize an OutboundQueue object
+
+        Args:
+            messages_per_second: Sustained messages per second per destination
+            burst: Messages a destination may send back to back
+            max_retries: Times a rate limited send is retried
+
+        Return:
+            None
+        """
+        self.messages_per_second = messages_per_second
+        self.burst = burst
+        self.max_retries = max_retries
+        self.pending = 0
+        self._buckets: Dict[Hashable, TokenBucket] = {}
+        self._locks: Dict[Hashable, asyncio.Lock] = {}
+
+    def _bucket(self, destination: Hashable) -> TokenBucket:
+        """
+        Return the token bucket of destination, creating it on first use
+
+        Args:
+            destination: channel or interaction the messages go to
+
+        Return:
+            The token bucket of destination
+        """
+        bucket = self._buckets.get(destination)
+        if bucket is None:
+            bucket = TokenBucket(
+                self.burst, self.burst / self.messages_per_second)
+            self._buckets[destination] = bucket
+        return bucket
+
+    async def send(self, destination: Hashable, send: Callable[..., Awaitable], *args, **kwargs) -> Any:
+        """
+        Await send(*args, **kwargs) once it is destination's turn and its bucket has a token
+
+        Args:
+            destination: channel or interaction the messages go to
+            send: coroutine function sending the message, e.g. interaction.followup.send
+            args: arguments of send
+            kwargs: keyword arguments of send
+
+        Return:
+            The value returned by send
+        """
+        lock = self._locks.setdefault(destination, asyncio.Lock())
+        bucket = self._bucket(destination)
+        self.pending += 1
+        try:
+            # asyncio.Lock wakes waiters first in first out, so messages keep their order
+            with metrics.discord_send_seconds.time():
+                async with lock:
+                    for attempt in range(self.max_retries + 1):
+                        wait = bucket.wait_time(time.monotonic())
+                        if wait > 0:
+                            await asyncio.sleep(wait)
+                            bucket.refill(time.monotonic())
+                        bucket.tokens -= 1
+
+                        try:
+                            return await send(*args, **kwargs)
+                        except Exception as e:
+                            # discord.HTTPException carries the status, discord.RateLimited only retry_after
+                            retry_after = getattr(e, "retry_after", None)
+                            rate_limited = getattr(
+                                e, "status", None) == 429 or retry_after is not None
+                            if not rate_limited or attempt == self.max_retries:
+                                raise
+                            # Discord says how long the route is limited, spend the bucket until then
+                            bucket.tokens = 0
+                            await asyncio.sleep(retry_after or default_retry_after)
+        finally:
+            self.pending -= 1
+
+
+# Shared queue used by discord_bot
+outbound = OutboundQueue()
@@ -0,0 +1,125 @@
+import asyncio
+import json
+import pytest
+import time
+from message_composer import OutboundQueue, pack_embeds, pack_messages, split_block
+from riot_requests import parse_past_match
+
+
+@pytest.fixture
+def mock_get_matches_by_match_id():
+    with open("test/mock_get_matches_by_match_id.json") as f:
+        return json.load(f)
+
+
+class RateLimited(Exception):
+    """
+    Stand-in for discord.HTTPException with status 429
+    """
+
+    def __init__(self, retry_after):
+        self.status = 429
+        self.retry_after = retry_after
+        super().__init__("429 Too Many Requests")
+
+
+def test_split_block_on_lines():
+    """
+    Test an oversized block is split on line breaks and long lines are cut.
+    """
+    block = "a" * 6 + "\n" + "b" * 3 + "\n" + "c" * 12
+
+    pieces = split_block(block, 8)
+
+    assert pieces == ["aaaaaa\n", "bbb\n", "cccccccc", "cccc"]
+    assert "".join(pieces) == block
+
+
+def test_pack_messages_keeps_order_within_limit():
+    """
+    Test blocks are packed greedily into messages under the limit, in order.
+    """
+    blocks = ["x" * 900, "y" * 900, "z" * 900]
+
+    messages = pack_messages(blocks)
+
+    assert messages == ["x" * 900 + "\n" + "y" * 900, "z" * 900]
+    assert all(len(message) <= 2000 for message in messages)
+
+
+def test_pack_embeds_fifty_matches(mock_get_matches_by_match_id):
+    """
+    Test a 50 game week fits a handful of messages within every embed limit.
+    """
+    match = parse_past_match(mock_get_matches_by_match_id)
+    summaries = [f"Match {i + 1}\n" + str(match) for i in range(50)]
+
+    messages = pack_embeds(summaries)
+
+    assert len(messages) < 50 / 5
+    assert all(len(message) <= 10 for message in messages)
+    assert all(sum(len(description) for description in message) <= 6000 for message in messages)
+    assert all(len(description) <= 4096 for message in messages for description in message)
+    packed = "\n".join(description for message in messages for description in message)
+    assert packed == "\n".join(summaries)
+
+
+def test_pack_embeds_empty():
+    """
+    Test nothing to pack gives no messages.
+    """
+    assert pack_embeds([]) == []
+
+
+def test_outbound_queue_paces_and_keeps_order():
+    """
+    Test sends past the burst wait for tokens and go out in order.
+    """
+    outbound = OutboundQueue(messages_per_second=50, burst=2)
+    sent = []
+
+    async def send(message):
+        sent.append((message, time.monotonic()))
+
+    async def run():
+        await asyncio.gather(*(outbound.send(1, send, i) for i in range(4)))
+
+    asyncio.run(run())
+
+    assert [message for message, _ in sent] == [0, 1, 2, 3]
+    # The burst goes out at once, the rest at 50 per second
+    assert sent[3][1] - sent[0][1] >= 0.03
+    assert outbound.pending == 0
+
+
+def test_outbound_queue_retries_rate_limited_send():
+    """
+    Test a send rejected with 429 is retried after retry_after.
+    """
+    outbound = OutboundQueue(messages_per_second=100, burst=5)
+    attempts = []
+
+    async def send(message):
+        attempts.append(message)
+        if len(attempts) == 1:
+            raise RateLimited(0.01)
+        return message
+
+    assert asyncio.run(outbound.send(1, send, "hello")) == "hello"
+    assert attempts == ["hello", "hello"]
+
+
+def test_outbound_queue_raises_other_errors():
+    """
+    Test errors other than rate limits are raised without retrying.
+    """
+    outbound = OutboundQueue()
+    attempts = []
+
+    async def send(message):
+        attempts.append(message)
+        raise ValueError(message)
+
+    with pytest.raises(ValueError):
+        asyncio.run(outbound.send(1, send, "hello"))
+    assert attempts == ["hello"]
@@ -0,0 +1,522 @@
+import contextlib
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Local port of the Prometheus text endpoint, disabled when unset
+metrics_host = os.getenv('METRICS_HOST', '127.0.0.1')
+metrics_port = int(os.getenv('METRICS_PORT')) if os.getenv(
+    'METRICS_PORT') else None
+
+# Histogram bucket upper bounds
+latency_buckets = (0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+size_buckets = (1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+def escape(value: str) -> str:
+    """
+    Return value escaped for a Prometheus label
+
+    Args:
+        value: label value
+
+    Return:
+        The escaped value
+    """
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """
+    Return the {name="value",...} part of a sample line
+
+    Args:
+        names: label names
+        values: label values, in the order of names
+        extra: an extra preformatted label, e.g. le="0.5"
+
+    Return:
+        The labels, or "" if there are none
+    """
+    pairs = [f'{name}="{escape(str(value))}"' for name,
+             value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric():
+    """
+    A named metric with one series per combination of label values
+
+    === Instance Attributes ===
+    name: Metric name
+    help: One line description
+    labelnames: Names of the labels
+    """
+    kind = "untyped"
+
+    name: str
+    help: str
+    labelnames: Tuple[str, ...]
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        """
+        Initialize a Metric object
+
+        Args:
+            name: Metric name
+            help: One line description
+            labelnames: Names of the labels
+
+        Return:
+            None
+        """
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        """
+        Return the label values of labels in the order of labelnames
+
+        Args:
+            labels: label values by name
+
+        Return:
+            The label values
+
+        Raises:
+            ValueError: if labels does not name exactly labelnames
+        """
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} expects labels {', '.join(self.labelnames)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        """
+        Return the lines of the metric in the Prometheus text format
+
+        Args:
+            None
+
+        Return:
+            The HELP, TYPE and sample lines
+        """
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """
+    A count that only goes up
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        """
+        Initialize a Counter object
+
+        Args:
+            name: Metric name
+            help: One line description
+            labelnames: Names of the labels
+
+        Return:
+            None
+        """
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        """
+        Add amount to the series of labels
+
+        Args:
+            amount: how much to add
+            labels: label values by name
+
+        Return:
+            None
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        """
+        Return the count of the series of labels
+
+        Args:
+            labels: label values by name
+
+        Return:
+            The count, 0 if nothing was counted
+        """
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{format_labels(self.labelnames, key)} {value:g}" for key, value in items]
+
+
+class Histogram(Metric):
+    """
+    Observations counted into buckets, with their sum and count
+
+    === Instance Attributes ===
+    buckets: Upper bounds of the buckets, +Inf is implied
+    """
+    kind = "histogram"
+
+    buckets: Tuple[float, ...]
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = latency_buckets) -> None:
+        """
+        Initialize a Histogram object
+
+        Args:
+            name: Metric name
+            help: One line description
+            labelnames: Names of the labels
+            buckets: Upper bounds of the buckets
+
+        Return:
+            None
+        """
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per series: [count per bucket (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        """
+        Record one observation in the series of labels
+
+        Args:
+            value: the observed value
+            labels: label values by name
+
+        Return:
+            None
+        """
+        key = self._key(labels)
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = [[0] * (len(self.buckets) + 1), 0.0]
+                self._series[key] = series
+            series[0][index] += 1
+            series[1] += value
+
+    @contextlib.contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """
+        Observe the seconds the with block takes.
+        A histogram with an "outcome" label gets "ok" or "error" unless it is given.
+
+        Args:
+            labels: label values by name
+
+        Return:
+            A context manager timing its block
+        """
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            yield
+        except BaseException:
+            outcome = "error"
+            raise
+        finally:
+            if "outcome" in self.labelnames and "outcome" not in labels:
+                labels = {**labels, "outcome": outcome}
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        """
+        Return the number of observations of the series of labels
+
+        Args:
+            labels: label values by name
+
+        Return:
+            The number of observations
+        """
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return sum(series[0]) if series is not None else 0
+
+    def summary(self) -> Dict[Tuple[str, ...], Tuple[int, float, float, float]]:
+        """
+        Return every series' count, mean, and p50 and p99 estimated from the buckets
+
+        Args:
+            None
+
+        Return:
+            (count, mean, p50, p99) by label values
+        """
+        with self._lock:
+            items = [(key, list(series[0]), series[1])
+                     for key, series in self._series.items()]
+
+        summaries = {}
+        for key, counts, total in sorted(items):
+            count = sum(counts)
+            summaries[key] = (count, total / count if count else 0.0,
+                              self._quantile(counts, 0.5), self._quantile(counts, 0.99))
+        return summaries
+
+    def _quantile(self, counts: List[int], q: float) -> float:
+        """
+        Return the q quantile of a series, interpolated inside its bucket like histogram_quantile
+
+        Args:
+            counts: count per bucket, +Inf last
+            q: quantile between 0 and 1
+
+        Return:
+            The estimated quantile, the largest bound if it falls in +Inf
+        """
+        total = sum(counts)
+        if total == 0:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(counts[:-1]):
+            if seen + count >= rank and count > 0:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(series[0]), series[1])
+                           for key, series in self._series.items())
+
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                labels = format_labels(self.labelnames, key, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total:g}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry():
+    """
+    The metrics of the process, rendered together for scraping
+
+    === Instance Attributes ===
+    metrics: Registered metrics by name
+    """
+    metrics: Dict[str, Metric]
+
+    def __init__(self) -> None:
+        """
+        Initialize an empty Registry object
+
+        Return:
+            None
+        """
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        """
+        Add metric, or return the metric already registered under its name
+
+        Args:
+            metric: the metric
+
+        Return:
+            The registered metric
+        """
+        with self._lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        """
+        Return the counter called name, registering it on first use
+
+        Args:
+            name: Metric name
+            help: One line description
+            labelnames: Names of the labels
+
+        Return:
+            The counter
+        """
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = latency_buckets) -> Histogram:
+        """
+        Return the histogram called name, registering it on first use
+
+        Args:
+            name: Metric name
+            help: One line description
+            labelnames: Names of the labels
+            buckets: Upper bounds of the buckets
+
+        Return:
+            The histogram
+        """
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        """
+        Return every metric in the Prometheus text exposition format
+
+        Args:
+            None
+
+        Return:
+            The exposition text
+        """
+        with self._lock:
+            metrics = list(self.metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+# Shared registry and the metrics recorded across the bot
+registry = Registry()
+
+riot_request_seconds = registry.histogram(
+    "riot_request_seconds", "Riot API call latency, one observation per attempt",
+    ("method", "status"))
+riot_response_bytes = registry.histogram(
+    "riot_response_bytes", "Riot API response body size", ("method",), size_buckets)
+riot_retries_total = registry.counter(
+    "riot_retries_total", "Riot API calls sent again after a server error or timeout", ("method", "reason"))
+circuit_breaker_transitions_total = registry.counter(
+    "circuit_breaker_transitions_total", "Riot API circuit breaker state changes", ("method", "state"))
+rate_limit_wait_seconds = registry.histogram(
+    "rate_limit_wait_seconds", "Time calls waited for the rate limiter", ("region",))
+cache_requests_total = registry.counter(
+    "cache_requests_total", "Cache lookups by cache and result", ("cache", "result"))
+report_seconds = registry.histogram(
+    "report_seconds", "Weekly report CPU time by stage", ("stage",))
+command_seconds = registry.histogram(
+    "command_seconds", "Discord command latency from interaction to last message", ("command", "outcome"))
+discord_send_seconds = registry.histogram(
+    "discord_send_seconds", "Discord message send latency including queueing", ("outcome",))
+email_sends_total = registry.counter(
+    "email_sends_total", "Weekly report emails by outcome", ("outcome",))
+
+
+def stats_text(gauges: Dict[str, float] = None) -> str:
+    """
+    Return a short plain text summary of the shared metrics, for the /stats command
+
+    Args:
+        gauges: extra current values to list, e.g. the worker pool's queue depth
+
+    Return:
+        Latency count, mean, p50 and p99 per endpoint and command, cache hit rates and gauges
+    """
+    lines = []
+    for title, histogram in (("Riot API", riot_request_seconds), ("Commands", command_seconds),
+                             ("Discord sends", discord_send_seconds), ("Rate limit waits", rate_limit_wait_seconds),
+                             ("Weekly report", report_seconds)):
+        summary = histogram.summary()
+        if not summary:
+            continue
+        lines.append(f"{title} (count, mean/p50/p99 ms)")
+        for key, (count, mean, p50, p99) in summary.items():
+            lines.append(f"  {' '.join(key):<40}{count:>7} "
+                         f"{mean * 1000:.0f}/{p50 * 1000:.0f}/{p99 * 1000:.0f}")
+
+    with cache_requests_total._lock:
+        cache_counts = dict(cache_requests_total._values)
+    caches = sorted({cache for cache, _ in cache_counts})
+    if caches:
+        lines.append("Cache hit rate")
+    for cache in caches:
+        total = sum(count for (name, _), count in cache_counts.items() if name == cache)
+        hits = sum(count for (name, result), count in cache_counts.items()
+                   if name == cache and result != "miss")
+        lines.append(f"  {cache:<40}{hits / total:>7.1%} of {total:g}")
+
+    if gauges:
+        lines.append("Gauges")
+        for name, value in gauges.items():
+            lines.append(f"  {name:<40}{value:>7g}")
+    return "\n".join(lines) if lines else "No metrics recorded yet"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """
+    Answers GET /metrics with the registry in the Prometheus text format
+    """
+
+    def do_GET(self) -> None:
+        """
+        Send the rendered registry, or 404 for any other path
+
+        Args:
+            None
+
+        Return:
+            None
+        """
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        """
+        Keep scrapes out of the bot's output
+        """
+
+
+def serve(port: Optional[int] = metrics_port, host: str = metrics_host,
+          metrics: Registry = None) -> Optional[ThreadingHTTPServer]:
+    """
+    Serve the registry at http://host:port/metrics on a background thread
+
+    Args:
+        port: port to listen on, 0 for any free port, None leaves the endpoint off
+        host: interface to listen on, local only by default
+        metrics: registry to serve, the shared one by default
+
+    Return:
+        The running server, or None if port is None
+    """
+    if port is None:
+        return None
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    server.registry = metrics if metrics is not None else registry
+    threading.Thread(target=server.serve_forever,
+                     name="metrics", daemon=True).start()
+    return server
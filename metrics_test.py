@@ -0,0 +1,112 @@
+import pytest
+import urllib.error
+import urllib.request
+from metrics import Counter, Histogram, Registry, serve
+
+
+def test_counter_renders_one_sample_per_series():
+    """
+    Test a counter keeps one count per label combination and renders them in the text format.
+    """
+    counter = Counter("lookups_total", "Lookups", ("cache", "result"))
+    counter.inc(cache="summoner", result="hit")
+    counter.inc(2, cache="summoner", result="hit")
+    counter.inc(cache="summoner", result="miss")
+
+    assert counter.value(cache="summoner", result="hit") == 3
+    assert counter.value(cache="match", result="hit") == 0
+    assert counter.render() == ["# HELP lookups_total Lookups",
+                                "# TYPE lookups_total counter",
+                                'lookups_total{cache="summoner",result="hit"} 3',
+                                'lookups_total{cache="summoner",result="miss"} 1']
+
+
+def test_wrong_labels_raise():
+    """
+    Test recording with labels other than the metric's label names raises ValueError.
+    """
+    counter = Counter("lookups_total", "Lookups", ("cache",))
+
+    with pytest.raises(ValueError):
+        counter.inc(result="hit")
+
+
+def test_histogram_buckets_are_cumulative():
+    """
+    Test a histogram renders cumulative buckets ending in +Inf, with its sum and count.
+    """
+    histogram = Histogram("latency_seconds", "Latency",
+                          ("method",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, method="get")
+
+    assert histogram.render()[2:] == ['latency_seconds_bucket{method="get",le="0.1"} 1',
+                                      'latency_seconds_bucket{method="get",le="1"} 3',
+                                      'latency_seconds_bucket{method="get",le="+Inf"} 4',
+                                      'latency_seconds_sum{method="get"} 6.05',
+                                      'latency_seconds_count{method="get"} 4']
+
+
+def test_summary_interpolates_quantiles_from_buckets():
+    """
+    Test summary() returns the count, the exact mean and quantiles interpolated inside their bucket.
+    """
+    histogram = Histogram("latency_seconds", "Latency",
+                          ("method",), buckets=(1.0, 2.0))
+    for value in (0.5, 0.5, 1.5, 1.5):
+        histogram.observe(value, method="get")
+
+    count, mean, p50, p99 = histogram.summary()[("get",)]
+
+    assert count == 4
+    assert mean == 1.0
+    assert p50 == 1.0
+    assert p99 == pytest.approx(1.98)
+
+
+def test_time_labels_outcome():
+    """
+    Test time() observes its block under outcome "ok", or "error" when the block raises.
+    """
+    histogram = Histogram("command_seconds", "Commands",
+                          ("command", "outcome"))
+
+    with histogram.time(command="past"):
+        pass
+    with pytest.raises(RuntimeError):
+        with histogram.time(command="past"):
+            raise RuntimeError()
+
+    assert histogram.count(command="past", outcome="ok") == 1
+    assert histogram.count(command="past", outcome="error") == 1
+
+
+def test_serve_exposes_metrics_endpoint():
+    """
+    Test serve() answers /metrics with the registry and 404 for any other path.
+    """
+    registry = Registry()
+    registry.counter("requests_total", "Requests").inc()
+    server = serve(0, metrics=registry)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    try:
+        with urllib.request.urlopen(f"{url}/metrics") as res:
+            body = res.read().decode()
+            content_type = res.headers["Content-Type"]
+        with pytest.raises(urllib.error.HTTPError) as e:
+            urllib.request.urlopen(f"{url}/other")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert content_type.startswith("text/plain")
+    assert "requests_total 1" in body
+    assert e.value.code == 404
+
+
+def test_serve_is_off_without_port():
+    """
+    Test serve() starts nothing when no port is configured.
+    """
+    assert serve(None) is None
@@ -0,0 +1,389 @@
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+# Directory of the recorded Riot responses
+fixtures_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test")
+
+# Limits advertised to clients, high enough that the stand-in never throttles a benchmark
+mock_app_rate_limit = "100000:1"
+mock_method_rate_limit = "100000:1"
+
+summoner_path = re.compile(r"^/lol/summoner/v4/summoners/by-name/(?P<name>[^/]+)$")
+match_ids_path = re.compile(
+    r"^/lol/match/v5/matches/by-puuid/(?P<puuid>[^/]+)/ids$")
+match_path = re.compile(r"^/lol/match/v5/matches/(?P<match_id>[^/]+)$")
+spectator_path = re.compile(
+    r"^/lol/spectator/v4/active-games/by-summoner/(?P<summoner_id>[^/]+)$")
+
+
+def load_fixture(name: str) -> Dict:
+    """
+    Return the recorded response test/<name>.json
+
+    Args:
+        name: fixture name, e.g. "mock_get_matches_by_match_id"
+
+    Return:
+        The decoded fixture
+    """
+    with open(os.path.join(fixtures_dir, f"{name}.json")) as f:
+        return json.load(f)
+
+
+def digest(text: str, length: int) -> str:
+    """
+    Return a stable identifier of length characters derived from text
+
+    Args:
+        text: the text to derive from
+        length: number of characters
+
+    Return:
+        The identifier
+    """
+    return hashlib.sha256(text.encode()).hexdigest()[:length]
+
+
+class MockRiotServer():
+    """
+    Local HTTP stand-in for the Summoner-V4, Match-V5 and Spectator-V4 endpoints.
+    Serves the recorded fixtures in test/ and synthetic summoners and matches built from them,
+    with configurable latency, server errors and 429 responses.
+    Point the clients at url with RIOT_<PLATFORM>_API_URL and RIOT_<CLUSTER>_API_URL, e.g. RIOT_NA1_API_URL
+    and RIOT_AMERICAS_API_URL.
+
+    === Instance Attributes ===
+    latency: Seconds every response is delayed
+    jitter: Extra random delay of up to jitter seconds
+    error_rate: Fraction of requests answered with 500
+    rate_limit_rate: Fraction of requests answered with 429
+    retry_after: Retry-After of the 429 responses in seconds
+    in_game_rate: Fraction of summoners the spectator endpoint reports in game
+    matches_per_summoner: Number of matches every synthetic summoner played last week
+    requests: Number of responses by (endpoint, status)
+    """
+    latency: float
+    jitter: float
+    error_rate: float
+    rate_limit_rate: float
+    retry_after: float
+    in_game_rate: float
+    matches_per_summoner: int
+    requests: Counter
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, retry_after: float = 0.0, in_game_rate: float = 0.5,
+                 matches_per_summoner: int = 20, seed: int = 0) -> None:
+        """
+        Initialize a MockRiotServer object. The server listens once start() is called.
+
+        Args:
+            latency: Seconds every response is delayed
+            jitter: Extra random delay of up to jitter seconds
+            error_rate: Fraction of requests answered with 500
+            rate_limit_rate: Fraction of requests answered with 429
+            retry_after: Retry-After of the 429 responses in seconds
+            in_game_rate: Fraction of summoners the spectator endpoint reports in game
+            matches_per_summoner: Number of matches every synthetic summoner played last week
+            seed: Seed of the random faults, so runs are repeatable
+
+        Return:
+            None
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.in_game_rate = in_game_rate
+        self.matches_per_summoner = matches_per_summoner
+        self.requests = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._summoner = load_fixture("mock_get_summoners_by_name_success")
+        self._match = load_fixture("mock_get_matches_by_match_id")
+        self._matches: Dict[str, bytes] = {}
+        # Match history is anchored at start up so match ids stay the same for the life of the server
+        self._epoch = int(time.time())
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """
+        Return the base URL the server listens on
+
+        Args:
+            None
+
+        Return:
+            The base URL, e.g. http://127.0.0.1:8080
+        """
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, port: int = 0) -> "MockRiotServer":
+        """
+        Start serving on a background thread
+
+        Args:
+            port: port to listen on, any free port by default
+
+        Return:
+            The server
+        """
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), MockRiotHandler)
+        self._server.daemon_threads = True
+        self._server.riot = self
+        # A short poll interval lets stop() return quickly
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.05},
+                                        name="mock-riot", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stop serving and close the listening socket
+
+        Args:
+            None
+
+        Return:
+            None
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "MockRiotServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _roll(self, rate: float) -> bool:
+        """
+        Return True with probability rate
+
+        Args:
+            rate: probability between 0 and 1
+
+        Return:
+            Whether the event happens
+        """
+        if rate <= 0:
+            return False
+        with self._lock:
+            return self._random.random() < rate
+
+    def delay(self) -> float:
+        """
+        Return the seconds the next response is delayed
+
+        Args:
+            None
+
+        Return:
+            latency plus up to jitter seconds
+        """
+        if self.jitter <= 0:
+            return self.latency
+        with self._lock:
+            return self.latency + self._random.random() * self.jitter
+
+    def summoner(self, name: str) -> Optional[Dict]:
+        """
+        Return the Summoner-V4 payload of name, None for names starting with "notfound".
+        The recorded summoner keeps its real ids, any other name gets ids derived from it.
+
+        Args:
+            name: summoner name
+
+        Return:
+            The payload, or None if the summoner does not exist
+        """
+        if name.replace(" ", "").lower().startswith("notfound"):
+            return None
+        if name == self._summoner["name"]:
+            return self._summoner
+        return {**self._summoner, "name": name, "id": digest("id" + name, 47),
+                "puuid": digest("puuid" + name, 64), "accountId": digest("account" + name, 46)}
+
+    def match_ids(self, puuid: str, start_time: Optional[float] = None, end_time: Optional[float] = None) -> List[str]:
+        """
+        Return the ids of the matches puuid played, newest first, one every six hours back from start up
+
+        Args:
+            puuid: summoner puuid
+            start_time: only matches started at or after start_time, in epoch seconds
+            end_time: only matches started before end_time, in epoch seconds
+
+        Return:
+            The match ids
+        """
+        match_ids = []
+        for i in range(self.matches_per_summoner):
+            start = self._epoch - (i + 1) * 6 * 60 * 60
+            if (start_time is None or start >= start_time) and (end_time is None or start < end_time):
+                match_ids.append(f"NA1_{digest(puuid, 8)}{int(start)}")
+        return match_ids
+
+    def match(self, match_id: str) -> Optional[bytes]:
+        """
+        Return the Match-V5 body of match_id, the recorded match moved to the start time in its id
+
+        Args:
+            match_id: match id made by match_ids, or the recorded match's id
+
+        Return:
+            The JSON body, or None if there is no such match
+        """
+        with self._lock:
+            body = self._matches.get(match_id)
+        if body is not None:
+            return body
+
+        info = self._match["info"]
+        if match_id == self._match["metadata"]["matchId"]:
+            payload = self._match
+        else:
+            try:
+                start = int(match_id[-10:]) * 1000
+            except ValueError:
+                return None
+            length = info["gameEndTimestamp"] - info["gameStartTimestamp"]
+            payload = {**self._match,
+                       "metadata": {**self._match["metadata"], "matchId": match_id},
+                       "info": {**info, "gameStartTimestamp": start, "gameEndTimestamp": start + length}}
+
+        body = json.dumps(payload).encode()
+        with self._lock:
+            self._matches[match_id] = body
+        return body
+
+    def active_game(self, summoner_id: str) -> Optional[Dict]:
+        """
+        Return the Spectator-V4 payload of summoner_id's game, built from the recorded match.
+        Whether a summoner is in game is stable for the life of the server.
+
+        Args:
+            summoner_id: summoner id
+
+        Return:
+            The payload, or None if the summoner is not in game
+        """
+        if int(digest(summoner_id, 8), 16) / 0xFFFFFFFF >= self.in_game_rate:
+            return None
+
+        now = int(time.time() * 1000)
+        participants = [{"teamId": participant["teamId"], "summonerName": participant["summonerName"],
+                         "championId": participant["championId"], "summonerId": participant["summonerId"]}
+                        for participant in self._match["info"]["participants"]]
+        return {"gameId": int(digest(summoner_id, 8), 16), "gameMode": "CLASSIC", "gameType": "MATCHED_GAME",
+                "gameStartTime": now - 10 * 60 * 1000, "gameLength": 10 * 60, "platformId": "NA1",
+                "participants": participants}
+
+    def respond(self, path: str, query: Dict[str, List[str]]) -> Tuple[str, int, Dict[str, str], bytes]:
+        """
+        Return the response to a GET of path
+
+        Args:
+            path: request path
+            query: parsed query string
+
+        Return:
+            (endpoint, status, headers, body)
+        """
+        headers = {"Content-Type": "application/json;charset=utf-8",
+                   "X-App-Rate-Limit": mock_app_rate_limit, "X-App-Rate-Limit-Count": "1:1",
+                   "X-Method-Rate-Limit": mock_method_rate_limit, "X-Method-Rate-Limit-Count": "1:1"}
+
+        endpoint, status, body = "unknown", 404, {
+            "status": {"message": "Not found", "status_code": 404}}
+        if (match := summoner_path.match(path)):
+            endpoint = "summoner-v4.by-name"
+            summoner = self.summoner(unquote(match["name"]))
+            if summoner is not None:
+                status, body = 200, summoner
+        elif (match := match_ids_path.match(path)):
+            endpoint = "match-v5.by-puuid"
+            start_time = float(query["startTime"][0]) if "startTime" in query else None
+            end_time = float(query["endTime"][0]) if "endTime" in query else None
+            start = int(query.get("start", ["0"])[0])
+            count = int(query.get("count", ["20"])[0])
+            status, body = 200, self.match_ids(match["puuid"], start_time, end_time)[start:start + count]
+        elif (match := match_path.match(path)):
+            endpoint = "match-v5.by-match-id"
+            raw = self.match(match["match_id"])
+            if raw is not None:
+                # Already encoded, the recorded match is served as is
+                status, body = 200, raw
+        elif (match := spectator_path.match(path)):
+            endpoint = "spectator-v4.by-summoner"
+            game = self.active_game(match["summoner_id"])
+            if game is not None:
+                status, body = 200, game
+
+        # Faults are decided after routing so they are counted per endpoint
+        if self._roll(self.rate_limit_rate):
+            status, body = 429, {"status": {
+                "message": "Rate limit exceeded", "status_code": 429}}
+            headers.update({"Retry-After": str(self.retry_after), "X-Rate-Limit-Type": "method"})
+        elif self._roll(self.error_rate):
+            status, body = 500, {"status": {
+                "message": "Internal server error", "status_code": 500}}
+
+        return (endpoint, status, headers, body if isinstance(body, bytes) else json.dumps(body).encode())
+
+
+class MockRiotHandler(BaseHTTPRequestHandler):
+    """
+    Request handler of MockRiotServer, answering GET requests with keep-alive
+    """
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, without TCP_NODELAY keep-alive responses stall on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def do_GET(self) -> None:
+        """
+        Answer a GET request after the configured latency
+
+        Args:
+            None
+
+        Return:
+            None
+        """
+        riot = self.server.riot
+        url = urlsplit(self.path)
+        endpoint, status, headers, body = riot.respond(
+            url.path, parse_qs(url.query))
+
+        delay = riot.delay()
+        if delay > 0:
+            time.sleep(delay)
+
+        with riot._lock:
+            riot.requests[(endpoint, status)] += 1
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        """
+        Keep the server quiet, benchmarks print their own summary
+        """
@@ -0,0 +1,107 @@
+import json
+import pytest
+import regions
+import riot_requests
+import spectator_cache
+from exceptions import RiotAPIError, SummonerNotFound
+from mock_riot_server import MockRiotServer
+from rate_limiter import RateLimiter
+from unittest.mock import patch
+
+
+@pytest.fixture
+def server():
+    with MockRiotServer() as server, \
+            patch.dict(regions.platform_urls, dict.fromkeys(regions.platform_urls, server.url)), \
+            patch.dict(regions.cluster_urls, dict.fromkeys(regions.cluster_urls, server.url)), \
+            patch("riot_requests.limiter", RateLimiter()):
+        yield server
+
+
+def test_serves_recorded_summoner(server):
+    """
+    Test the recorded summoner fixture is served for its name, and unknown names get derived ids.
+    """
+    with open("test/mock_get_summoners_by_name_success.json") as f:
+        recorded = json.load(f)
+
+    summoner = riot_requests.get_summoners_by_name("Kid Orpheus")
+    other = riot_requests.get_summoners_by_name("Someone Else")
+
+    assert (summoner.name, summoner.id, summoner.puuid) == (
+        recorded["name"], recorded["id"], recorded["puuid"])
+    assert other.name == "Someone Else"
+    assert other.puuid != summoner.puuid
+    with pytest.raises(SummonerNotFound):
+        riot_requests.get_summoners_by_name("Not Found")
+
+
+def test_serves_last_week_matches(server):
+    """
+    Test the synthetic match history pages through start/count and its matches fall in last week.
+    """
+    server.matches_per_summoner = 30
+    summoner = riot_requests.get_summoners_by_name("Someone Else")
+
+    match_ids, last_week = riot_requests.get_last_week_matches_by_puuid(
+        summoner.puuid)
+    match = riot_requests.get_matches_by_match_id(match_ids[0])
+
+    assert len(match_ids) == 28
+    assert len(set(match_ids)) == 28
+    assert match.start_time.timestamp() >= last_week
+    assert len(match.participants) == 10
+
+
+def test_rate_limited_requests_are_retried(server):
+    """
+    Test 429 responses carry Retry-After and the client retries them.
+    """
+    server.rate_limit_rate = 0.5
+
+    for i in range(10):
+        riot_requests.get_summoners_by_name(f"Summoner {i}")
+
+    assert server.requests[("summoner-v4.by-name", 429)] > 0
+    assert server.requests[("summoner-v4.by-name", 200)] == 10
+
+
+def test_server_errors(server):
+    """
+    Test injected 500 responses surface as RiotAPIError.
+    """
+    server.error_rate = 1.0
+
+    with pytest.raises(RiotAPIError):
+        riot_requests.get_summoners_by_name("Kid Orpheus")
+
+
+def test_faults_apply_to_match_details(server):
+    """
+    Test injected 500 and 429 responses are served by the match endpoint too.
+    """
+    summoner = riot_requests.get_summoners_by_name("Someone Else")
+    match_id = riot_requests.get_matches_by_puuid(summoner.puuid, 1)[0]
+    path = f"/lol/match/v5/matches/{match_id}"
+
+    assert server.respond(path, {})[1] == 200
+    server.error_rate = 1.0
+    assert server.respond(path, {})[:2] == ("match-v5.by-match-id", 500)
+    server.rate_limit_rate = 1.0
+    endpoint, status, headers, _ = server.respond(path, {})
+    assert (endpoint, status) == ("match-v5.by-match-id", 429)
+    assert "Retry-After" in headers
+
+
+def test_active_game(server):
+    """
+    Test the spectator endpoint reports the configured fraction of summoners in game.
+    """
+    server.in_game_rate = 1.0
+    game = riot_requests.get_active_game_info("summoner")
+    server.in_game_rate = 0.0
+    spectator_cache.cache.clear()
+
+    assert len(game["participants"]) == 10
+    assert game["gameLength"] > 0
+    assert riot_requests.get_active_game_info("summoner") is None
@@ -0,0 +1,237 @@
+import base64
+import re
+import socketserver
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+# Address inside MAIL FROM:<...> and RCPT TO:<...>
+address_pattern = re.compile(r"<([^>]*)>")
+
+
+class MockSMTPServer():
+    """
+    Local SMTP stand-in speaking just enough of the protocol for smtplib:
+    EHLO, HELO, AUTH PLAIN, MAIL, RCPT, DATA, RSET, NOOP and QUIT.
+    Records every accepted message and can refuse recipients or cut connections short.
+
+    === Instance Attributes ===
+    messages: (sender, recipients, body) of every accepted message, in order
+    connections: Number of connections accepted
+    logins: Usernames that authenticated, one per AUTH
+    transient_failures: RCPT of an address is answered 451 this many more times
+    rejected: Addresses whose RCPT is answered 550
+    max_messages_per_connection: MAIL is answered 421 and the connection closed after this many messages,
+                                 None for no limit
+    """
+    messages: List[Tuple[str, List[str], bytes]]
+    connections: int
+    logins: List[str]
+    transient_failures: Dict[str, int]
+    rejected: Set[str]
+    max_messages_per_connection: Optional[int]
+
+    def __init__(self, transient_failures: Dict[str, int] = None, rejected: Set[str] = None,
+                 max_messages_per_connection: Optional[int] = None) -> None:
+        """
+        Initialize a MockSMTPServer object. The server listens once start() is called.
+
+        Args:
+            transient_failures: RCPT of an address is answered 451 this many times
+            rejected: Addresses whose RCPT is answered 550
+            max_messages_per_connection: Messages accepted per connection, None for no limit
+
+        Return:
+            None
+        """
+        self.messages = []
+        self.connections = 0
+        self.logins = []
+        self.transient_failures = dict(transient_failures or {})
+        self.rejected = set(rejected or ())
+        self.max_messages_per_connection = max_messages_per_connection
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        """
+        Return the port the server listens on
+
+        Args:
+            None
+
+        Return:
+            The port
+        """
+        return self._server.server_address[1]
+
+    def start(self, port: int = 0) -> "MockSMTPServer":
+        """
+        Start serving on a background thread
+
+        Args:
+            port: port to listen on, any free port by default
+
+        Return:
+            The server
+        """
+        self._server = socketserver.ThreadingTCPServer(
+            ("127.0.0.1", port), MockSMTPHandler)
+        self._server.daemon_threads = True
+        self._server.smtp = self
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.05},
+                                        name="mock-smtp", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stop serving and close the listening socket
+
+        Args:
+            None
+
+        Return:
+            None
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "MockSMTPServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def recipient_reply(self, address: str) -> str:
+        """
+        Return the reply to RCPT TO of address
+
+        Args:
+            address: recipient address
+
+        Return:
+            The reply line
+        """
+        with self._lock:
+            if address in self.rejected:
+                return "550 5.1.1 Mailbox unavailable"
+            if self.transient_failures.get(address, 0) > 0:
+                self.transient_failures[address] -= 1
+                return "451 4.3.0 Try again later"
+        return "250 OK"
+
+
+class MockSMTPHandler(socketserver.StreamRequestHandler):
+    """
+    Request handler of MockSMTPServer, one SMTP session per connection
+    """
+
+    def reply(self, line: str) -> None:
+        """
+        Send one reply line
+
+        Args:
+            line: reply without the line ending
+
+        Return:
+            None
+        """
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def read_data(self) -> bytes:
+        """
+        Read a DATA body up to the lone "." line, undoing dot stuffing
+
+        Args:
+            None
+
+        Return:
+            The message body
+        """
+        lines = []
+        for line in self.rfile:
+            if line in (b".\r\n", b".\n"):
+                break
+            lines.append(line[1:] if line.startswith(b"..") else line)
+        return b"".join(lines)
+
+    def handle(self) -> None:
+        """
+        Answer commands until QUIT or the client hangs up
+
+        Args:
+            None
+
+        Return:
+            None
+        """
+        smtp = self.server.smtp
+        with smtp._lock:
+            smtp.connections += 1
+        self.reply("220 mock ESMTP ready")
+
+        sender = None
+        recipients = []
+        accepted = 0
+        for raw in self.rfile:
+            line = raw.decode("utf-8", "replace").rstrip("\r\n")
+            verb, _, argument = line.partition(" ")
+            verb = verb.upper()
+
+            if verb == "EHLO":
+                self.reply("250-mock")
+                self.reply("250-AUTH PLAIN")
+                self.reply("250 8BITMIME")
+            elif verb == "HELO":
+                self.reply("250 mock")
+            elif verb == "AUTH":
+                mechanism, _, initial = argument.partition(" ")
+                if mechanism.upper() != "PLAIN" or not initial:
+                    self.reply("504 5.5.4 Only AUTH PLAIN with an initial response")
+                    continue
+                username = base64.b64decode(initial).split(b"\0")[1].decode()
+                with smtp._lock:
+                    smtp.logins.append(username)
+                self.reply("235 2.7.0 Authentication successful")
+            elif verb == "MAIL":
+                if smtp.max_messages_per_connection is not None and accepted >= smtp.max_messages_per_connection:
+                    self.reply("421 4.7.0 Too many messages, closing connection")
+                    return
+                match = address_pattern.search(argument)
+                sender = match[1] if match else ""
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                match = address_pattern.search(argument)
+                address = match[1] if match else ""
+                reply = smtp.recipient_reply(address)
+                if reply.startswith("250"):
+                    recipients.append(address)
+                self.reply(reply)
+            elif verb == "DATA":
+                if sender is None or not recipients:
+                    self.reply("503 5.5.1 Need MAIL and RCPT first")
+                    continue
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                body = self.read_data()
+                with smtp._lock:
+                    smtp.messages.append((sender, recipients, body))
+                accepted += 1
+                sender = None
+                recipients = []
+                self.reply("250 OK queued")
+            elif verb == "RSET":
+                sender = None
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "NOOP":
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 5.5.2 Command not implemented")
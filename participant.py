@@ -0,0 +1,78 @@
+class ParticipantStats():
+    """
+    Participant Stats DTO (Data Transfer Object) for one player of a match
+
+    === Instance Attributes ===
+    puuid: Player's puuid
+    champion: Champion played
+    kills: Number of kills
+    deaths: Number of deaths
+    assists: Number of assists
+    """
+    __slots__ = ("puuid", "champion", "kills", "deaths", "assists")
+
+    puuid: str
+    champion: str
+    kills: int
+    deaths: int
+    assists: int
+
+    def __init__(self, puuid: str, champion: str, kills: int, deaths: int, assists: int) -> None:
+        """
+        Initialize a ParticipantStats object
+
+        Args:
+            puuid: Player's puuid
+            champion: Champion played
+            kills: Number of kills
+            deaths: Number of deaths
+            assists: Number of assists
+
+        Return:
+            None
+        """
+        self.puuid = puuid
+        self.champion = champion
+        self.kills = kills
+        self.deaths = deaths
+        self.assists = assists
+
+    @property
+    def kda(self) -> float:
+        """
+        Return the player's (kills + assists) / deaths, counting no deaths as one
+
+        Args:
+            None
+
+        Return:
+            The KDA ratio
+        """
+        return (self.kills + self.assists) / max(self.deaths, 1)
+
+    def __eq__(self, other: object) -> bool:
+        """
+        Return True if self and other are equal, and False otherwise
+
+        Args:
+            other: object to compare self to
+
+        Return:
+            True if self and other are equal, and False otherwise
+        """
+        if not isinstance(other, ParticipantStats):
+            return False
+        return (self.puuid, self.champion, self.kills, self.deaths, self.assists) == \
+            (other.puuid, other.champion, other.kills, other.deaths, other.assists)
+
+    def __str__(self) -> str:
+        """
+        Return a string representation of a ParticipantStats object
+
+        Args:
+            None
+
+        Return:
+            A string representation of a ParticipantStats object
+        """
+        return f"{self.champion} {self.kills}/{self.deaths}/{self.assists}"
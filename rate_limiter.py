@@ -0,0 +1,289 @@
+import asyncio
+import metrics
+import os
+import threading
+import time
+from typing import Dict, List, Mapping, Optional, Tuple
+
+# Application limit assumed before Riot tells us the real one (development key)
+default_app_rate_limit = os.getenv('RIOT_APP_RATE_LIMIT', '20:1,100:120')
+
+# Number of times a call is re-queued after a 429 before giving up
+max_rate_limit_retries = int(os.getenv('RIOT_MAX_RATE_LIMIT_RETRIES', '5'))
+
+# Seconds to wait after a 429 that carries no Retry-After header
+default_retry_after = 1.0
+
+
+def parse_rate_limit(header: str) -> List[Tuple[int, int]]:
+    """
+    Return the (count, seconds) pairs of a Riot rate limit header
+
+    Args:
+        header (str): header value, e.g. "20:1,100:120"
+
+    Returns:
+        windows (List[Tuple[int, int]]): e.g. [(20, 1), (100, 120)]
+    """
+    windows = []
+    for window in header.split(','):
+        count, seconds = window.strip().split(':')
+        windows.append((int(count), int(seconds)))
+    return windows
+
+
+class TokenBucket():
+    """
+    Token bucket for one rate limit window
+
+    === Instance Attributes ===
+    limit: Number of requests allowed per window
+    seconds: Window length in seconds
+    tokens: Requests still available
+    updated: Monotonic time the tokens were last refilled
+    """
+    limit: int
+    seconds: int
+    tokens: float
+    updated: float
+
+    def __init__(self, limit: int, seconds: int) -> None:
+        """
+        Initialize a full TokenBucket object
+
+        Args:
+            limit: Number of requests allowed per window
+            seconds: Window length in seconds
+
+        Return:
+            None
+        """
+        self.limit = limit
+        self.seconds = seconds
+        self.tokens = float(limit)
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        """
+        Add the tokens earned since the last refill
+
+        Args:
+            now: current monotonic time
+
+        Return:
+            None
+        """
+        rate = self.limit / self.seconds
+        self.tokens = min(self.limit, self.tokens +
+                          (now - self.updated) * rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """
+        Return the seconds until one token is available
+
+        Args:
+            now: current monotonic time
+
+        Return:
+            The seconds until one token is available
+        """
+        self.refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) * self.seconds / self.limit
+
+    def sync(self, count: int) -> None:
+        """
+        Drop tokens the server says are already spent in this window
+
+        Args:
+            count: requests counted by Riot in the current window
+
+        Return:
+            None
+        """
+        self.tokens = min(self.tokens, float(self.limit - count))
+
+
+class RateLimiter():
+    """
+    Rate limiter that follows Riot's X-App-Rate-Limit and X-Method-Rate-Limit headers.
+    Keeps one set of token buckets per region and one per (region, method).
+
+    === Instance Attributes ===
+    app_buckets: Token buckets of the application limit by region
+    method_buckets: Token buckets of the method limit by (region, method)
+    blocked_until: Monotonic time until which a region or (region, method) is on Retry-After
+    """
+    app_buckets: Dict[str, List[TokenBucket]]
+    method_buckets: Dict[Tuple[str, str], List[TokenBucket]]
+    blocked_until: Dict[object, float]
+
+    def __init__(self, app_rate_limit: str = default_app_rate_limit) -> None:
+        """
+        Initialize a RateLimiter object
+
+        Args:
+            app_rate_limit: Application limit assumed until a response reports it
+
+        Return:
+            None
+        """
+        self.app_rate_limit = app_rate_limit
+        self.app_buckets = {}
+        self.method_buckets = {}
+        self.blocked_until = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, region: str, method: str) -> float:
+        """
+        Take a token for a call if one is available, otherwise return how long to wait
+
+        Args:
+            region: routing host of the call
+            method: Riot API method of the call
+
+        Return:
+            0 if the call may go now, otherwise the seconds to wait before asking again
+        """
+        with self._lock:
+            now = time.monotonic()
+            if region not in self.app_buckets:
+                self.app_buckets[region] = [TokenBucket(limit, seconds)
+                                            for limit, seconds in parse_rate_limit(self.app_rate_limit)]
+            buckets = self.app_buckets[region] + \
+                self.method_buckets.get((region, method), [])
+
+            wait = max(self.blocked_until.get(region, 0.0) - now,
+                       self.blocked_until.get((region, method), 0.0) - now,
+                       0.0)
+            for bucket in buckets:
+                wait = max(wait, bucket.wait_time(now))
+
+            if wait == 0.0:
+                for bucket in buckets:
+                    bucket.tokens -= 1
+            return wait
+
+    def acquire(self, region: str, method: str) -> None:
+        """
+        Block the calling thread until the call may be sent
+
+        Args:
+            region: routing host of the call
+            method: Riot API method of the call
+
+        Return:
+            None
+        """
+        start = time.monotonic()
+        wait = self.reserve(region, method)
+        while wait > 0:
+            time.sleep(wait)
+            wait = self.reserve(region, method)
+        metrics.rate_limit_wait_seconds.observe(
+            time.monotonic() - start, region=region)
+
+    async def acquire_async(self, region: str, method: str) -> None:
+        """
+        Wait on the event loop until the call may be sent
+
+        Args:
+            region: routing host of the call
+            method: Riot API method of the call
+
+        Return:
+            None
+        """
+        start = time.monotonic()
+        wait = self.reserve(region, method)
+        while wait > 0:
+            await asyncio.sleep(wait)
+            wait = self.reserve(region, method)
+        metrics.rate_limit_wait_seconds.observe(
+            time.monotonic() - start, region=region)
+
+    def update(self, region: str, method: str, headers: Mapping) -> None:
+        """
+        Sync the buckets with the limits and counts reported in a response
+
+        Args:
+            region: routing host of the call
+            method: Riot API method of the call
+            headers: response headers
+
+        Return:
+            None
+        """
+        with self._lock:
+            self.app_buckets[region] = self._sync_buckets(
+                self.app_buckets.get(region, []),
+                headers.get('X-App-Rate-Limit'), headers.get('X-App-Rate-Limit-Count'))
+            self.method_buckets[(region, method)] = self._sync_buckets(
+                self.method_buckets.get((region, method), []),
+                headers.get('X-Method-Rate-Limit'), headers.get('X-Method-Rate-Limit-Count'))
+
+    def penalize(self, region: str, method: str, headers: Mapping) -> float:
+        """
+        Hold back calls after a 429 for as long as Retry-After asks
+
+        Args:
+            region: routing host of the call
+            method: Riot API method of the call
+            headers: headers of the 429 response
+
+        Return:
+            The seconds calls are held back
+        """
+        retry_after = headers.get('Retry-After')
+        try:
+            retry_after = float(retry_after)
+        except (TypeError, ValueError):
+            retry_after = default_retry_after
+
+        # Only an application limit blocks every method of the region
+        if headers.get('X-Rate-Limit-Type') == 'application':
+            key = region
+        else:
+            key = (region, method)
+
+        with self._lock:
+            until = time.monotonic() + retry_after
+            self.blocked_until[key] = max(
+                self.blocked_until.get(key, 0.0), until)
+        return retry_after
+
+    @staticmethod
+    def _sync_buckets(buckets: List[TokenBucket], limit_header: Optional[str], count_header: Optional[str]) -> List[TokenBucket]:
+        """
+        Return buckets matching limit_header, with tokens lowered to what count_header allows
+
+        Args:
+            buckets: current buckets
+            limit_header: rate limit header value
+            count_header: rate limit count header value
+
+        Return:
+            The synced buckets
+        """
+        if not isinstance(limit_header, str):
+            return buckets
+
+        windows = parse_rate_limit(limit_header)
+        if [(bucket.limit, bucket.seconds) for bucket in buckets] != windows:
+            buckets = [TokenBucket(limit, seconds)
+                       for limit, seconds in windows]
+
+        if isinstance(count_header, str):
+            counts = dict((seconds, count)
+                          for count, seconds in parse_rate_limit(count_header))
+            for bucket in buckets:
+                if bucket.seconds in counts:
+                    bucket.sync(counts[bucket.seconds])
+
+        return buckets
+
+
+# Shared limiter used by riot_requests and riot_requests_async
+limiter = RateLimiter()
@@ -0,0 +1,69 @@
+import pytest
+import riot_requests
+from rate_limiter import RateLimiter, parse_rate_limit
+from unittest.mock import MagicMock, patch
+
+region = "https://americas.api.riotgames.com"
+method = "match-v5.by-match-id"
+
+
+def test_parse_rate_limit():
+    """
+    Test parse_rate_limit() with a two window header.
+    """
+    assert parse_rate_limit("20:1,100:120") == [(20, 1), (100, 120)]
+
+
+def test_reserve_waits_when_bucket_is_empty():
+    """
+    Test reserve() hands out the application limit and then asks the caller to wait.
+    """
+    limiter = RateLimiter("2:10")
+
+    assert limiter.reserve(region, method) == 0
+    assert limiter.reserve(region, method) == 0
+    assert limiter.reserve(region, method) == pytest.approx(5, abs=0.1)
+
+
+def test_update_syncs_with_count_headers():
+    """
+    Test update() applies the method limit and the counts reported by Riot.
+    """
+    limiter = RateLimiter("100:1")
+    limiter.update(region, method, {"X-Method-Rate-Limit": "3:10",
+                                    "X-Method-Rate-Limit-Count": "3:10"})
+
+    assert limiter.reserve(region, method) > 0
+    assert limiter.reserve(region, "summoner-v4.by-name") == 0
+
+
+def test_penalize_honors_retry_after():
+    """
+    Test penalize() blocks the whole region only for application limits.
+    """
+    limiter = RateLimiter("100:1")
+    limiter.penalize(region, method, {"Retry-After": "3",
+                                      "X-Rate-Limit-Type": "method"})
+
+    assert limiter.reserve(region, method) == pytest.approx(3, abs=0.1)
+    assert limiter.reserve(region, "summoner-v4.by-name") == 0
+
+    limiter.penalize(region, method, {"Retry-After": "2",
+                                      "X-Rate-Limit-Type": "application"})
+    assert limiter.reserve(region, "summoner-v4.by-name") == pytest.approx(
+        2, abs=0.1)
+
+
+def test_get_retries_after_429():
+    """
+    Test riot_requests._get() queues a call answered with 429 instead of failing it.
+    """
+    throttled = MagicMock(status_code=429, headers={"Retry-After": "0"})
+    ok = MagicMock(status_code=200, headers={})
+
+    with patch("riot_requests.limiter", RateLimiter("100:1")):
+        with patch("riot_session.get", side_effect=[throttled, ok]) as mock_get:
+            res = riot_requests._get(region, method, "/lol/match/v5/matches/NA1_1")
+
+    assert res is ok
+    assert mock_get.call_count == 2
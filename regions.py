@@ -0,0 +1,84 @@
+import os
+from typing import Dict
+
+# Regional cluster serving Match-V5 for each platform
+platform_clusters = {
+    "BR1": "AMERICAS", "LA1": "AMERICAS", "LA2": "AMERICAS", "NA1": "AMERICAS",
+    "EUN1": "EUROPE", "EUW1": "EUROPE", "RU": "EUROPE", "TR1": "EUROPE",
+    "JP1": "ASIA", "KR": "ASIA",
+    "OC1": "SEA", "PH2": "SEA", "SG2": "SEA", "TH2": "SEA", "TW2": "SEA", "VN2": "SEA",
+}
+
+# Platform of summoners looked up without one
+default_platform = os.getenv('RIOT_PLATFORM', 'NA1').upper()
+
+# Riot game API URLs, RIOT_<PLATFORM>_API_URL and RIOT_<CLUSTER>_API_URL point the clients
+# at a stand-in such as mock_riot_server. Every URL gets its own connection pool and rate limit budget.
+platform_urls: Dict[str, str] = {
+    platform: os.getenv(f'RIOT_{platform}_API_URL', f"https://{platform.lower()}.api.riotgames.com")
+    for platform in platform_clusters}
+cluster_urls: Dict[str, str] = {
+    cluster: os.getenv(f'RIOT_{cluster}_API_URL', f"https://{cluster.lower()}.api.riotgames.com")
+    for cluster in set(platform_clusters.values())}
+
+
+def normalize_platform(platform: str = None) -> str:
+    """
+    Return the platform id Riot uses for platform, e.g. "euw1" -> "EUW1"
+
+    Args:
+        platform: platform id in any case, None for default_platform
+
+    Return:
+        The platform id
+
+    Raises:
+        ValueError: if platform is not a Riot platform
+    """
+    if platform is None:
+        return default_platform
+    platform = platform.strip().upper()
+    if platform not in platform_clusters:
+        raise ValueError(f"Unknown platform {platform!r}")
+    return platform
+
+
+def platform_url(platform: str = None) -> str:
+    """
+    Return the URL of the platform host serving Summoner-V4 and Spectator-V4 for platform
+
+    Args:
+        platform: platform id, None for default_platform
+
+    Return:
+        The platform host URL
+    """
+    return platform_urls[normalize_platform(platform)]
+
+
+def regional_url(platform: str = None) -> str:
+    """
+    Return the URL of the regional cluster serving Match-V5 for platform
+
+    Args:
+        platform: platform id, None for default_platform
+
+    Return:
+        The regional cluster URL
+    """
+    return cluster_urls[platform_clusters[normalize_platform(platform)]]
+
+
+def platform_of_match(match_id: str) -> str:
+    """
+    Return the platform a match was played on from its id, e.g. "EUW1_6370000000" -> "EUW1".
+    Ids without a known platform prefix are taken to be from default_platform.
+
+    Args:
+        match_id: match id
+
+    Return:
+        The platform id
+    """
+    prefix = match_id.partition("_")[0].upper()
+    return prefix if prefix in platform_clusters else default_platform
@@ -0,0 +1,68 @@
+import asyncio
+import pytest
+import regions
+import riot_requests_async
+from summoner import Summoner
+from unittest.mock import patch
+
+
+def test_platforms_route_to_their_regional_cluster():
+    """
+    Test every platform is served by its own host and Match-V5 by its regional cluster.
+    """
+    assert regions.platform_url("euw1") == "https://euw1.api.riotgames.com"
+    assert regions.regional_url("EUW1") == "https://europe.api.riotgames.com"
+    assert regions.regional_url("KR") == "https://asia.api.riotgames.com"
+    assert regions.regional_url("OC1") == "https://sea.api.riotgames.com"
+    assert regions.regional_url() == regions.regional_url(regions.default_platform)
+    with pytest.raises(ValueError):
+        regions.platform_url("EUW")
+
+
+def test_platform_of_match():
+    """
+    Test a match id's prefix names its platform, and an unknown prefix falls back to the default.
+    """
+    assert regions.platform_of_match("EUW1_6370000000") == "EUW1"
+    assert regions.platform_of_match("KR_7000000000") == "KR"
+    assert regions.platform_of_match("4620414214") == regions.default_platform
+
+
+def test_requests_go_to_the_summoners_region():
+    """
+    Test summoner, match list, match and spectator requests reach the hosts of the summoner's platform,
+    and the same name on two platforms is cached as two summoners.
+    """
+    hosts = []
+
+    async def _get(host, method, path, params=None):
+        hosts.append((host, method))
+        if method == "summoner-v4.by-name":
+            return (200, {"name": "Faker", "id": host, "puuid": host})
+        if method == "match-v5.by-puuid":
+            return (200, [])
+        return (404, None)
+
+    async def run():
+        kr = await riot_requests_async.get_summoners_by_name("Faker", "KR")
+        euw = await riot_requests_async.get_summoners_by_name("Faker", "euw1")
+        await riot_requests_async.get_matches_by_puuid(kr.puuid, platform=kr.platform)
+        await riot_requests_async.get_active_game_info(euw.id, euw.platform)
+        return kr, euw
+
+    with patch("riot_requests_async._get", _get):
+        kr, euw = asyncio.run(run())
+
+    assert (kr.platform, euw.platform) == ("KR", "EUW1")
+    assert kr != euw
+    assert hosts == [("https://kr.api.riotgames.com", "summoner-v4.by-name"),
+                     ("https://euw1.api.riotgames.com", "summoner-v4.by-name"),
+                     ("https://asia.api.riotgames.com", "match-v5.by-puuid"),
+                     ("https://euw1.api.riotgames.com", "spectator-v4.by-summoner")]
+
+
+def test_summoner_defaults_to_default_platform():
+    """
+    Test a summoner built without a platform is on the default platform.
+    """
+    assert Summoner("Kid Orpheus", "id", "puuid").platform == regions.default_platform
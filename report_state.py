@@ -0,0 +1,287 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, tzinfo
+from match import PastMatch
+from summoner import Summoner
+from timezones import get_timezone
+from typing import Dict, List, Optional, Tuple
+
+# Location of the report state and how long ingested match ids and rollups are kept
+report_state_path = os.getenv('REPORT_STATE_PATH', 'report_state.sqlite3')
+report_state_retention_days = int(
+    os.getenv('REPORT_STATE_RETENTION_DAYS', '35'))
+
+# Days of the daily rollups are kept as strings in this format
+day_format = "%Y-%m-%d"
+
+
+def summoner_won(match: PastMatch, puuid: str) -> Optional[bool]:
+    """
+    Return whether the summoner with puuid was on the winning team of match.
+    Names change, so the summoner is found by puuid in the participant stats.
+
+    Args:
+        match: a past match
+        puuid: summoner puuid
+
+    Return:
+        True or False, or None if puuid did not play in match or match has no participant stats
+    """
+    # Riot lists participants team by team, the same order get_teams_info fills the teams in
+    seats = [team for team in match.teams for _ in team.participants]
+    if len(seats) != len(match.participants):
+        return None
+    for stats, team in zip(match.participants, seats):
+        if stats.puuid == puuid:
+            return None if team.win is None else bool(team.win)
+    return None
+
+
+class ReportState():
+    """
+    Per-PUUID ingestion state of weekly reports, kept in SQLite.
+    Stores the newest match ingested (the high-water mark), the ids and start times of ingested
+    matches, and running per-day rollups of games, seconds played and wins that weekly reports
+    take their totals from. Match ids and rollups older than retention_days are pruned together.
+Also keeps the channels subscribed to each watched summoner, so the watchlist survives restarts.
+
+    === Instance Attributes ===
+    path: SQLite database file, or ":memory:"
+    retention_days: Days ingested match ids and rollups are kept
+    tz: Timezone the daily rollups are keyed in, None for local time
+    """
+    path: str
+    retention_days: int
+    tz: Optional[tzinfo]
+
+    def __init__(self, path: str = report_state_path, retention_days: int = report_state_retention_days,
+                 tz: Optional[tzinfo] = None) -> None:
+        """
+        Initialize a ReportState object. The database is opened on first use.
+
+        Args:
+            path: SQLite database file, or ":memory:"
+            retention_days: Days ingested match ids and rollups are kept
+            tz: Timezone the daily rollups are keyed in, REPORT_TIMEZONE or local time by default
+
+        Return:
+            None
+        """
+        self.path = path
+        self.retention_days = retention_days
+        self.tz = tz if tz is not None else get_timezone()
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Return the database connection, creating the tables on first use
+
+        Args:
+            None
+
+        Return:
+            The database connection
+        """
+        if self._connection is None:
+            self._connection = sqlite3.connect(
+                self.path, check_same_thread=False)
+            self._connection.executescript(
+                "CREATE TABLE IF NOT EXISTS high_water_marks ("
+                " puuid TEXT PRIMARY KEY, match_id TEXT NOT NULL, start_time INTEGER NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS ingested_matches ("
+                " puuid TEXT NOT NULL, match_id TEXT NOT NULL, start_time INTEGER NOT NULL,"
+                " PRIMARY KEY (puuid, match_id));"
+                "CREATE INDEX IF NOT EXISTS ingested_matches_start_time"
+                " ON ingested_matches (puuid, start_time);"
+                "CREATE TABLE IF NOT EXISTS daily_rollups ("
+                " puuid TEXT NOT NULL, day TEXT NOT NULL, games INTEGER NOT NULL,"
+                " seconds INTEGER NOT NULL, wins INTEGER NOT NULL, PRIMARY KEY (puuid, day));"
+                "CREATE TABLE IF NOT EXISTS watches ("
+                " summoner_id TEXT NOT NULL, channel_id INTEGER NOT NULL, name TEXT NOT NULL,"
+                " puuid TEXT NOT NULL, platform TEXT NOT NULL, PRIMARY KEY (summoner_id, channel_id));")
+        return self._connection
+
+    def get_high_water_mark(self, puuid: str) -> Optional[Tuple[str, int]]:
+        """
+        Return the newest match ingested for puuid
+
+        Args:
+            puuid: summoner puuid
+
+        Return:
+            (match_id, start_time) of the newest ingested match, or None if nothing was ingested
+        """
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT match_id, start_time FROM high_water_marks WHERE puuid = ?", (puuid,)).fetchone()
+        return tuple(row) if row is not None else None
+
+    def ingest(self, puuid: str, match_ids: List[str], matches: List[PastMatch]) -> int:
+        """
+        Merge newly fetched matches into the state of puuid.
+        Matches already ingested are skipped, so overlapping fetches are harmless.
+
+        Args:
+            puuid: summoner puuid
+            match_ids: ids of the matches
+            matches: the matches, in the same order as match_ids
+
+        Return:
+            The number of matches that were new
+        """
+        new = 0
+        with self._lock:
+            connection = self._connect()
+            for match_id, match in zip(match_ids, matches):
+                start_time = int(match.start_time.timestamp())
+                cursor = connection.execute(
+                    "INSERT OR IGNORE INTO ingested_matches (puuid, match_id, start_time) VALUES (?, ?, ?)",
+                    (puuid, match_id, start_time))
+                if cursor.rowcount == 0:
+                    continue
+                new += 1
+
+                won = 1 if summoner_won(match, puuid) else 0
+                connection.execute(
+                    "INSERT INTO daily_rollups (puuid, day, games, seconds, wins) VALUES (?, ?, 1, ?, ?) "
+                    "ON CONFLICT (puuid, day) DO UPDATE SET games = games + 1,"
+                    " seconds = seconds + excluded.seconds, wins = wins + excluded.wins",
+                    (puuid, self._day(start_time), int(match.duration.total_seconds()), won))
+                connection.execute(
+                    "INSERT INTO high_water_marks (puuid, match_id, start_time) VALUES (?, ?, ?) "
+                    "ON CONFLICT (puuid) DO UPDATE SET match_id = excluded.match_id, start_time = excluded.start_time "
+                    "WHERE excluded.start_time > high_water_marks.start_time",
+                    (puuid, match_id, start_time))
+
+            cutoff = int(time.time()) - self.retention_days * 24 * 60 * 60
+            connection.execute(
+                "DELETE FROM ingested_matches WHERE puuid = ? AND start_time < ?", (puuid, cutoff))
+            connection.execute(
+                "DELETE FROM daily_rollups WHERE puuid = ? AND day < ?", (puuid, self._day(cutoff)))
+            connection.commit()
+
+        return new
+
+    def match_ids_between(self, puuid: str, start: float, end: float) -> List[str]:
+        """
+        Return the ingested match ids of puuid started between start and end, newest first
+
+        Args:
+            puuid: summoner puuid
+            start: start of the range in epoch seconds
+            end: end of the range in epoch seconds
+
+        Return:
+            A list of match ids
+        """
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT match_id FROM ingested_matches WHERE puuid = ? AND start_time >= ? AND start_time < ? "
+                "ORDER BY start_time DESC", (puuid, int(start), int(end))).fetchall()
+        return [row[0] for row in rows]
+
+    def _day(self, timestamp: float) -> str:
+        """
+        Return the day rollups of timestamp are kept under
+
+        Args:
+            timestamp: epoch seconds
+
+        Return:
+            The day in tz, "YYYY-MM-DD"
+        """
+        return datetime.fromtimestamp(timestamp, self.tz).strftime(day_format)
+
+    def rollups(self, puuid: str, start: float, end: float) -> Dict[str, Dict[str, int]]:
+        """
+        Return the daily rollups of puuid for every day from the one holding start to the one holding end
+
+        Args:
+            puuid: summoner puuid
+            start: start of the range in epoch seconds
+            end: end of the range in epoch seconds
+
+        Return:
+            A dictionary of {"games", "seconds", "wins"} by day, "YYYY-MM-DD" in tz
+        """
+        start_day, end_day = self._day(start), self._day(end)
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT day, games, seconds, wins FROM daily_rollups WHERE puuid = ? AND day BETWEEN ? AND ? "
+                "ORDER BY day", (puuid, start_day, end_day)).fetchall()
+        return {day: {"games": games, "seconds": seconds, "wins": wins}
+                for day, games, seconds, wins in rows}
+
+    def save_watch(self, summoner: Summoner, channel_id: int) -> None:
+        """
+        Record that channel_id is subscribed to summoner
+
+        Args:
+            summoner: Summoner DTO (Data Transfer Object)
+            channel_id: Discord channel
+
+        Return:
+            None
+        """
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT INTO watches (summoner_id, channel_id, name, puuid, platform) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (summoner_id, channel_id) DO UPDATE SET name = excluded.name",
+                (summoner.id, channel_id, summoner.name, summoner.puuid, summoner.platform))
+            connection.commit()
+
+    def delete_watch(self, summoner_id: str, channel_id: int) -> None:
+        """
+        Forget that channel_id is subscribed to summoner_id
+
+        Args:
+            summoner_id: summoner id
+            channel_id: Discord channel
+
+        Return:
+            None
+        """
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "DELETE FROM watches WHERE summoner_id = ? AND channel_id = ?", (summoner_id, channel_id))
+            connection.commit()
+
+    def watches(self) -> List[Tuple[Summoner, int]]:
+        """
+        Return every recorded subscription
+
+        Args:
+            None
+
+        Return:
+            A list of (summoner, channel_id)
+        """
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT name, summoner_id, puuid, platform, channel_id FROM watches").fetchall()
+        return [(Summoner(name, summoner_id, puuid, platform), channel_id)
+                for name, summoner_id, puuid, platform, channel_id in rows]
+
+    def close(self) -> None:
+        """
+        Close the database connection
+
+        Args:
+            None
+
+        Return:
+            None
+        """
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+# Shared state used by responses
+state = ReportState()
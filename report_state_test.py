@@ -0,0 +1,104 @@
+import asyncio
+import responses
+import time
+from datetime import datetime, timedelta
+from match import PastMatch
+from participant import ParticipantStats
+from report_state import ReportState, summoner_won
+from riot_requests import get_last_week_range
+from summoner import Summoner
+from team import Team
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
+
+summoner = Summoner("Kid Orpheus", "id", "puuid")
+
+
+def past_match(start_time: datetime, win: bool) -> PastMatch:
+    teams = [Team(100, ["Kid Orpheus"], win), Team(200, ["Raymmp"], not win)]
+    stats = [ParticipantStats("puuid", "Mordekaiser", 1, 1, 1), ParticipantStats("raymmp", "Ahri", 1, 1, 1)]
+    return PastMatch(start_time, start_time + timedelta(minutes=30), timedelta(minutes=30), teams, stats)
+
+
+def test_summoner_won():
+    """
+    Test summoner_won() finds the summoner's team by puuid, whatever name they played under.
+    """
+    match = past_match(datetime(2023, 4, 3, 20), True)
+
+    assert summoner_won(match, "puuid") is True
+    assert summoner_won(match, "raymmp") is False
+    assert summoner_won(match, "Kid Orpheus") is None
+    assert summoner_won(PastMatch(match.start_time, match.end_time, match.duration, match.teams), "puuid") is None
+
+
+def test_ingest_moves_high_water_mark_and_rolls_up():
+    """
+    Test ingest() skips known matches, keeps the newest match as high-water mark and rolls up each day.
+    """
+    state = ReportState(":memory:", tz=ZoneInfo("UTC"))
+    now = datetime.now(ZoneInfo("UTC")).replace(tzinfo=None, hour=12, minute=0, second=0, microsecond=0)
+    day = now.strftime("%Y-%m-%d")
+    first = past_match(now.replace(tzinfo=ZoneInfo("UTC")), True)
+    second = past_match(now.replace(tzinfo=ZoneInfo("UTC")) + timedelta(hours=1), False)
+
+    assert state.get_high_water_mark("puuid") is None
+    assert state.ingest("puuid", ["NA1_1"], [first]) == 1
+    assert state.ingest("puuid", ["NA1_1", "NA1_2"], [first, second]) == 1
+
+    assert state.get_high_water_mark("puuid") == ("NA1_2", int(second.start_time.timestamp()))
+    assert state.rollups("puuid", first.start_time.timestamp(), second.start_time.timestamp()) == {
+        day: {"games": 2, "seconds": 3600, "wins": 1}}
+    assert state.match_ids_between("puuid", 0, 2 ** 40) == ["NA1_2", "NA1_1"]
+
+
+def test_rollups_are_pruned_with_match_ids():
+    """
+    Test rollups of days older than retention_days are pruned along with their match ids.
+    """
+    state = ReportState(":memory:", retention_days=7)
+    old = past_match(datetime.now() - timedelta(days=10), True)
+    recent = past_match(datetime.now() - timedelta(days=1), True)
+
+    state.ingest("puuid", ["NA1_1", "NA1_2"], [old, recent])
+
+    assert list(state.rollups("puuid", 0, time.time()).values()) == [{"games": 1, "seconds": 1800, "wins": 1}]
+    assert state.match_ids_between("puuid", 0, 2 ** 40) == ["NA1_2"]
+
+
+def test_weekly_report_only_lists_after_high_water_mark():
+    """
+    Test a second weekly report lists match ids from the high-water mark and fetches only new matches.
+    """
+    start, end = get_last_week_range()
+    old = past_match(datetime.fromtimestamp(start + 3600), True)
+    new = past_match(datetime.fromtimestamp(start + 7200), False)
+    matches = {"NA1_1": old, "NA1_2": new}
+    listed_from = []
+
+    async def iter_match_ids_by_puuid(puuid, start_time, end_time, platform=None):
+        listed_from.append(int(start_time))
+        for match_id in (["NA1_2", "NA1_1"] if len(listed_from) == 2 else ["NA1_1"]):
+            if matches[match_id].start_time.timestamp() >= int(start_time):
+                yield match_id
+
+    async def get_matches_by_match_ids(match_ids):
+        if hasattr(match_ids, "__aiter__"):
+            match_ids = [match_id async for match_id in match_ids]
+        return [matches[match_id] for match_id in match_ids]
+
+    async def get_summoners_by_name(summoner_name, platform=None):
+        return summoner
+
+    with patch("riot_requests_async.get_summoners_by_name", get_summoners_by_name), \
+            patch("riot_requests_async.iter_match_ids_by_puuid", iter_match_ids_by_puuid), \
+            patch("riot_requests_async.get_matches_by_match_ids", get_matches_by_match_ids):
+        first_report = asyncio.run(responses.weekly_report("Kid Orpheus"))
+        second_report = asyncio.run(responses.weekly_report("Kid Orpheus"))
+
+    assert first_report.number_of_matches == 1
+    assert second_report.number_of_matches == 2
+    assert listed_from[1] == int(old.start_time.timestamp())
+    # Totals and the time played chart come from the daily rollups
+    assert (first_report.wins, second_report.wins) == (1, 1)
+    assert second_report.buckets.total_seconds.sum() == 3600
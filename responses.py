@@ -1,70 +1,444 @@
-from typing import List, Dict
-import riot_requests
-from weekly_report import WeeklyReport
-import matplotlib.figure as fig
+from typing import TYPE_CHECKING, AsyncIterator, List, Dict, Optional, Tuple
+import asyncio
+import time
+from datetime import datetime
+from exceptions import RiotUnavailable
+import match_history
+import match_index
+import report_state
+import riot_requests_async
+from riot_requests import get_last_week_range, parse_active_match
+from single_flight import AsyncSingleFlight
+from summoner_cache import cache_key
+from worker_pool import pool
 
+# weekly_report pulls in NumPy, it is imported by the first report instead of at startup
+if TYPE_CHECKING:
+    from match import PastMatch
+    from match_table import ParticipantIndex
+    from summoner import Summoner
+    from weekly_report import WeeklyReport
 
-def active(summoner_name: str) -> str:
+# Concurrent identical commands for the same summoner share one result
+flights = AsyncSingleFlight()
+
+# Leads answers built from saved data while Riot is failing
+stale_notice = "Riot is not answering right now, showing saved data that may be out of date.\n"
+
+
+async def active(summoner_name: str, platform: str = None) -> str:
     """
     Return a string of active game information given summoner_name.
+    Concurrent calls for the same summoner share one in-flight result.
 
     Args:
         summoner_name (str): summoner name
+        platform (str): platform id such as "EUW1", None for regions.default_platform
 
     Returns:
         active_game (str): a string of active game information
     """
-    summoner = riot_requests.get_summoners_by_name(summoner_name)
+    return await flights.do(("active", cache_key(summoner_name, platform)), _active, summoner_name, platform)
 
-    active_game = riot_requests.get_active_games_by_summoner_id(summoner.id)
+
+async def _active(summoner_name: str, platform: str = None) -> str:
+    """
+    Return a string of active game information given summoner_name.
+
+    Args:
+        summoner_name (str): summoner name
+        platform (str): platform id such as "EUW1", None for regions.default_platform
+
+    Returns:
+        active_game (str): a string of active game information
+    """
+    summoner = await riot_requests_async.get_summoners_by_name(summoner_name, platform)
+
+    active_game = await riot_requests_async.get_active_games_by_summoner_id(summoner.id, summoner.platform)
+
+    if active_game is None:
+        return f"{summoner.name} isn't playing League of Legends right now."
 
     return str(active_game)
 
 
-def past(summoner_name: str) -> str:
+async def active_group(summoner_names: List[str], platform: str = None) -> List[str]:
+    """
+    Return the active game information of every summoner in summoner_names.
+    The summoners are checked together under one concurrency budget, summoners
+    playing the same game share one summary.
+
+    Args:
+        summoner_names (List[str]): summoner names
+        platform (str): platform id of the summoners, None for regions.default_platform
+
+    Returns:
+        active_games (List[str]): a summary per game being played, then who isn't playing
+    """
+    summoners = await asyncio.gather(*(riot_requests_async.get_summoners_by_name(summoner_name, platform)
+                                       for summoner_name in summoner_names))
+    match_infos = await riot_requests_async.get_active_games_info(
+        [summoner.id for summoner in summoners], platform)
+
+    games: Dict[int, Tuple[Dict, List[str]]] = {}
+    idle = []
+    for summoner in summoners:
+        match_info = match_infos[summoner.id]
+        if match_info is None:
+            idle.append(summoner.name)
+        else:
+            games.setdefault(match_info.get("gameId"), (match_info, []))[1].append(summoner.name)
+
+    active_games = [f"{', '.join(names)} in game:\n{parse_active_match(match_info)}"
+                    for match_info, names in games.values()]
+    if idle:
+        active_games.append(f"Not playing League of Legends right now: {', '.join(idle)}")
+
+    return active_games
+
+
+async def past(summoner_name: str, platform: str = None) -> str:
+    """
+    Return a string of past game information given summoner_name.
+    Concurrent calls for the same summoner share one in-flight result.
+
+    Args:
+        summoner_name (str): summoner name
+        platform (str): platform id such as "EUW1", None for regions.default_platform
+
+    Returns:
+        past_games_str (str): a string of past game information
+    """
+    return await flights.do(("past", cache_key(summoner_name, platform)), _past, summoner_name, platform)
+
+
+async def _past(summoner_name: str, platform: str = None) -> str:
     """
     Return a string of past game information given summoner_name.
 
     Args:
         summoner_name (str): summoner name
+        platform (str): platform id such as "EUW1", None for regions.default_platform
 
     Returns:
         past_games_str (str): a string of past game information
     """
-    summoner = riot_requests.get_summoners_by_name(summoner_name)
+    summoner = await riot_requests_async.get_summoners_by_name(summoner_name, platform)
+
+    try:
+        past_games_id = await riot_requests_async.get_matches_by_puuid(summoner.puuid, platform=summoner.platform)
+
+        past_games = await riot_requests_async.get_matches_by_match_ids(past_games_id)
 
-    past_games_id = riot_requests.get_matches_by_puuid(summoner.puuid)
+        past_games_str = ""
+    except RiotUnavailable:
+        # The newest matches in the local match history stand in while Riot is failing
+        past_games = await pool.run(match_history.history.matches, summoner.puuid, 0, time.time(), 5)
 
-    past_games_str = ""
+        past_games_str = stale_notice
 
-    for game_id in past_games_id:
-        game = riot_requests.get_matches_by_match_id(game_id)
+    for game in past_games:
         past_games_str += str(game)
 
     return past_games_str
 
 
-def weekly_report(summoner_name: str) -> WeeklyReport:
+async def _record(match_ids: AsyncIterator[str], seen: List[str]) -> AsyncIterator[str]:
+    """
+    Yield every id of match_ids and append it to seen
+
+    Args:
+        match_ids (AsyncIterator[str]): a stream of match ids
+        seen (List[str]): list the ids are appended to
+
+    Yields:
+        match_id (str): the next match id
+    """
+    async for match_id in match_ids:
+        seen.append(match_id)
+        yield match_id
+
+
+def _ingest(puuid: str, list_from: float, end_date: float,
+            match_ids: List[str], matches: List["PastMatch"]) -> None:
+    """
+    Record newly listed matches in the report state and the local match history.
+    Blocking, run it on the worker pool.
+
+    Args:
+        puuid (str): summoner puuid
+        list_from (float): start of the listed span in epoch seconds
+        end_date (float): end of the listed span in epoch seconds
+        match_ids (List[str]): every match id listed in the span
+        matches (List[PastMatch]): the matches, in the same order as match_ids
+
+    Returns:
+        None
+    """
+    report_state.state.ingest(puuid, match_ids, matches)
+    match_history.history.ingest(puuid, list_from, end_date, match_ids, matches)
+
+
+def _build_weekly_report(summoner: "Summoner", matches: List["PastMatch"], start_date: float,
+                         end_date: float, stale: bool = False,
+                         index: Optional["ParticipantIndex"] = None) -> "WeeklyReport":
+    """
+    Return the weekly report of summoner, with its totals and day buckets read from the daily rollups
+    of the summoner's ingested matches. A stale report sums the saved matches instead, as the matches
+    Riot could not list are not rolled up.
+    The matches are kept in a MatchTable, so the report holds a few arrays instead of the match objects.
+    Aggregating and drawing charts is CPU work, run it on the worker pool.
+
+    Args:
+        summoner (Summoner): the summoner
+        matches (List[PastMatch]): their matches between start_date and end_date, newest first
+        start_date (float): start of the report in epoch seconds
+        end_date (float): end of the report in epoch seconds
+        stale (bool): whether Riot could not be reached and matches are the saved ones only
+        index (Optional[ParticipantIndex]): participant names shared with other reports, a new one by default
+
+    Returns:
+        weekly_report (WeeklyReport): a WeeklyReport object
+    """
+    from match_table import MatchTable
+    from weekly_report import WeeklyReport
+
+    rollups = None if stale else report_state.state.rollups(summoner.puuid, start_date, end_date)
+    weekly_report = WeeklyReport(summoner, MatchTable.from_matches(matches, index), start_date, end_date,
+                                 "day", None, rollups)
+    weekly_report.stale = stale
+    return weekly_report
+
+
+async def weekly_report(summoner_name: str, platform: str = None) -> "WeeklyReport":
+    """
+    Return the weekly report of summoner_name.
+    Concurrent calls for the same summoner share one in-flight result.
+
+    Args:
+        summoner_name (str): summoner name
+        platform (str): platform id such as "EUW1", None for regions.default_platform
+
+    Returns:
+        weekly_report (WeeklyReport): a WeeklyReport object
+    """
+    return await flights.do(("weekly_report", cache_key(summoner_name, platform)),
+                            _weekly_report, summoner_name, platform)
+
+
+async def _weekly_report(summoner_name: str, platform: str = None) -> "WeeklyReport":
     """
     Return a string of graph given summoner_name.
 
     Args:
         summoner_name (str): summoner name
+        platform (str): platform id such as "EUW1", None for regions.default_platform
 
     Returns:
         weekly_report (WeeklyReport): a WeeklyReport object
     """
-    summoner = riot_requests.get_summoners_by_name(summoner_name)
+    summoner = await riot_requests_async.get_summoners_by_name(summoner_name, platform)
+
+    start_date, end_date = get_last_week_range()
+
+    # Only list matches from the newest one already ingested onwards
+    high_water_mark = await pool.run(report_state.state.get_high_water_mark, summoner.puuid)
+    list_from = start_date if high_water_mark is None else max(
+        start_date, high_water_mark[1])
+
+    stale = False
+    try:
+        # Match details are fetched while later pages of match ids are still arriving
+        new_games_id = []
+        new_games = await riot_requests_async.get_matches_by_match_ids(_record(
+            riot_requests_async.iter_match_ids_by_puuid(summoner.puuid, list_from, end_date,
+                                                        platform=summoner.platform), new_games_id))
+        await pool.run(_ingest, summoner.puuid, list_from, end_date, new_games_id, new_games)
+
+        # Matches ingested by earlier reports are read back from the match store
+        past_games_id = await pool.run(report_state.state.match_ids_between,
+                                       summoner.puuid, start_date, end_date)
+        past_games = await riot_requests_async.get_matches_by_match_ids(past_games_id)
+        await pool.run(match_history.history.add, past_games_id, past_games, summoner.puuid)
+    except RiotUnavailable:
+        # The week's matches already in the local match history stand in while Riot is failing
+        past_games = await pool.run(match_history.history.matches, summoner.puuid, start_date, end_date)
+        stale = True
+
+    # Aggregating matches and drawing charts is CPU work, keep it off the event loop
+    weekly_report = await pool.run(_build_weekly_report, summoner, past_games, start_date, end_date, stale)
+
+    return weekly_report
+
+
+async def weekly_reports(summoner_names: List[str], platform: str = None) -> List["WeeklyReport"]:
+    """
+    Return the weekly report of every summoner in summoner_names, in the same order.
+    A group who play together share many matches, every distinct match is fetched once
+    and each summoner's matches are then read from the shared match index.
+
+    Args:
+        summoner_names (List[str]): summoner names
+        platform (str): platform id of the summoners, None for regions.default_platform
+
+    Returns:
+        weekly_reports (List[WeeklyReport]): a WeeklyReport object per summoner name
+    """
+    summoners = await asyncio.gather(*(riot_requests_async.get_summoners_by_name(summoner_name, platform)
+                                       for summoner_name in summoner_names))
+
+    start_date, end_date = get_last_week_range()
+
+    async def list_new_matches(summoner: "Summoner") -> Tuple[float, List[str]]:
+        # Only list matches from the newest one already ingested onwards
+        high_water_mark = await pool.run(report_state.state.get_high_water_mark, summoner.puuid)
+        list_from = start_date if high_water_mark is None else max(
+            start_date, high_water_mark[1])
+        return (list_from, [match_id async for match_id in
+                            riot_requests_async.iter_match_ids_by_puuid(summoner.puuid, list_from, end_date,
+                                                                        platform=summoner.platform)])
+
+    try:
+        listed = await asyncio.gather(*(list_new_matches(summoner) for summoner in summoners))
+        new_games_ids = [match_ids for _, match_ids in listed]
+        past_games_ids = [await pool.run(report_state.state.match_ids_between, summoner.puuid, start_date, end_date)
+                          for summoner in summoners]
+
+        # Every distinct match of the group is fetched once
+        distinct_ids = list(dict.fromkeys(
+            match_id for match_ids in new_games_ids + past_games_ids for match_id in match_ids))
+        games = dict(zip(distinct_ids, await riot_requests_async.get_matches_by_match_ids(distinct_ids)))
+    except RiotUnavailable:
+        # The week's matches already in the local match history stand in while Riot is failing
+        weekly_reports = []
+        for summoner in summoners:
+            past_games = await pool.run(match_history.history.matches, summoner.puuid, start_date, end_date)
+            weekly_reports.append(await pool.run(_build_weekly_report, summoner, past_games,
+                                                 start_date, end_date, True))
+        return weekly_reports
+
+    from match_table import ParticipantIndex
+
+    # The group plays together, their reports share one copy of every participant name
+    index = ParticipantIndex()
+    weekly_reports = []
+    for summoner, (list_from, new_games_id), past_games_id in zip(summoners, listed, past_games_ids):
+        # Matches stored without participant stats are listed under the summoner whose list had them
+        for match_id in new_games_id + past_games_id:
+            match_index.index.add(
+                match_id, games[match_id], (summoner.puuid,))
+        await pool.run(_ingest, summoner.puuid, list_from, end_date, new_games_id,
+                       [games[match_id] for match_id in new_games_id])
+        await pool.run(match_history.history.add, past_games_id,
+                       [games[match_id] for match_id in past_games_id], summoner.puuid)
+
+        past_games = match_index.index.matches(
+            summoner.puuid, start_date, end_date)
+        weekly_reports.append(await pool.run(_build_weekly_report, summoner, past_games, start_date, end_date,
+                                             False, index))
+
+    return weekly_reports
+
+
+async def _history_matches(summoner_name: str, start_date: float, end_date: float,
+                           platform: str = None) -> Tuple["Summoner", List["PastMatch"], bool]:
+    """
+    Return the summoner and the matches they started between start_date and end_date from the
+    local match history. Riot is only asked for the matches when the history does not cover the range,
+    and if Riot is failing the matches already stored are returned as stale.
+
+    Args:
+        summoner_name (str): summoner name
+        start_date (float): start of the range in epoch seconds
+        end_date (float): end of the range in epoch seconds
+        platform (str): platform id such as "EUW1", None for regions.default_platform
+
+    Returns:
+        (summoner, matches, stale) (Tuple[Summoner, List[PastMatch], bool]): the summoner, their matches
+            newest first, and whether the range may be missing matches Riot could not list
+    """
+    summoner = await riot_requests_async.get_summoners_by_name(summoner_name, platform)
+    history = match_history.history
 
-    past_games_id, start_date = riot_requests.get_last_week_matches_by_puuid(
-        summoner.puuid)
+    # Matches can not start in the future, a range ending later is complete once listed up to now
+    end_date = min(end_date, time.time())
+    stale = False
+    if not await pool.run(history.covers, summoner.puuid, start_date, end_date):
+        games_id = []
+        try:
+            games = await riot_requests_async.get_matches_by_match_ids(_record(
+                riot_requests_async.iter_match_ids_by_puuid(summoner.puuid, start_date, end_date,
+                                                            platform=summoner.platform), games_id))
+            await pool.run(history.ingest, summoner.puuid, start_date, end_date, games_id, games)
+        except RiotUnavailable:
+            stale = True
 
-    past_games = []
+    return (summoner, await pool.run(history.matches, summoner.puuid, start_date, end_date), stale)
 
-    for game_id in past_games_id:
-        game = riot_requests.get_matches_by_match_id(game_id)
-        past_games.append(game)
 
-    weekly_report = WeeklyReport(summoner, past_games, start_date)
+async def history_report(summoner_name: str, start_date: float, end_date: float,
+                         bucket: str = "day", platform: str = None) -> "WeeklyReport":
+    """
+    Return the report of summoner_name's matches between start_date and end_date.
+    Ranges the local match history covers are read without calling Riot.
+
+    Args:
+        summoner_name (str): summoner name
+        start_date (float): start of the report in epoch seconds
+        end_date (float): end of the report in epoch seconds
+        bucket (str): bucket size of the charts, one of aggregation.BUCKETS
+        platform (str): platform id such as "EUW1", None for regions.default_platform
+
+    Returns:
+        weekly_report (WeeklyReport): a WeeklyReport object over the range
+    """
+    summoner, games, stale = await _history_matches(summoner_name, start_date, end_date, platform)
+
+    from weekly_report import WeeklyReport
+
+    weekly_report = await pool.run(WeeklyReport, summoner, games, start_date, end_date, bucket)
+    weekly_report.stale = stale
 
     return weekly_report
+
+
+async def window_report(summoner_name: str, window: str, platform: str = None) -> "WeeklyReport":
+    """
+    Return the report of summoner_name's matches over the window ending now
+
+    Args:
+        summoner_name (str): summoner name
+        window (str): one of aggregation.WINDOWS
+        platform (str): platform id such as "EUW1", None for regions.default_platform
+
+    Returns:
+        weekly_report (WeeklyReport): a WeeklyReport object over the window, bucketed by aggregation.WINDOW_BUCKETS
+    """
+    from aggregation import WINDOW_BUCKETS, window_range
+
+    start_date, end_date = window_range(window, time.time())
+    return await history_report(summoner_name, start_date, end_date, WINDOW_BUCKETS[window], platform)
+
+
+async def playtime(summoner_name: str, start_date: float, end_date: float, platform: str = None) -> str:
+    """
+    Return a string of how much summoner_name played between start_date and end_date
+
+    Args:
+        summoner_name (str): summoner name
+        start_date (float): start of the range in epoch seconds
+        end_date (float): end of the range in epoch seconds
+        platform (str): platform id such as "EUW1", None for regions.default_platform
+
+    Returns:
+        playtime (str): games, time played, wins and KDA over the range
+    """
+    summoner, _, stale = await _history_matches(summoner_name, start_date, end_date, platform)
+    totals = await pool.run(match_history.history.totals, summoner.puuid, start_date, end_date)
+
+    hours, minutes = divmod(totals["seconds"] // 60, 60)
+    start_str = datetime.fromtimestamp(start_date).strftime("%m/%d/%Y")
+    end_str = datetime.fromtimestamp(end_date).strftime("%m/%d/%Y")
+    return ((stale_notice if stale else "") +
+            f"{summoner.name} played {totals['games']} games ({hours}h {minutes}m) from {start_str} to {end_str}, "
+            f"won {totals['wins']}, {totals['kills']}/{totals['deaths']}/{totals['assists']} KDA")
@@ -1,27 +1,137 @@
 from datetime import datetime, timedelta
 from match import PastMatch, ActiveMatch
-import json
-import os
-import requests
+import circuit_breaker
+import match_index
+import match_json
+import match_store
+import metrics
+import regions
+import riot_session
+import spectator_cache
+import summoner_cache
+from single_flight import SingleFlight
+from circuit_breaker import backoff_delay, riot_max_retries, server_error_statuses
+from rate_limiter import limiter, max_rate_limit_retries
+from participant import ParticipantStats
 from team import Team
-from dotenv import load_dotenv
-from exceptions import SummonerNotFound
+from exceptions import SummonerNotFound, MatchNotFound, RiotAPIError, RiotUnavailable
 from summoner import Summoner
+import itertools
+import sys
 import time
-from typing import List, Dict, Tuple
+from typing import TYPE_CHECKING, List, Dict, Iterator, Optional, Tuple
 
-# Load .env keys
-load_dotenv()
-api_key = os.getenv('API_KEY')
+if TYPE_CHECKING:
+    import requests
 
-# Riot game API URL
-na1_api_url = "https://na1.api.riotgames.com"
-americas_api_url = "https://americas.api.riotgames.com"
+# Largest page of match ids Match-V5 returns
+match_ids_page_size = 100
+
+# Concurrent identical summoner and match fetches share one request
+flights = SingleFlight()
 
 
 ###################################################################
 # Helper Functions
 
+def _get(host: str, method: str, path: str, params: Dict = None) -> "requests.Response":
+    """
+    Send a GET request, retrying server errors and timeouts with jittered exponential backoff.
+    Calls to an endpoint whose circuit breaker is open fail fast.
+
+    Args:
+        host (str): base URL of the Riot host
+        method (str): Riot API method, used as the method rate limit key
+        path (str): request path
+        params (Dict): query parameters
+
+    Returns:
+        res (requests.Response): the response
+
+    Raises:
+        RiotUnavailable: if every attempt failed or the endpoint's circuit is open
+    """
+    # Already loaded by riot_session with the first session
+    import requests
+
+    endpoint = (host, method)
+    status = None
+    for attempt in range(riot_max_retries + 1):
+        if attempt > 0:
+            time.sleep(backoff_delay(attempt - 1))
+        if not circuit_breaker.breaker.allow(endpoint):
+            raise RiotUnavailable(path, status)
+
+        try:
+            res = _send(host, method, path, params)
+        except requests.RequestException as e:
+            status, reason = None, type(e).__name__
+        except BaseException:
+            # A cancelled or otherwise interrupted call must not keep the probe slot
+            circuit_breaker.breaker.release(endpoint)
+            raise
+        else:
+            if res.status_code not in server_error_statuses:
+                circuit_breaker.breaker.record_success(endpoint)
+                return res
+            status, reason = res.status_code, str(res.status_code)
+
+        circuit_breaker.breaker.record_failure(endpoint)
+        if attempt < riot_max_retries:
+            metrics.riot_retries_total.inc(method=method, reason=reason)
+
+    raise RiotUnavailable(path, status)
+
+
+def _send(host: str, method: str, path: str, params: Dict = None) -> "requests.Response":
+    """
+    Send a GET request once the rate limiter allows it.
+    Calls answered with 429 wait for Retry-After and are sent again.
+
+    Args:
+        host (str): base URL of the Riot host
+        method (str): Riot API method, used as the method rate limit key
+        path (str): request path
+        params (Dict): query parameters
+
+    Returns:
+        res (requests.Response): the response
+    """
+    for attempt in range(max_rate_limit_retries + 1):
+        limiter.acquire(host, method)
+        start = time.perf_counter()
+        res = riot_session.get(host, path, params)
+        metrics.riot_request_seconds.observe(
+            time.perf_counter() - start, method=method, status=res.status_code)
+        # The body is already read, chunked and compressed responses carry no usable Content-Length
+        metrics.riot_response_bytes.observe(len(res.content), method=method)
+        limiter.update(host, method, res.headers)
+
+        if res.status_code != 429:
+            break
+        limiter.penalize(host, method, res.headers)
+
+    return res
+
+
+def check_response(res: "requests.Response", path: str) -> None:
+    """
+    Raise if the response carries an error status instead of a payload
+
+    Args:
+        res (requests.Response): the response
+        path (str): request path
+
+    Returns:
+        None
+
+    Raises:
+        RiotAPIError: if the response status is not successful
+    """
+    if not res.ok:
+        raise RiotAPIError(res.status_code, path)
+
+
 def get_teams_info(participants: List, active: bool) -> List[Team]:
     """
     Return a list of teams in the match including participants and win result
@@ -41,25 +151,174 @@ def get_teams_info(participants: List, active: bool) -> List[Team]:
         team1 = Team(200, [], participants[9]["win"])
 
     for participant in participants:
+        # Interned so a long history holds one copy of each summoner name
+        summoner_name = sys.intern(participant["summonerName"])
         # Add participant to List
         if team0.id == participant["teamId"]:
-            team0.participants.append(participant["summonerName"])
+            team0.participants.append(summoner_name)
         else:
-            team1.participants.append(participant["summonerName"])
+            team1.participants.append(summoner_name)
 
     teams = [team0, team1]
 
     return teams
 
+
+def get_last_week_range() -> Tuple[float, float]:
+    """
+    Return the (start, end) epoch seconds of the last 7 days
+
+    Args:
+        None
+
+    Returns:
+        (last_week, current_time) (Tuple[float, float]): start and end of last week
+    """
+    current_time = time.time()
+    seconds_in_week = 7 * 24 * 60 * 60
+    last_week = current_time - seconds_in_week
+
+    return (last_week, current_time)
+
+
+def parse_summoner(summoner_info: Dict, platform: str = None) -> Summoner:
+    """
+    Return summoner DTO (Data Transfer Object) given a Summoner-V4 payload
+
+    Args:
+        summoner_info (Dict): decoded Summoner-V4 response
+        platform (str): platform the payload came from, None for regions.default_platform
+
+    Returns:
+        summoner (Summoner): A summoner object
+    """
+    return Summoner(
+        summoner_info['name'], summoner_info['id'], summoner_info['puuid'], platform)
+
+
+def parse_participant_stats(participants: List) -> List[ParticipantStats]:
+    """
+    Return the champion and KDA of every participant of a Match-V5 payload
+
+    Args:
+        participants (List): participants of a match
+
+    Returns:
+        stats (List[ParticipantStats]): one entry per participant
+    """
+    # Only the fields the bot shows are kept, interned since they repeat across matches
+    return [ParticipantStats(sys.intern(participant.get('puuid', '')),
+                             sys.intern(participant.get('championName', '')),
+                             participant.get('kills', 0),
+                             participant.get('deaths', 0),
+                             participant.get('assists', 0))
+            for participant in participants]
+
+
+def parse_past_match(match_info: Dict) -> PastMatch:
+    """
+    Return past match DTO (Data Transfer Object) given a Match-V5 payload.
+    Only the fields the DTO needs are read, the rest of the payload can be dropped right after.
+
+    Args:
+        match_info (Dict): decoded Match-V5 response
+
+    Returns:
+        past_match (PastMatch): A match object representing the match
+    """
+    game_start = datetime.fromtimestamp(
+        match_info['info']['gameStartTimestamp']//1000)
+
+    game_end = datetime.fromtimestamp(
+        match_info['info']['gameEndTimestamp']//1000)
+
+    game_duration = match_info['info']['gameDuration']
+    minutes, seconds = divmod(game_duration, 60)
+    game_duration = timedelta(minutes=minutes, seconds=seconds)
+
+    if match_info['info']['participants'] == []:
+        teams = []
+    else:
+        teams = get_teams_info(match_info['info']['participants'], False)
+
+    stats = parse_participant_stats(match_info['info']['participants'])
+
+    match = PastMatch(game_start, game_end, game_duration, teams, stats)
+
+    return match
+
+
+def extract_past_match(data: bytes) -> PastMatch:
+    """
+    Return past match DTO (Data Transfer Object) given a raw Match-V5 response body.
+    The body is decoded with the fast JSON backend and the decoded payload is not kept.
+
+    Args:
+        data (bytes): raw Match-V5 response body
+
+    Returns:
+        past_match (PastMatch): A match object representing the match
+    """
+    return parse_past_match(match_json.loads(data))
+
+
+def parse_active_match(match_info: Dict) -> ActiveMatch:
+    """
+    Return active match DTO (Data Transfer Object) given a Spectator-V4 payload
+
+    Args:
+        match_info (Dict): decoded Spectator-V4 response
+
+    Returns:
+        active_match (ActiveMatch): A match object representing the active game
+    """
+    game_duration = match_info['gameLength']
+
+    # gameStartTime is 0 while the game is loading
+    game_start_time = match_info.get('gameStartTime', 0)
+    game_start = datetime.fromtimestamp(
+        game_start_time//1000 if game_start_time > 0 else time.time() - game_duration)
+
+    minutes, seconds = divmod(game_duration, 60)
+    game_duration = timedelta(minutes=minutes, seconds=seconds)
+
+    teams = get_teams_info(match_info['participants'], True)
+
+    match = ActiveMatch(game_start, game_duration, teams)
+
+    return match
+
 ###################################################################
 
 
-def get_summoners_by_name(summoner_name: str) -> Summoner:
+def get_summoners_by_name(summoner_name: str, platform: str = None) -> Summoner:
+    """
+    Return summoner DTO (Data Transfer Object) given summoner_name on platform.
+    Lookups are served from the summoner cache when possible.
+
+    Args:
+        summoner_name (str): summoner name
+        platform (str): platform id such as "EUW1", None for regions.default_platform
+
+    Returns:
+        summoner (Summoner): A summoner object representing the summoner with the given name.
+
+    Raises:
+        SummonerNotFound: if no summoner with the given name was found.
+    """
+    platform = regions.normalize_platform(platform)
+    return summoner_cache.cache.get(summoner_name, lambda name: flights.do(
+        ("summoner", summoner_cache.cache_key(name, platform)), _fetch_summoner_by_name, name, platform), platform)
+
+
+def _fetch_summoner_by_name(summoner_name: str, platform: str = None) -> Summoner:
     """
     Return summoner DTO (Data Transfer Object) given summoner_name.
+    Call Summoner-V4 API: Get a summoner by summoner name
 
     Args:
         summoner_name (str): summoner name
+        platform (str): platform id, None for regions.default_platform
 
     Returns:
         summoner (Summoner): A summoner object representing the summoner with the given name.
@@ -69,52 +328,89 @@ def get_summoners_by_name(summoner_name: str) -> Summoner:
     """
 
     path_param = f"/lol/summoner/v4/summoners/by-name/{summoner_name}"
-    query = na1_api_url + path_param + '?api_key=' + api_key
-    res = requests.get(query)
+    res = _get(regions.platform_url(platform),
+               "summoner-v4.by-name", path_param)
 
     if res.status_code == 404:
         raise SummonerNotFound(summoner_name)
+    check_response(res, path_param)
 
     summoner_info = res.json()
 
-    summonerDTO = Summoner(
-        summoner_info['name'], summoner_info['id'], summoner_info['puuid'])
+    summonerDTO = parse_summoner(summoner_info, platform)
 
     return summonerDTO
 
 
-def get_matches_by_puuid(summoner_puuid: str) -> List[str]:
+def iter_match_ids_by_puuid(summoner_puuid: str, start_time: float = None, end_time: float = None,
+                            page_size: int = match_ids_page_size, platform: str = None) -> Iterator[str]:
     """
-    Return 5 latest matches given summoner's puuid.
+    Yield match ids of summoner's puuid from newest to oldest, one page at a time.
+    Pages are only requested as the previous one is consumed.
     Call Match-V5 API: Get a list of match ids by puuid
 
     Args:
         puuid (str): summoner puuid
+        start_time (float): only matches started after this epoch second
+        end_time (float): only matches started before this epoch second
+        page_size (int): match ids per request, at most 100
+        platform (str): platform of the summoner, their regional cluster is asked
+
+    Yields:
+        match_id (str): the next match id
+    """
+    host = regions.regional_url(platform)
+    path_param = f"/lol/match/v5/matches/by-puuid/{summoner_puuid}/ids"
+    params = {"start": 0, "count": page_size}
+    if start_time is not None:
+        params["startTime"] = int(start_time)
+    if end_time is not None:
+        params["endTime"] = int(end_time)
+
+    while True:
+        res = _get(host, "match-v5.by-puuid", path_param, params)
+        check_response(res, path_param)
+        page = res.json()
+
+        yield from page
+
+        if len(page) < page_size:
+            return
+        params = dict(params, start=params["start"] + page_size)
+
+
+def get_matches_by_puuid(summoner_puuid: str, count: int = 5, platform: str = None) -> List[str]:
+    """
+    Return the latest matches given summoner's puuid.
+    Call Match-V5 API: Get a list of match ids by puuid
+
+    Args:
+        puuid (str): summoner puuid
+        count (int): number of matches, 5 by default
+        platform (str): platform of the summoner, None for regions.default_platform
 
     Returns:
-        matchtes_info (List): A list of the latest 5 matches by summoner
+        matchtes_info (List): A list of the latest count matches by summoner
 
     Raises:
         MatchNotFound: if no matches with the summoner puuid was found.
 
     """
-
-    path_param = f"/lol/match/v5/matches/by-puuid/{summoner_puuid}/ids?start=0&count=5"
-    query = americas_api_url + path_param + '&api_key=' + api_key
-
-    res = requests.get(query)
-    matches_info = res.json()
+    match_ids = iter_match_ids_by_puuid(
+        summoner_puuid, page_size=min(count, match_ids_page_size), platform=platform)
+    matches_info = list(itertools.islice(match_ids, count))
 
     return matches_info
 
 
-def get_last_week_matches_by_puuid(summoner_puuid: str) -> Tuple[List[str], int]:
+def get_last_week_matches_by_puuid(summoner_puuid: str, platform: str = None) -> Tuple[List[str], int]:
     """
-    Return matches from last week given summoner's puuid.
+    Return matches from last week given summoner's puuid, across as many pages as needed.
     Call Match-V5 API: Get a list of match ids by puuid
 
     Args:
         puuid (str): summoner puuid
+        platform (str): platform of the summoner, None for regions.default_platform
 
     Returns:
         matches_info (List): A list of matches from last week by summoner
@@ -122,15 +418,10 @@ def get_last_week_matches_by_puuid(summoner_puuid: str) -> Tuple[List[str], int]
     Raises:
         MatchNotFound: if no matches with the summoner puuid was found.
     """
-    current_time = time.time()
-    seconds_in_week = 7 * 24 * 60 * 60
-    last_week = current_time - seconds_in_week
-
-    path_param = f"/lol/match/v5/matches/by-puuid/{summoner_puuid}/ids?startTime={int(last_week)}&endTime={int(current_time)}&count=100"
-    query = americas_api_url + path_param + '&api_key=' + api_key
+    last_week, current_time = get_last_week_range()
 
-    res = requests.get(query)
-    matches_info = res.json()
+    matches_info = list(iter_match_ids_by_puuid(
+        summoner_puuid, last_week, current_time, platform=platform))
 
     return (matches_info, last_week)
 
@@ -152,76 +443,124 @@ def get_matches_by_match_id(match_id: str):
 
     print("match_id: ", match_id)
 
-    path_param = f"/lol/match/v5/matches/{match_id}"
-    query = americas_api_url + path_param + "?api_key=" + api_key
+    # Finished matches never change, so a cached copy is always valid
+    match = match_index.index.get(match_id)
+    if match is not None:
+        return match
 
-    res = requests.get(query)
-    match_info = res.json()
+    match = match_store.store.get(match_id)
+    if match is not None:
+        match_index.index.add(match_id, match)
+        return match
 
-    # filename = os.path.join("test", "mock_get_matches_by_match_id.json")
-    # with open(filename, 'w') as f:
-    #     json.dump(match_info, f)
+    return flights.do(("match", match_id), _fetch_match_by_match_id, match_id)
 
-    game_start = datetime.fromtimestamp(
-        match_info['info']['gameStartTimestamp']//1000)
 
-    game_end = datetime.fromtimestamp(
-        match_info['info']['gameEndTimestamp']//1000)
+def _fetch_match_by_match_id(match_id: str) -> PastMatch:
+    """
+    Fetch, parse and cache the match with match_id from the regional cluster of the platform in its id.
+    Call Match-V5 API: Get a match by match id
 
-    game_duration = match_info['info']['gameDuration']
-    minutes, seconds = divmod(game_duration, 60)
-    game_duration = timedelta(minutes=minutes, seconds=seconds)
+    Args:
+        match_id (str): match id
 
-    # print(match_info['info']['participants'])
+    Returns:
+        past_match (PastMatch): A match object representing the match with the given match_id
 
-    # filename = os.path.join("test", "mock_get_teams_info.json")
-    # with open(filename, 'w') as f:
-    #     json.dump(match_info['info']['participants'], f)
+    Raises:
+        MatchNotFound: if no matches with the match id was found.
+    """
+    path_param = f"/lol/match/v5/matches/{match_id}"
 
-    if match_info['info']['participants'] == []:
-        teams = []
-    else:
-        teams = get_teams_info(match_info['info']['participants'], False)
+    res = _get(regions.regional_url(regions.platform_of_match(match_id)),
+               "match-v5.by-match-id", path_param)
+
+    if res.status_code == 404:
+        raise MatchNotFound(match_id)
+    check_response(res, path_param)
 
-    match = PastMatch(game_start, game_end, game_duration, teams)
+    match = extract_past_match(res.content)
+    match_store.store.put(match_id, match)
+    match_index.index.add(match_id, match)
 
     return match
 
 
-def get_active_games_by_summoner_id(summoner_id: str):
+def get_active_game_info(summoner_id: str, platform: str = None, fresh: bool = False) -> Optional[Dict]:
     """
-    Return current game information given summoner_id
-    Call Sepectator-V4 API: Get current game information for the given summoner ID
+    Return the raw Spectator-V4 payload of the game summoner_id is playing.
+    Answers are served from the spectator cache when possible, with gameLength advanced to now.
 
     Args:
         summoner_id: summoner id
+        platform: platform of the summoner, None for regions.default_platform
+        fresh: ask Riot even if the answer is cached, the new answer is still cached
 
     Returns:
-        active_match (Match): A match object representing the active game currently play by summoner_id
+        match_info (Dict): the decoded payload, or None if summoner_id is not in a game
 
     Raises:
-        MatchNotFound: if no currently active match is played by summoner_id
+        RiotAPIError: if the Riot API answers with an error other than 404
     """
+    platform = regions.normalize_platform(platform)
+    if not fresh:
+        found, match_info = spectator_cache.cache.lookup(summoner_id, platform)
+        if found:
+            return match_info
+
+    return flights.do(("active", platform, summoner_id), _fetch_active_game_info, summoner_id, platform)
 
+
+def _fetch_active_game_info(summoner_id: str, platform: str) -> Optional[Dict]:
+    """
+    Fetch and cache the raw Spectator-V4 payload of the game summoner_id is playing
+    Call Sepectator-V4 API: Get current game information for the given summoner ID
+
+    Args:
+        summoner_id: summoner id
+        platform: platform of the summoner
+
+    Returns:
+        match_info (Dict): the decoded payload, or None if summoner_id is not in a game
+
+    Raises:
+        RiotAPIError: if the Riot API answers with an error other than 404
+    """
     path_param = f"/lol/spectator/v4/active-games/by-summoner/{summoner_id}"
-    query = na1_api_url + path_param + "?api_key=" + api_key
 
-    res = requests.get(query)
+    res = _get(regions.platform_url(platform),
+               "spectator-v4.by-summoner", path_param)
 
-    if (res.status_code != 200):
-        return f"{summoner_id} isn't playing League of Legends right now."
+    if res.status_code == 404:
+        spectator_cache.cache.store(summoner_id, None, platform)
+        return None
+    check_response(res, path_param)
 
     match_info = res.json()
+    spectator_cache.cache.store(summoner_id, match_info, platform)
 
-    game_start = datetime.fromtimestamp(
-        match_info['info']['gameStartTimestamp']//1000)
+    return match_info
 
-    game_duration = match_info['gameLength']
-    minutes, seconds = divmod(game_duration, 60)
-    game_duration = timedelta(minutes=minutes, seconds=seconds)
 
-    teams = get_teams_info(match_info['participants'], True)
+def get_active_games_by_summoner_id(summoner_id: str, platform: str = None) -> Optional[ActiveMatch]:
+    """
+    Return current game information given summoner_id
+    Call Sepectator-V4 API: Get current game information for the given summoner ID
 
-    match = ActiveMatch(game_start, game_duration, teams)
+    Args:
+        summoner_id: summoner id
+        platform: platform of the summoner, None for regions.default_platform
 
-    return match
+    Returns:
+        active_match (ActiveMatch): A match object representing the active game currently play by summoner_id,
+            or None if summoner_id is not in a game
+
+    Raises:
+        RiotAPIError: if the Riot API answers with an error other than 404
+    """
+    match_info = get_active_game_info(summoner_id, platform)
+
+    if match_info is None:
+        return None
+
+    return parse_active_match(match_info)
@@ -0,0 +1,426 @@
+import asyncio
+import os
+import time
+import circuit_breaker
+import match_index
+import match_json
+import match_store
+import metrics
+import regions
+import riot_session
+import spectator_cache
+import summoner_cache
+from single_flight import AsyncSingleFlight
+from exceptions import SummonerNotFound, MatchNotFound, RiotAPIError, RiotUnavailable
+from circuit_breaker import backoff_delay, riot_max_retries, server_error_statuses
+from rate_limiter import limiter, max_rate_limit_retries
+from match import PastMatch, ActiveMatch
+from riot_requests import parse_summoner, parse_past_match, parse_active_match, get_last_week_range, match_ids_page_size
+from summoner import Summoner
+from worker_pool import pool
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
+
+# Maximum number of match details fetched at the same time
+max_concurrency = int(os.getenv('RIOT_MAX_CONCURRENCY', '10'))
+
+# Concurrent identical summoner and match fetches share one request
+flights = AsyncSingleFlight()
+
+
+###################################################################
+# Helper Functions
+
+async def _get(host: str, method: str, path: str, params: Dict = None) -> Tuple[int, Any]:
+    """
+    Async counterpart of riot_requests._get
+
+    Args:
+        host (str): base URL of the Riot host
+        method (str): Riot API method, used as the method rate limit key
+        path (str): request path
+        params (Dict): query parameters
+
+    Returns:
+        (status, body) (Tuple[int, Any]): the HTTP status and the decoded body, None if the body is not JSON
+
+    Raises:
+        RiotUnavailable: if every attempt failed or the endpoint's circuit is open
+    """
+    # Already loaded by riot_session with the first client session
+    import aiohttp
+
+    endpoint = (host, method)
+    status = None
+    for attempt in range(riot_max_retries + 1):
+        if attempt > 0:
+            await asyncio.sleep(backoff_delay(attempt - 1))
+        if not circuit_breaker.breaker.allow(endpoint):
+            raise RiotUnavailable(path, status)
+
+        try:
+            status, body = await _send(host, method, path, params)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            status, reason = None, type(e).__name__
+        except BaseException:
+            # A cancelled or otherwise interrupted call must not keep the probe slot
+            circuit_breaker.breaker.release(endpoint)
+            raise
+        else:
+            if status not in server_error_statuses:
+                circuit_breaker.breaker.record_success(endpoint)
+                return (status, body)
+            reason = str(status)
+
+        circuit_breaker.breaker.record_failure(endpoint)
+        if attempt < riot_max_retries:
+            metrics.riot_retries_total.inc(method=method, reason=reason)
+
+    raise RiotUnavailable(path, status)
+
+
+async def _send(host: str, method: str, path: str, params: Dict = None) -> Tuple[int, Any]:
+    """
+    Send a GET request through the pooled session of host once the rate limiter allows it,
+    and return its status code and decoded JSON body.
+    Calls answered with 429 wait for Retry-After and are sent again.
+
+    Args:
+        host (str): base URL of the Riot host
+        method (str): Riot API method, used as the method rate limit key
+        path (str): request path
+        params (Dict): query parameters
+
+    Returns:
+        (status, body) (Tuple[int, Any]): the HTTP status and the decoded body, None if the body is not JSON
+    """
+    for attempt in range(max_rate_limit_retries + 1):
+        await limiter.acquire_async(host, method)
+        start = time.perf_counter()
+        async with riot_session.get_client_session(host).get(path, params=params) as res:
+            data = await res.read()
+            metrics.riot_request_seconds.observe(
+                time.perf_counter() - start, method=method, status=res.status)
+            metrics.riot_response_bytes.observe(len(data), method=method)
+            limiter.update(host, method, res.headers)
+            if res.status == 429:
+                limiter.penalize(host, method, res.headers)
+                continue
+            try:
+                body = match_json.loads(data)
+            except ValueError:
+                body = None
+            return (res.status, body)
+
+    return (429, None)
+
+
+def check_status(status: int, path: str) -> None:
+    """
+    Raise if status is an error status
+
+    Args:
+        status (int): HTTP status
+        path (str): request path
+
+    Returns:
+        None
+
+    Raises:
+        RiotAPIError: if the status is not successful
+    """
+    if status >= 400:
+        raise RiotAPIError(status, path)
+
+###################################################################
+
+
+async def get_summoners_by_name(summoner_name: str, platform: str = None) -> Summoner:
+    """
+    Async counterpart of riot_requests.get_summoners_by_name
+
+    Args:
+        summoner_name (str): summoner name
+        platform (str): platform id such as "EUW1", None for regions.default_platform
+
+    Returns:
+        summoner (Summoner): A summoner object representing the summoner with the given name.
+
+    Raises:
+        SummonerNotFound: if no summoner with the given name was found.
+    """
+    platform = regions.normalize_platform(platform)
+    return await summoner_cache.cache.get_async(summoner_name, lambda name: flights.do(
+        ("summoner", summoner_cache.cache_key(name, platform)), _fetch_summoner_by_name, name, platform), platform)
+
+
+async def _fetch_summoner_by_name(summoner_name: str, platform: str = None) -> Summoner:
+    """
+    Async counterpart of riot_requests._fetch_summoner_by_name
+
+    Args:
+        summoner_name (str): summoner name
+        platform (str): platform id, None for regions.default_platform
+
+    Returns:
+        summoner (Summoner): A summoner object representing the summoner with the given name.
+
+    Raises:
+        SummonerNotFound: if no summoner with the given name was found.
+    """
+
+    path_param = f"/lol/summoner/v4/summoners/by-name/{summoner_name}"
+    status, summoner_info = await _get(regions.platform_url(platform), "summoner-v4.by-name", path_param)
+
+    if status == 404:
+        raise SummonerNotFound(summoner_name)
+    check_status(status, path_param)
+
+    return parse_summoner(summoner_info, platform)
+
+
+async def iter_match_ids_by_puuid(summoner_puuid: str, start_time: float = None, end_time: float = None,
+                                  page_size: int = match_ids_page_size, platform: str = None) -> AsyncIterator[str]:
+    """
+    Async counterpart of riot_requests.iter_match_ids_by_puuid
+
+    Args:
+        puuid (str): summoner puuid
+        start_time (float): only matches started after this epoch second
+        end_time (float): only matches started before this epoch second
+        page_size (int): match ids per request, at most 100
+        platform (str): platform of the summoner, their regional cluster is asked
+
+    Yields:
+        match_id (str): the next match id
+    """
+    host = regions.regional_url(platform)
+    path_param = f"/lol/match/v5/matches/by-puuid/{summoner_puuid}/ids"
+    params = {"start": 0, "count": page_size}
+    if start_time is not None:
+        params["startTime"] = int(start_time)
+    if end_time is not None:
+        params["endTime"] = int(end_time)
+
+    while True:
+        status, page = await _get(host, "match-v5.by-puuid", path_param, params)
+        check_status(status, path_param)
+
+        for match_id in page:
+            yield match_id
+
+        if len(page) < page_size:
+            return
+        params = dict(params, start=params["start"] + page_size)
+
+
+async def get_matches_by_puuid(summoner_puuid: str, count: int = 5, platform: str = None) -> List[str]:
+    """
+    Async counterpart of riot_requests.get_matches_by_puuid
+
+    Args:
+        puuid (str): summoner puuid
+        count (int): number of matches, 5 by default
+        platform (str): platform of the summoner, None for regions.default_platform
+
+    Returns:
+        matches_info (List): A list of the latest count matches by summoner
+    """
+    matches_info = []
+
+    async for match_id in iter_match_ids_by_puuid(summoner_puuid, page_size=min(count, match_ids_page_size),
+                                                  platform=platform):
+        matches_info.append(match_id)
+        if len(matches_info) == count:
+            break
+
+    return matches_info
+
+
+async def get_last_week_matches_by_puuid(summoner_puuid: str, platform: str = None) -> Tuple[List[str], float]:
+    """
+    Async counterpart of riot_requests.get_last_week_matches_by_puuid
+
+    Args:
+        puuid (str): summoner puuid
+        platform (str): platform of the summoner, None for regions.default_platform
+
+    Returns:
+        (matches_info, last_week) (Tuple[List[str], float]): match ids from last week and the start of the week
+    """
+    last_week, current_time = get_last_week_range()
+
+    matches_info = [match_id async for match_id in iter_match_ids_by_puuid(
+        summoner_puuid, last_week, current_time, platform=platform)]
+
+    return (matches_info, last_week)
+
+
+async def get_matches_by_match_id(match_id: str) -> PastMatch:
+    """
+    Async counterpart of riot_requests.get_matches_by_match_id
+
+    Args:
+        match_id (str): match id
+
+    Returns:
+        past_match (PastMatch): A match object representing the match with the given match_id
+    """
+
+    match = match_index.index.get(match_id)
+    if match is not None:
+        return match
+
+    match = await pool.run(match_store.store.get, match_id)
+    if match is not None:
+        match_index.index.add(match_id, match)
+        return match
+
+    return await flights.do(("match", match_id), _fetch_match_by_match_id, match_id)
+
+
+async def _fetch_match_by_match_id(match_id: str) -> PastMatch:
+    """
+    Async counterpart of riot_requests._fetch_match_by_match_id
+
+    Args:
+        match_id (str): match id
+
+    Returns:
+        past_match (PastMatch): A match object representing the match with the given match_id
+    """
+    path_param = f"/lol/match/v5/matches/{match_id}"
+    status, match_info = await _get(regions.regional_url(regions.platform_of_match(match_id)),
+                                    "match-v5.by-match-id", path_param)
+
+    if status == 404:
+        raise MatchNotFound(match_id)
+    check_status(status, path_param)
+
+    match = parse_past_match(match_info)
+    await pool.run(match_store.store.put, match_id, match)
+    match_index.index.add(match_id, match)
+
+    return match
+
+
+async def get_matches_by_match_ids(match_ids: Union[Iterable[str], AsyncIterable[str]], limit: int = None) -> List[PastMatch]:
+    """
+    Return match DTOs for every match id, fetching up to limit matches concurrently.
+    match_ids may be an async stream such as iter_match_ids_by_puuid, in which case
+    fetching starts as soon as each id arrives. The result keeps the order of match_ids.
+
+    Args:
+        match_ids (Union[Iterable[str], AsyncIterable[str]]): match ids
+        limit (int): maximum number of requests in flight, defaults to max_concurrency
+
+    Returns:
+        past_matches (List[PastMatch]): the matches in the same order as match_ids
+    """
+    semaphore = asyncio.Semaphore(limit or max_concurrency)
+
+    async def fetch(match_id: str) -> PastMatch:
+        async with semaphore:
+            return await get_matches_by_match_id(match_id)
+
+    tasks = []
+    try:
+        if hasattr(match_ids, "__aiter__"):
+            async for match_id in match_ids:
+                tasks.append(asyncio.ensure_future(fetch(match_id)))
+        else:
+            tasks = [asyncio.ensure_future(fetch(match_id)) for match_id in match_ids]
+        return list(await asyncio.gather(*tasks))
+    except BaseException:
+        # The first error is raised, fetches still waiting on Riot are not needed anymore
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+async def get_active_game_info(summoner_id: str, platform: str = None, fresh: bool = False) -> Optional[Dict]:
+    """
+    Async counterpart of riot_requests.get_active_game_info
+
+    Args:
+        summoner_id: summoner id
+        platform: platform of the summoner, None for regions.default_platform
+        fresh: ask Riot even if the answer is cached, the new answer is still cached
+
+    Returns:
+        match_info (Dict): the decoded payload, or None if summoner_id is not in a game
+    """
+    platform = regions.normalize_platform(platform)
+    if not fresh:
+        found, match_info = spectator_cache.cache.lookup(summoner_id, platform)
+        if found:
+            return match_info
+
+    return await flights.do(("active", platform, summoner_id), _fetch_active_game_info, summoner_id, platform)
+
+
+async def _fetch_active_game_info(summoner_id: str, platform: str) -> Optional[Dict]:
+    """
+    Async counterpart of riot_requests._fetch_active_game_info
+
+    Args:
+        summoner_id: summoner id
+        platform: platform of the summoner
+
+    Returns:
+        match_info (Dict): the decoded payload, or None if summoner_id is not in a game
+    """
+    path_param = f"/lol/spectator/v4/active-games/by-summoner/{summoner_id}"
+    status, match_info = await _get(regions.platform_url(platform), "spectator-v4.by-summoner", path_param)
+
+    if status == 404:
+        spectator_cache.cache.store(summoner_id, None, platform)
+        return None
+    check_status(status, path_param)
+
+    spectator_cache.cache.store(summoner_id, match_info, platform)
+
+    return match_info
+
+
+async def get_active_games_info(summoner_ids: Iterable[str], platform: str = None,
+                                limit: int = None) -> Dict[str, Optional[Dict]]:
+    """
+    Return the Spectator-V4 payload of every summoner in summoner_ids, checking up to limit
+    summoners with Riot at once. Summoners in the spectator cache cost no request.
+
+    Args:
+        summoner_ids (Iterable[str]): summoner ids
+        platform (str): platform of the summoners, None for regions.default_platform
+        limit (int): maximum number of requests in flight, defaults to max_concurrency
+
+    Returns:
+        match_infos (Dict[str, Optional[Dict]]): the payload by summoner id, None for summoners not in a game
+    """
+    semaphore = asyncio.Semaphore(limit or max_concurrency)
+    summoner_ids = list(dict.fromkeys(summoner_ids))
+
+    async def check(summoner_id: str) -> Optional[Dict]:
+        async with semaphore:
+            return await get_active_game_info(summoner_id, platform)
+
+    return dict(zip(summoner_ids, await asyncio.gather(*(check(summoner_id) for summoner_id in summoner_ids))))
+
+
+async def get_active_games_by_summoner_id(summoner_id: str, platform: str = None) -> Optional[ActiveMatch]:
+    """
+    Async counterpart of riot_requests.get_active_games_by_summoner_id
+
+    Args:
+        summoner_id: summoner id
+        platform: platform of the summoner, None for regions.default_platform
+
+    Returns:
+        active_match (ActiveMatch): A match object representing the active game currently play by summoner_id,
+            or None if summoner_id is not in a game
+    """
+    match_info = await get_active_game_info(summoner_id, platform)
+
+    if match_info is None:
+        return None
+
+    return parse_active_match(match_info)
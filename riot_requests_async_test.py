@@ -0,0 +1,149 @@
+import asyncio
+import json
+import pytest
+import riot_requests_async
+from exceptions import SummonerNotFound
+from riot_requests import parse_past_match
+from riot_requests_async import get_summoners_by_name, get_matches_by_match_ids
+from summoner import Summoner
+from unittest.mock import patch
+
+expected_summoner = Summoner("Kid Orpheus", "ii9IPVp8k7MZ33wazChECinTlHDRzgkMMF5VCY-sFRjcnOg",
+                             "pfB-gQaB5s62NVK_YTWT7w6Y1NKIjpdzB38-8rFS2cssK-P6i5lFqqT2iVZHZ_rKmGceVc72TTU9Gw")
+
+
+@pytest.fixture
+def mock_get_summoners_by_name_sucess():
+    with open("test/mock_get_summoners_by_name_success.json") as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def mock_get_matches_by_match_id():
+    with open("test/mock_get_matches_by_match_id.json") as f:
+        return json.load(f)
+
+
+def test_get_summoners_by_name_success(mock_get_summoners_by_name_sucess):
+    """
+    Test async get_summoners_by_name() with a valid summoner name.
+    """
+    async def mock_get(host, method, path, params=None):
+        return (200, mock_get_summoners_by_name_sucess)
+
+    with patch("riot_requests_async._get", mock_get):
+        summoner = asyncio.run(get_summoners_by_name("Kid Orpheus"))
+
+    assert expected_summoner == summoner
+
+
+def test_get_summoners_by_name_not_found():
+    """
+    Test async get_summoners_by_name() with a invalid summoner name.
+    """
+    async def mock_get(host, method, path, params=None):
+        return (404, {"status_code": 404})
+
+    with patch("riot_requests_async._get", mock_get):
+        with pytest.raises(SummonerNotFound):
+            asyncio.run(get_summoners_by_name("not a summoner name"))
+
+
+def test_get_matches_by_match_ids_concurrency(mock_get_matches_by_match_id):
+    """
+    Test get_matches_by_match_ids() keeps the input order and never exceeds the limit.
+    """
+    in_flight = 0
+    peak = 0
+
+    async def mock_get(host, method, path, params=None):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return (200, mock_get_matches_by_match_id)
+
+    match_ids = [f"NA1_{i}" for i in range(12)]
+    with patch("riot_requests_async._get", mock_get):
+        matches = asyncio.run(get_matches_by_match_ids(match_ids, limit=4))
+
+    expected_start_time = parse_past_match(mock_get_matches_by_match_id).start_time
+    assert len(matches) == 12
+    assert all(match.start_time == expected_start_time for match in matches)
+    assert peak == 4
+
+
+def test_iter_match_ids_by_puuid_pages():
+    """
+    Test iter_match_ids_by_puuid() walks every page and stops at the first short page.
+    """
+    match_ids = [f"NA1_{i}" for i in range(250)]
+    starts = []
+
+    async def mock_get(host, method, path, params=None):
+        starts.append(params["start"])
+        return (200, match_ids[params["start"]:params["start"] + params["count"]])
+
+    async def run():
+        return [match_id async for match_id in riot_requests_async.iter_match_ids_by_puuid(expected_summoner.puuid, 0, 1)]
+
+    with patch("riot_requests_async._get", mock_get):
+        result = asyncio.run(run())
+
+    assert result == match_ids
+    assert starts == [0, 100, 200]
+
+
+def test_get_matches_by_match_ids_streams(mock_get_matches_by_match_id):
+    """
+    Test get_matches_by_match_ids() starts fetching matches before the id stream is exhausted.
+    """
+    events = []
+
+    async def match_ids():
+        for i in range(3):
+            events.append(f"id {i}")
+            yield f"NA1_{i}"
+            await asyncio.sleep(0.01)
+
+    async def mock_get(host, method, path, params=None):
+        events.append(f"fetch {path.rsplit('/', 1)[1]}")
+        return (200, mock_get_matches_by_match_id)
+
+    with patch("riot_requests_async._get", mock_get):
+        matches = asyncio.run(get_matches_by_match_ids(match_ids()))
+
+    assert len(matches) == 3
+    assert events.index("fetch NA1_0") < events.index("id 2")
+
+
+@pytest.mark.parametrize("streamed", [False, True])
+def test_get_matches_by_match_ids_cancels_on_error(mock_get_matches_by_match_id, streamed):
+    """
+    Test get_matches_by_match_ids() raises the first error and cancels the fetches still in flight.
+    """
+    fetched = []
+
+    async def mock_get(host, method, path, params=None):
+        if path.endswith("NA1_0"):
+            raise ConnectionError()
+        await asyncio.sleep(0.1)
+        fetched.append(path)
+        return (200, mock_get_matches_by_match_id)
+
+    async def stream():
+        for i in range(4):
+            yield f"NA1_{i}"
+
+    async def run():
+        match_ids = stream() if streamed else [f"NA1_{i}" for i in range(4)]
+        with pytest.raises(ConnectionError):
+            await get_matches_by_match_ids(match_ids)
+        # Long enough for fetches left running to finish
+        await asyncio.sleep(0.2)
+
+    with patch("riot_requests_async._get", mock_get):
+        asyncio.run(run())
+
+    assert fetched == []
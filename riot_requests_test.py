@@ -3,18 +3,20 @@ import pytest
 import requests
 from datetime import datetime, timedelta
 from exceptions import SummonerNotFound
-from riot_requests import get_summoners_by_name, get_matches_by_puuid, get_matches_by_match_id, get_active_games_by_summoner_id, get_last_week_matches_by_puuid, get_teams_info
+from riot_requests import get_summoners_by_name, get_matches_by_puuid, get_matches_by_match_id, get_active_games_by_summoner_id, get_last_week_matches_by_puuid, get_teams_info, extract_past_match, parse_past_match, parse_participant_stats
 from summoner import Summoner
 from team import Team
 from match import PastMatch
+from participant import ParticipantStats
 from unittest.mock import patch
 
 expected_summoner = Summoner("Kid Orpheus", "ii9IPVp8k7MZ33wazChECinTlHDRzgkMMF5VCY-sFRjcnOg",
                              "pfB-gQaB5s62NVK_YTWT7w6Y1NKIjpdzB38-8rFS2cssK-P6i5lFqqT2iVZHZ_rKmGceVc72TTU9Gw")
 
-expected_start_time = datetime(2023, 4, 3, 23, 7, 19)
+# 2023-04-03 23:07:19 and 23:24:42 in New York, in the local time the match is parsed into
+expected_start_time = datetime.fromtimestamp(1680577639)
 
-expected_end_time = datetime(2023, 4, 3, 23, 24, 42)
+expected_end_time = datetime.fromtimestamp(1680578682)
 
 expected_duration = timedelta(minutes=17, seconds=22)
 
@@ -58,7 +60,7 @@ def test_get_summoners_by_name_success(mock_get_summoners_by_name_sucess):
     """
 
     summoner_name = "Kid Orpheus"
-    with patch("requests.get") as mock_get:
+    with patch("requests.Session.get") as mock_get:
         mock_get.return_value.json.return_value = mock_get_summoners_by_name_sucess
         summoner = get_summoners_by_name(summoner_name)
 
@@ -78,7 +80,7 @@ def test_get_summoners_by_name_not_found(mock_get_summoners_by_name_not_found):
     Test get_summoners_by_name() with a invalid summoner name.
     """
     summoner_name = "not a summoner name"
-    with patch("requests.get") as mock_get:
+    with patch("requests.Session.get") as mock_get:
         mock_get.return_value.status_code = 404
         mock_get.return_value.json.return_value = mock_get_summoners_by_name_not_found
         with pytest.raises(SummonerNotFound) as e:
@@ -99,9 +101,10 @@ def test_get_matches_by_puuid(mock_get_matches_by_puuid):
     Test get_matches_by_puuid() with a valid puuid.
     """
 
-    with patch("requests.get") as mock_get:
+    with patch("requests.Session.get") as mock_get:
+        mock_get.return_value.status_code = 200
         mock_get.return_value.json.return_value = mock_get_matches_by_puuid
-        matches = get_matches_by_match_id(expected_summoner.puuid)
+        matches = get_matches_by_puuid(expected_summoner.puuid)
 
     assert expected_matches == matches
 
@@ -110,19 +113,21 @@ def test_get_matches_by_puuid(mock_get_matches_by_puuid):
 
 @pytest.fixture
 def mock_get_last_week_matches_by_puuid():
-    with open("test/mock_get_matches_by_puuid") as f:
+    with open("test/mock_get_matches_by_puuid.json") as f:
         return json.load(f)
 
 
-def test_get_last_week_matches_by_puuid():
+def test_get_last_week_matches_by_puuid(mock_get_last_week_matches_by_puuid):
     """
     Test get_last_week_matches_by_puuid() with a valid puuid.
     """
-    with patch("requests.get") as mock_get:
+    with patch("requests.Session.get") as mock_get:
+        mock_get.return_value.status_code = 200
         mock_get.return_value.json.return_value = mock_get_last_week_matches_by_puuid
-        matches = get_last_week_matches_by_puuid(expected_summoner.puuid)
+        matches, last_week = get_last_week_matches_by_puuid(expected_summoner.puuid)
 
     assert expected_matches == matches
+    assert mock_get.call_args.kwargs["params"]["startTime"] == int(last_week)
 
 
 # Test get_matches_by_match_id() with a valid match id.
@@ -137,11 +142,29 @@ def test_get_matches_by_match_id(mock_get_matches_by_match_id):
     """
     Test get_matches_by_match_id
     """
-    with patch("requests.get") as mock_get:
-        mock_get.return_value.json.return_value = mock_get_matches_by_match_id
+    with patch("requests.Session.get") as mock_get:
+        mock_get.return_value.content = json.dumps(
+            mock_get_matches_by_match_id).encode()
         match = get_matches_by_match_id("NA1_4620414214")
 
-    assert expected_past_match == match
+    expected_stats = parse_participant_stats(mock_get_matches_by_match_id["info"]["participants"])
+    assert PastMatch(expected_start_time, expected_end_time, expected_duration, expected_teams,
+                     expected_stats) == match
+    assert expected_past_match != match
+
+
+def test_response_size_is_recorded_without_content_length(mock_get_matches_by_match_id):
+    """
+    Test the body size of a response sent without a Content-Length header is recorded
+    """
+    body = json.dumps(mock_get_matches_by_match_id).encode()
+    with patch("requests.Session.get") as mock_get, \
+            patch("metrics.riot_response_bytes.observe") as observe:
+        mock_get.return_value.content = body
+        mock_get.return_value.headers = {}
+        get_matches_by_match_id("NA1_4620414214")
+
+    observe.assert_called_once_with(len(body), method="match-v5.by-match-id")
 
 # Test get_active_games_by_summoner_id() with a valid summoner id.
 
@@ -154,3 +177,47 @@ def mock_get_active_games_by_summoner_id():
 
 def test_get_active_games_by_summoner_id():
     pass
+
+
+# Test iter_match_ids_by_puuid() with more than one page of matches.
+
+def test_get_matches_by_puuid_count_across_pages():
+    """
+    Test get_matches_by_puuid() follows start/count pages until count matches are found.
+    """
+    match_ids = [f"NA1_{i}" for i in range(150)]
+
+    def page(url, params=None, timeout=None):
+        res = type("Response", (), {})()
+        res.status_code = 200
+        res.ok = True
+        res.headers = {}
+        res.content = json.dumps(match_ids[params["start"]:params["start"] + params["count"]]).encode()
+        res.json = lambda: json.loads(res.content)
+        return res
+
+    with patch("requests.Session.get", side_effect=page) as mock_get:
+        matches = get_matches_by_puuid(expected_summoner.puuid, count=120)
+
+    assert matches == match_ids[:120]
+    assert mock_get.call_count == 2
+
+
+# Test extract_past_match() keeps only the fields the DTO needs.
+def test_extract_past_match(mock_get_matches_by_match_id):
+    """
+    Test extract_past_match() decodes a raw body into the same match as parse_past_match()
+    """
+    match = extract_past_match(json.dumps(
+        mock_get_matches_by_match_id).encode())
+
+    parsed = parse_past_match(mock_get_matches_by_match_id)
+
+    assert match.start_time == parsed.start_time
+    assert match.end_time == parsed.end_time
+    assert match.duration == expected_duration
+    assert match.teams == expected_teams
+    assert len(match.participants) == 10
+    assert match.participants[0] == ParticipantStats(
+        mock_get_matches_by_match_id["metadata"]["participants"][0], "Mordekaiser", 15, 10, 16)
+    assert match.participants[0].kda == 3.1
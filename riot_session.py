@@ -0,0 +1,142 @@
+import asyncio
+import os
+import threading
+from dotenv import load_dotenv
+from typing import TYPE_CHECKING, Dict, Tuple
+
+# Each client's HTTP library is imported with its first session, so a process only loads the one it uses
+if TYPE_CHECKING:
+    import aiohttp
+    import requests
+
+# Load .env keys
+load_dotenv()
+api_key = os.getenv('API_KEY')
+
+# Connection pool settings, shared by every Riot host
+pool_size = int(os.getenv('RIOT_POOL_SIZE', '10'))
+connect_timeout = float(os.getenv('RIOT_CONNECT_TIMEOUT', '3.05'))
+read_timeout = float(os.getenv('RIOT_READ_TIMEOUT', '10'))
+keepalive_timeout = float(os.getenv('RIOT_KEEPALIVE_TIMEOUT', '30'))
+
+_sessions: Dict[str, "requests.Session"] = {}
+_client_sessions: Dict[str, Tuple[asyncio.AbstractEventLoop, "aiohttp.ClientSession"]] = {}
+_lock = threading.Lock()
+
+
+def get_headers() -> Dict[str, str]:
+    """
+    Return the headers sent with every Riot API request
+
+    Args:
+        None
+
+    Returns:
+        headers (Dict[str, str]): the request headers
+    """
+    headers = {"Accept": "application/json"}
+    if api_key:
+        headers["X-Riot-Token"] = api_key
+    return headers
+
+
+def get_session(host: str) -> "requests.Session":
+    """
+    Return the pooled keep-alive session for host, creating it on first use
+
+    Args:
+        host (str): base URL of the Riot host, e.g. https://na1.api.riotgames.com
+
+    Returns:
+        session (requests.Session): the session bound to host
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    with _lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount(host, adapter)
+            session.headers.update(get_headers())
+            _sessions[host] = session
+
+    return session
+
+
+def get(host: str, path: str, params: Dict = None) -> "requests.Response":
+    """
+    Send a GET request to host through its pooled session
+
+    Args:
+        host (str): base URL of the Riot host
+        path (str): request path
+        params (Dict): query parameters
+
+    Returns:
+        res (requests.Response): the response
+    """
+    return get_session(host).get(host + path, params=params, timeout=(connect_timeout, read_timeout))
+
+
+def get_client_session(host: str) -> "aiohttp.ClientSession":
+    """
+    Return the pooled aiohttp session for host on the running event loop
+
+    Args:
+        host (str): base URL of the Riot host
+
+    Returns:
+        session (aiohttp.ClientSession): the session bound to host
+    """
+    import aiohttp
+
+    loop = asyncio.get_running_loop()
+    entry = _client_sessions.get(host)
+
+    if entry is None or entry[0] is not loop or entry[1].closed:
+        connector = aiohttp.TCPConnector(
+            limit=pool_size, keepalive_timeout=keepalive_timeout)
+        timeout = aiohttp.ClientTimeout(
+            sock_connect=connect_timeout, sock_read=read_timeout)
+        session = aiohttp.ClientSession(
+            base_url=host, connector=connector, timeout=timeout, headers=get_headers())
+        _client_sessions[host] = (loop, session)
+        return session
+
+    return entry[1]
+
+
+async def close() -> None:
+    """
+    Close every aiohttp session opened on the running event loop
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+    loop = asyncio.get_running_loop()
+
+    for host, (session_loop, session) in list(_client_sessions.items()):
+        if session_loop is loop:
+            await session.close()
+            del _client_sessions[host]
+
+
+def close_all() -> None:
+    """
+    Close every pooled requests session
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
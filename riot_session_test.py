@@ -0,0 +1,36 @@
+import riot_session
+from unittest.mock import patch
+
+host = "https://na1.api.riotgames.com"
+
+
+def test_get_session_reused_per_host():
+    """
+    Test get_session() returns one pooled session per host.
+    """
+    riot_session.close_all()
+    session = riot_session.get_session(host)
+
+    assert session is riot_session.get_session(host)
+    assert session is not riot_session.get_session(
+        "https://americas.api.riotgames.com")
+    riot_session.close_all()
+
+
+def test_get_sends_api_key_as_header():
+    """
+    Test get() sends the API key in the X-Riot-Token header and never in the query string.
+    """
+    riot_session.close_all()
+    with patch("riot_session.api_key", "RGAPI-test"):
+        with patch("requests.Session.get") as mock_get:
+            riot_session.get(host, "/lol/status/v4/platform-data", {"count": 5})
+            session = riot_session.get_session(host)
+
+    url = mock_get.call_args.args[0]
+    params = mock_get.call_args.kwargs["params"]
+    assert session.headers["X-Riot-Token"] == "RGAPI-test"
+    assert "api_key" not in url and "api_key" not in params
+    assert mock_get.call_args.kwargs["timeout"] == (
+        riot_session.connect_timeout, riot_session.read_timeout)
+    riot_session.close_all()
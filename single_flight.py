@@ -0,0 +1,155 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Call():
+    """
+    A call in flight shared by every thread asking for the same key
+
+    === Instance Attributes ===
+    done: Set once the call has finished
+    result: Value returned by the call
+    error: Exception raised by the call, if any
+    """
+    done: threading.Event
+    result: Any
+    error: BaseException
+
+    def __init__(self) -> None:
+        """
+        Initialize a _Call object
+
+        Return:
+            None
+        """
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight():
+    """
+    Coalesces concurrent calls with the same key across threads:
+    the first caller runs the function and every other caller waits for its result.
+
+    === Instance Attributes ===
+    calls: Calls in flight by key
+    """
+    calls: Dict[Hashable, _Call]
+
+    def __init__(self) -> None:
+        """
+        Initialize a SingleFlight object
+
+        Return:
+            None
+        """
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, func: Callable, *args) -> Any:
+        """
+        Return func(*args), sharing one execution among concurrent callers with the same key
+
+        Args:
+            key: identifies identical calls
+            func: function to run
+            args: arguments of func
+
+        Return:
+            The value returned by func
+        """
+        with self._lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self.calls[key] = call
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self.calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight():
+    """
+    Coalesces concurrent coroutine calls with the same key on the event loop.
+    The shared call runs in its own task, so one caller being cancelled does not cancel the others.
+    It is cancelled once every caller waiting on it was cancelled.
+
+    === Instance Attributes ===
+    tasks: Tasks in flight by key
+    """
+    tasks: Dict[Hashable, asyncio.Task]
+
+    def __init__(self) -> None:
+        """
+        Initialize an AsyncSingleFlight object
+
+        Return:
+            None
+        """
+        self.tasks = {}
+        # Task -> number of callers waiting on it
+        self._waiters: Dict[asyncio.Task, int] = {}
+
+    async def do(self, key: Hashable, func: Callable[..., Awaitable], *args) -> Any:
+        """
+        Return await func(*args), sharing one execution among concurrent callers with the same key
+
+        Args:
+            key: identifies identical calls
+            func: coroutine function to run
+            args: arguments of func
+
+        Return:
+            The value returned by func
+        """
+        task = self.tasks.get(key)
+
+        if task is None:
+            task = asyncio.ensure_future(func(*args))
+            self.tasks[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                # Nobody is left to use the result
+                if not task.done():
+                    task.cancel()
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        """
+        Remove the finished task of key so the next call starts a new one
+
+        Args:
+            key: identifies identical calls
+            task: the finished task
+
+        Return:
+            None
+        """
+        if self.tasks.get(key) is task:
+            del self.tasks[key]
+        # Mark the exception as retrieved even if every caller was cancelled
+        if not task.cancelled():
+            task.exception()
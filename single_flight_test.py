@@ -0,0 +1,96 @@
+import asyncio
+import threading
+import time
+from single_flight import SingleFlight, AsyncSingleFlight
+
+
+def test_do_coalesces_threads():
+    """
+    Test concurrent threads asking for the same key share one call.
+    """
+    flights = SingleFlight()
+    calls = []
+    results = []
+
+    def fetch(match_id):
+        calls.append(match_id)
+        time.sleep(0.05)
+        return match_id.lower()
+
+    threads = [threading.Thread(target=lambda: results.append(
+        flights.do(("match", "NA1_1"), fetch, "NA1_1"))) for i in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ["NA1_1"]
+    assert results == ["na1_1"] * 5
+    assert flights.calls == {}
+
+
+def test_do_async_coalesces_and_shares_errors():
+    """
+    Test concurrent coroutines share one call and all see its exception.
+    """
+    flights = AsyncSingleFlight()
+    calls = []
+
+    async def fetch(summoner_name):
+        calls.append(summoner_name)
+        await asyncio.sleep(0.01)
+        raise KeyError(summoner_name)
+
+    async def run():
+        return await asyncio.gather(*(flights.do(("weekly_report", "kidorpheus"), fetch, "Kid Orpheus")
+                                      for i in range(5)), return_exceptions=True)
+
+    errors = asyncio.run(run())
+
+    assert calls == ["Kid Orpheus"]
+    assert all(isinstance(error, KeyError) for error in errors)
+    assert flights.tasks == {}
+
+
+def test_do_async_survives_cancelled_caller():
+    """
+    Test cancelling one caller does not cancel the shared call for the others.
+    """
+    flights = AsyncSingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def run():
+        first = asyncio.create_task(flights.do("key", fetch))
+        second = asyncio.create_task(flights.do("key", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == "done"
+
+
+def test_do_async_cancels_call_without_callers():
+    """
+    Test the shared call is cancelled once every caller was cancelled.
+    """
+    flights = AsyncSingleFlight()
+    finished = []
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        finished.append("key")
+
+    async def run():
+        callers = [asyncio.create_task(flights.do("key", fetch)) for i in range(2)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+
+    assert finished == []
+    assert flights.tasks == {}
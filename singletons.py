@@ -0,0 +1,76 @@
+import circuit_breaker
+import contextlib
+import match_history
+import match_index
+import match_store
+import report_state
+import spectator_cache
+import summoner_cache
+from types import ModuleType
+from typing import Callable, Iterator, List, Tuple
+from unittest.mock import patch
+
+# Shared objects holding state between calls, as (module, attribute, factory of an empty in-memory one)
+registry: List[Tuple[ModuleType, str, Callable[[], object]]] = [
+    (circuit_breaker, "breaker", circuit_breaker.CircuitBreaker),
+    (match_history, "history", lambda: match_history.MatchHistory(":memory:")),
+    (match_index, "index", match_index.MatchIndex),
+    (match_store, "store", lambda: match_store.MatchStore(":memory:")),
+    (report_state, "state", lambda: report_state.ReportState(":memory:")),
+    (spectator_cache, "cache", spectator_cache.SpectatorCache),
+    (summoner_cache, "cache", summoner_cache.SummonerCache),
+]
+
+
+def _close(shared: object) -> None:
+    """
+    Close shared if it holds a connection
+
+    Args:
+        shared: a shared object of the registry, or None
+
+    Return:
+        None
+    """
+    close = getattr(shared, "close", None)
+    if close is not None:
+        close()
+
+
+def reset() -> None:
+    """
+    Replace every shared object of the registry with an empty in-memory one, closing the old one
+
+    Args:
+        None
+
+    Return:
+        None
+    """
+    for module, attribute, factory in registry:
+        old = getattr(module, attribute)
+        setattr(module, attribute, factory())
+        _close(old)
+
+
+@contextlib.contextmanager
+def isolated() -> Iterator[None]:
+    """
+    Replace every shared object of the registry with an empty in-memory one until exit,
+    then close the replacements and put the originals back
+
+    Args:
+        None
+
+    Return:
+        A context manager restoring the shared objects on exit
+    """
+    with contextlib.ExitStack() as stack:
+        for module, attribute, factory in registry:
+            stack.enter_context(patch.object(module, attribute, None))
+        reset()
+        try:
+            yield
+        finally:
+            for module, attribute, factory in registry:
+                _close(getattr(module, attribute))
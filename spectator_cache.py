@@ -0,0 +1,132 @@
+import metrics
+import os
+import regions
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+# Spectator cache settings in entries and seconds
+spectator_cache_size = int(os.getenv('SPECTATOR_CACHE_SIZE', '4096'))
+spectator_cache_ttl = float(os.getenv('SPECTATOR_CACHE_TTL', '60'))
+spectator_cache_negative_ttl = float(
+    os.getenv('SPECTATOR_CACHE_NEGATIVE_TTL', '30'))
+
+
+def extrapolate(match_info: Dict, elapsed: float) -> Dict:
+    """
+    Return a copy of a Spectator-V4 payload aged by elapsed seconds.
+    Only gameLength moves while a game is in progress.
+
+    Args:
+        match_info: the Spectator-V4 payload as Riot sent it
+        elapsed: seconds since Riot sent it
+
+    Return:
+        The payload with gameLength advanced by elapsed
+    """
+    return {**match_info, "gameLength": match_info.get("gameLength", 0) + int(elapsed)}
+
+
+class SpectatorCache():
+    """
+    LRU cache of Spectator-V4 answers by platform and summoner id.
+    A game in progress is cached for ttl seconds and its gameLength is advanced locally on every hit.
+    "Not in game" is cached for negative_ttl seconds, usually shorter, so a game that starts is seen soon.
+
+    === Instance Attributes ===
+    max_entries: Maximum number of summoners kept
+    ttl: Seconds a game in progress is cached
+    negative_ttl: Seconds "not in game" is cached
+    """
+    max_entries: int
+    ttl: float
+    negative_ttl: float
+
+    def __init__(self, max_entries: int = spectator_cache_size, ttl: float = spectator_cache_ttl,
+                 negative_ttl: float = spectator_cache_negative_ttl) -> None:
+        """
+        Initialize a SpectatorCache object
+
+        Args:
+            max_entries: Maximum number of summoners kept
+            ttl: Seconds a game in progress is cached
+            negative_ttl: Seconds "not in game" is cached
+
+        Return:
+            None
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, summoner_id: str, platform: str = None) -> Tuple[bool, Optional[Dict]]:
+        """
+        Return whether summoner_id's game is cached and the cached payload
+
+        Args:
+            summoner_id: summoner id
+            platform: platform id, None for regions.default_platform
+
+        Return:
+            (found, match_info): match_info is None if summoner_id is not in game or on a miss
+        """
+        key = (regions.normalize_platform(platform), summoner_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                match_info, fetched_at = entry
+                age = time.monotonic() - fetched_at
+                if age < (self.negative_ttl if match_info is None else self.ttl):
+                    self._entries.move_to_end(key)
+                else:
+                    del self._entries[key]
+                    entry = None
+
+        if entry is None:
+            outcome = "miss"
+        else:
+            outcome = "negative_hit" if match_info is None else "hit"
+        metrics.cache_requests_total.inc(cache="spectator", result=outcome)
+
+        if entry is None:
+            return (False, None)
+        return (True, None if match_info is None else extrapolate(match_info, age))
+
+    def store(self, summoner_id: str, match_info: Optional[Dict], platform: str = None) -> None:
+        """
+        Cache Riot's answer for summoner_id and evict the least recently used summoners above max_entries
+
+        Args:
+            summoner_id: summoner id
+            match_info: the Spectator-V4 payload, None if summoner_id is not in game
+            platform: platform id, None for regions.default_platform
+
+        Return:
+            None
+        """
+        key = (regions.normalize_platform(platform), summoner_id)
+        with self._lock:
+            self._entries[key] = (match_info, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Remove every cached summoner
+
+        Args:
+            None
+
+        Return:
+            None
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared cache used by riot_requests and riot_requests_async
+cache = SpectatorCache()
@@ -0,0 +1,103 @@
+import asyncio
+import responses
+import riot_requests_async
+from datetime import datetime, timedelta
+from riot_requests import parse_active_match
+from spectator_cache import SpectatorCache
+from summoner import Summoner
+from unittest.mock import patch
+
+game = {"gameId": 42, "gameStartTime": 1680563239000, "gameLength": 600,
+        "participants": [{"teamId": 100, "summonerName": "Kid Orpheus"},
+                         {"teamId": 200, "summonerName": "Aeras"}]}
+
+
+def test_game_length_is_extrapolated():
+    """
+    Test a cached game comes back with gameLength advanced by the time since Riot sent it.
+    """
+    cache = SpectatorCache(ttl=60)
+
+    with patch("time.monotonic", return_value=100.0):
+        cache.store("summoner-id", game)
+    with patch("time.monotonic", return_value=130.0):
+        found, match_info = cache.lookup("summoner-id")
+
+    assert found
+    assert match_info["gameLength"] == 630
+    assert game["gameLength"] == 600
+
+
+def test_not_in_game_expires_after_negative_ttl():
+    """
+    Test "not in game" is cached for negative_ttl and a game for ttl.
+    """
+    cache = SpectatorCache(ttl=60, negative_ttl=10)
+
+    with patch("time.monotonic", return_value=100.0):
+        cache.store("idle", None)
+        cache.store("playing", game)
+    with patch("time.monotonic", return_value=105.0):
+        assert cache.lookup("idle") == (True, None)
+    with patch("time.monotonic", return_value=111.0):
+        assert cache.lookup("idle") == (False, None)
+        assert cache.lookup("playing")[0]
+        # The same id on another platform is another summoner
+        assert cache.lookup("playing", "EUW1") == (False, None)
+
+
+def test_parse_active_match_reads_game_start_time():
+    """
+    Test an active match starts at the payload's gameStartTime and lasts gameLength.
+    """
+    match = parse_active_match(game)
+
+    assert match.start_time == datetime.fromtimestamp(1680563239)
+    assert match.duration == timedelta(minutes=10)
+    assert [team.participants for team in match.teams] == [["Kid Orpheus"], ["Aeras"]]
+
+
+def test_batched_checks_are_served_from_cache():
+    """
+    Test a group check asks Riot once per distinct summoner, and checking the group again
+    costs no request.
+    """
+    requested = []
+
+    async def _get(host, method, path, params=None):
+        requested.append(path.rsplit("/", 1)[1])
+        await asyncio.sleep(0)
+        return (200, game) if path.endswith("/playing") else (404, None)
+
+    async def run():
+        first = await riot_requests_async.get_active_games_info(["playing", "idle", "playing"], limit=1)
+        second = await riot_requests_async.get_active_games_info(["idle", "playing"])
+        return first, second
+
+    with patch("riot_requests_async._get", _get):
+        first, second = asyncio.run(run())
+
+    assert sorted(requested) == ["idle", "playing"]
+    assert first["idle"] is None and second["idle"] is None
+    assert first["playing"]["gameId"] == second["playing"]["gameId"] == 42
+
+
+def test_active_group_shares_one_summary_per_game():
+    """
+    Test summoners in the same game share one summary and idle summoners are listed together.
+    """
+    summoners = {name: Summoner(name, name.lower(), name.lower()) for name in ("Kid Orpheus", "Aeras", "Idle")}
+
+    async def get_summoners_by_name(summoner_name, platform=None):
+        return summoners[summoner_name]
+
+    async def get_active_games_info(summoner_ids, platform=None, limit=None):
+        return {summoner_id: None if summoner_id == "idle" else game for summoner_id in summoner_ids}
+
+    with patch("riot_requests_async.get_summoners_by_name", get_summoners_by_name), \
+            patch("riot_requests_async.get_active_games_info", get_active_games_info):
+        active_games = asyncio.run(responses.active_group(["Kid Orpheus", "Aeras", "Idle"]))
+
+    assert len(active_games) == 2
+    assert active_games[0].startswith("Kid Orpheus, Aeras in game:\nMatch started at:")
+    assert active_games[1] == "Not playing League of Legends right now: Idle"
@@ -0,0 +1,76 @@
+import os
+import pytest
+import subprocess
+import sys
+
+# Cumulative import time allowed for the bot's own modules, in milliseconds
+startup_import_budget_ms = float(
+    os.getenv('STARTUP_IMPORT_BUDGET_MS', '250'))
+
+# Fresh interpreters timed, the fastest one is compared to the budget
+startup_import_runs = int(os.getenv('STARTUP_IMPORT_RUNS', '5'))
+
+
+def import_in_fresh_interpreter(module: str, *flags: str) -> subprocess.CompletedProcess:
+    """
+    Import module in a new Python process and print the heavy modules it loaded
+
+    Args:
+        module: module to import
+        flags: extra interpreter flags, e.g. "-X", "importtime"
+
+    Return:
+        The finished process
+    """
+    code = (f"import sys, {module}; "
+            "print(' '.join(sorted(name for name in ('matplotlib', 'numpy', 'requests', 'aiohttp') "
+            "if name in sys.modules)))")
+    return subprocess.run([sys.executable, *flags, "-c", code], capture_output=True, text=True,
+                          cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+
+
+@pytest.mark.parametrize("module, allowed", [
+    ("discord_bot", {"aiohttp"}),
+    ("responses", set()),
+    ("riot_requests", set()),
+    ("riot_requests_async", set()),
+])
+def test_heavy_modules_are_lazy(module, allowed):
+    """
+    Test importing the bot does not load plotting, NumPy or an unused HTTP client.
+    discord.py needs aiohttp itself, so the bot may load it.
+    """
+    loaded = set(import_in_fresh_interpreter(module).stdout.split())
+
+    assert loaded <= allowed
+
+
+def import_time_ms(module: str) -> float:
+    """
+    Return the cumulative import time of module in a new Python process
+
+    Args:
+        module: module to import
+
+    Return:
+        The import time in milliseconds
+    """
+    process = import_in_fresh_interpreter(module, "-X", "importtime")
+
+    # Lines look like "import time: self [us] | cumulative | imported package"
+    for line in process.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            fields = line.split("|")
+            if fields[2].strip() == module and fields[1].strip().isdigit():
+                return int(fields[1]) / 1000
+    raise AssertionError(f"no import time reported for {module}")
+
+
+def test_import_time_budget():
+    """
+    Test the cumulative import time of responses stays within the startup budget.
+    The fastest of several fresh interpreters is used, so a busy machine does not fail the test.
+    """
+    fastest = min(import_time_ms("responses") for _ in range(startup_import_runs))
+
+    assert fastest < startup_import_budget_ms
@@ -1,3 +1,5 @@
+import regions
+
 
 class Summoner():
     """
@@ -7,12 +9,16 @@ class Summoner():
     name: Summoner's name
     id: Summoner's id
     puuid: Summoner's puuid
+    platform: Platform the summoner plays on, e.g. "NA1"
     """
+    __slots__ = ("name", "id", "puuid", "platform")
+
     name: str
     id: str
     puuid: str
+    platform: str
 
-    def __init__(self, name: str, id: str, puuid: str) -> None:
+    def __init__(self, name: str, id: str, puuid: str, platform: str = None) -> None:
         """
         Initialize a Summoner object
 
@@ -20,6 +26,7 @@ class Summoner():
             name: Summoner's name
             id: Summoner's id
             puuid: Summoner's puuid
+            platform: Platform the summoner plays on, None for regions.default_platform
 
         Return:
             None
@@ -27,6 +34,7 @@ class Summoner():
         self.name = name
         self.id = id
         self.puuid = puuid
+        self.platform = regions.normalize_platform(platform)
 
     def __eq__(self, other: object) -> bool:
         """
@@ -40,7 +48,8 @@ class Summoner():
         """
         if not isinstance(other, Summoner):
             return False
-        return self.name == other.name and self.id == other.id and self.puuid == other.puuid
+        return self.name == other.name and self.id == other.id and self.puuid == other.puuid \
+            and self.platform == other.platform
 
     def __str__(self) -> str:
         """
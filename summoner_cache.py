@@ -0,0 +1,337 @@
+import asyncio
+import metrics
+import os
+import regions
+import threading
+import time
+from collections import OrderedDict
+from exceptions import SummonerNotFound
+from summoner import Summoner
+from typing import Awaitable, Callable, Optional, Tuple, Union
+
+# Summoner cache settings in entries and seconds
+summoner_cache_size = int(os.getenv('SUMMONER_CACHE_SIZE', '1024'))
+summoner_cache_ttl = float(os.getenv('SUMMONER_CACHE_TTL', '3600'))
+summoner_cache_stale_ttl = float(
+    os.getenv('SUMMONER_CACHE_STALE_TTL', '86400'))
+summoner_cache_negative_ttl = float(
+    os.getenv('SUMMONER_CACHE_NEGATIVE_TTL', '60'))
+
+
+def normalize_name(summoner_name: str) -> str:
+    """
+    Return the cache key of summoner_name. Riot ignores case and spaces in summoner names.
+
+    Args:
+        summoner_name: summoner name
+
+    Return:
+        The cache key of summoner_name
+    """
+    return summoner_name.replace(" ", "").lower()
+
+
+def cache_key(summoner_name: str, platform: str = None) -> Tuple[str, str]:
+    """
+    Return the cache key of summoner_name on platform. The same name is a different summoner on each platform.
+
+    Args:
+        summoner_name: summoner name
+        platform: platform id, None for regions.default_platform
+
+    Return:
+        The (platform, name) cache key
+    """
+    return (regions.normalize_platform(platform), normalize_name(summoner_name))
+
+
+def _record_lookup(result: Optional[Union[Summoner, SummonerNotFound]], stale: bool) -> None:
+    """
+    Count a cache lookup as a hit, a stale hit, a negative hit or a miss
+
+    Args:
+        result: the cached result, None on a miss
+        stale: whether the lookup started a refresh
+
+    Return:
+        None
+    """
+    if result is None:
+        outcome = "miss"
+    elif isinstance(result, SummonerNotFound):
+        outcome = "negative_hit"
+    elif stale:
+        outcome = "stale_hit"
+    else:
+        outcome = "hit"
+    metrics.cache_requests_total.inc(cache="summoner", result=outcome)
+
+
+class SummonerCache():
+    """
+    LRU cache of summoner lookups by platform and name with a TTL.
+    Entries older than ttl are still served for stale_ttl more seconds while a refresh runs in the background.
+    SummonerNotFound results are cached for negative_ttl seconds.
+
+    === Instance Attributes ===
+    max_entries: Maximum number of summoners kept
+    ttl: Seconds an entry is fresh
+    stale_ttl: Seconds a stale entry may still be served after ttl
+    negative_ttl: Seconds a SummonerNotFound result is cached
+    """
+    max_entries: int
+    ttl: float
+    stale_ttl: float
+    negative_ttl: float
+
+    def __init__(self, max_entries: int = summoner_cache_size, ttl: float = summoner_cache_ttl,
+                 stale_ttl: float = summoner_cache_stale_ttl, negative_ttl: float = summoner_cache_negative_ttl) -> None:
+        """
+        Initialize a SummonerCache object
+
+        Args:
+            max_entries: Maximum number of summoners kept
+            ttl: Seconds an entry is fresh
+            stale_ttl: Seconds a stale entry may still be served after ttl
+            negative_ttl: Seconds a SummonerNotFound result is cached
+
+        Return:
+            None
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._refreshing = set()
+        # Background refreshes of get_async, kept so they are not garbage collected while running
+        self._refresh_tasks = set()
+        self._lock = threading.Lock()
+
+    def lookup(self, summoner_name: str, platform: str = None) -> Tuple[Optional[Union[Summoner, SummonerNotFound]], bool]:
+        """
+        Return the cached result for summoner_name and whether it needs a refresh
+
+        Args:
+            summoner_name: summoner name
+            platform: platform id, None for regions.default_platform
+
+        Return:
+            (result, stale): result is None on a miss, stale is True if a refresh should start
+        """
+        key = cache_key(summoner_name, platform)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return (None, False)
+
+            result, fetched_at = entry
+            age = time.monotonic() - fetched_at
+
+            if isinstance(result, SummonerNotFound):
+                if age < self.negative_ttl:
+                    return (result, False)
+            elif age < self.ttl:
+                self._entries.move_to_end(key)
+                return (result, False)
+            elif age < self.ttl + self.stale_ttl:
+                self._entries.move_to_end(key)
+                stale = key not in self._refreshing
+                self._refreshing.add(key)
+                return (result, stale)
+
+            del self._entries[key]
+            return (None, False)
+
+    def store(self, summoner_name: str, result: Union[Summoner, SummonerNotFound], platform: str = None) -> None:
+        """
+        Cache result for summoner_name and evict the least recently used names above max_entries
+
+        Args:
+            summoner_name: summoner name
+            result: the summoner, or the SummonerNotFound raised for it
+            platform: platform id, None for regions.default_platform
+
+        Return:
+            None
+        """
+        key = cache_key(summoner_name, platform)
+        with self._lock:
+            self._entries[key] = (result, time.monotonic())
+            self._entries.move_to_end(key)
+            self._refreshing.discard(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _refresh_failed(self, summoner_name: str, platform: str = None) -> None:
+        """
+        Allow another refresh of summoner_name after a failed one, keeping the stale entry
+
+        Args:
+            summoner_name: summoner name
+            platform: platform id, None for regions.default_platform
+
+        Return:
+            None
+        """
+        with self._lock:
+            self._refreshing.discard(cache_key(summoner_name, platform))
+
+    def _load(self, summoner_name: str, loader: Callable[[str], Summoner], platform: str = None) -> Summoner:
+        """
+        Call loader and cache what it returns or its SummonerNotFound
+
+        Args:
+            summoner_name: summoner name
+            loader: function fetching the summoner from Riot
+            platform: platform id, None for regions.default_platform
+
+        Return:
+            The summoner
+        """
+        try:
+            summoner = loader(summoner_name)
+        except SummonerNotFound as e:
+            self.store(summoner_name, e, platform)
+            raise
+        except Exception:
+            self._refresh_failed(summoner_name, platform)
+            raise
+        self.store(summoner_name, summoner, platform)
+        return summoner
+
+    async def _load_async(self, summoner_name: str, loader: Callable[[str], Awaitable[Summoner]],
+                          platform: str = None) -> Summoner:
+        """
+        Await loader and cache what it returns or its SummonerNotFound
+
+        Args:
+            summoner_name: summoner name
+            loader: coroutine function fetching the summoner from Riot
+            platform: platform id, None for regions.default_platform
+
+        Return:
+            The summoner
+        """
+        try:
+            summoner = await loader(summoner_name)
+        except SummonerNotFound as e:
+            self.store(summoner_name, e, platform)
+            raise
+        except Exception:
+            self._refresh_failed(summoner_name, platform)
+            raise
+        self.store(summoner_name, summoner, platform)
+        return summoner
+
+    def get(self, summoner_name: str, loader: Callable[[str], Summoner], platform: str = None) -> Summoner:
+        """
+        Return the summoner named summoner_name, calling loader only on a miss.
+        A stale hit is returned at once and refreshed on a background thread.
+
+        Args:
+            summoner_name: summoner name
+            loader: function fetching the summoner from Riot
+            platform: platform id, None for regions.default_platform
+
+        Return:
+            The summoner
+
+        Raises:
+            SummonerNotFound: if no summoner with the given name was found.
+        """
+        result, stale = self.lookup(summoner_name, platform)
+        _record_lookup(result, stale)
+
+        if result is None:
+            return self._load(summoner_name, loader, platform)
+
+        if stale:
+            threading.Thread(target=self._refresh, args=(
+                summoner_name, loader, platform), daemon=True).start()
+
+        if isinstance(result, SummonerNotFound):
+            # A fresh exception per hit, so callers do not share one traceback
+            raise SummonerNotFound(result.summoner_name)
+        return result
+
+    async def get_async(self, summoner_name: str, loader: Callable[[str], Awaitable[Summoner]],
+                        platform: str = None) -> Summoner:
+        """
+        Async counterpart of get. A stale hit is refreshed in a background task.
+
+        Args:
+            summoner_name: summoner name
+            loader: coroutine function fetching the summoner from Riot
+            platform: platform id, None for regions.default_platform
+
+        Return:
+            The summoner
+
+        Raises:
+            SummonerNotFound: if no summoner with the given name was found.
+        """
+        result, stale = self.lookup(summoner_name, platform)
+        _record_lookup(result, stale)
+
+        if result is None:
+            return await self._load_async(summoner_name, loader, platform)
+
+        if stale:
+            task = asyncio.create_task(
+                self._load_async(summoner_name, loader, platform))
+            self._refresh_tasks.add(task)
+            task.add_done_callback(self._refresh_done)
+
+        if isinstance(result, SummonerNotFound):
+            raise SummonerNotFound(result.summoner_name)
+        return result
+
+    def _refresh_done(self, task: asyncio.Task) -> None:
+        """
+        Forget a finished background refresh, retrieving its exception so it is not reported as unhandled
+
+        Args:
+            task: the finished refresh task
+
+        Return:
+            None
+        """
+        self._refresh_tasks.discard(task)
+        if not task.cancelled():
+            task.exception()
+
+    def _refresh(self, summoner_name: str, loader: Callable[[str], Summoner], platform: str = None) -> None:
+        """
+        Refresh summoner_name in the background, keeping the stale entry on failure
+
+        Args:
+            summoner_name: summoner name
+            loader: function fetching the summoner from Riot
+            platform: platform id, None for regions.default_platform
+
+        Return:
+            None
+        """
+        try:
+            self._load(summoner_name, loader, platform)
+        except Exception:
+            pass
+
+    def clear(self) -> None:
+        """
+        Remove every cached name
+
+        Args:
+            None
+
+        Return:
+            None
+        """
+        with self._lock:
+            self._entries.clear()
+            self._refreshing.clear()
+
+
+# Shared cache used by riot_requests and riot_requests_async
+cache = SummonerCache()
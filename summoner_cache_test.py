@@ -0,0 +1,102 @@
+import asyncio
+import pytest
+import time
+from exceptions import SummonerNotFound
+from summoner import Summoner
+from summoner_cache import SummonerCache
+
+summoner = Summoner("Kid Orpheus", "id", "puuid")
+
+
+def test_get_caches_by_normalized_name():
+    """
+    Test get() only calls the loader once for names differing in case and spaces.
+    """
+    cache = SummonerCache()
+    calls = []
+
+    def loader(summoner_name):
+        calls.append(summoner_name)
+        return summoner
+
+    assert cache.get("Kid Orpheus", loader) == summoner
+    assert cache.get("kidorpheus", loader) == summoner
+    assert calls == ["Kid Orpheus"]
+
+
+def test_get_caches_summoner_not_found():
+    """
+    Test SummonerNotFound is cached until negative_ttl expires.
+    """
+    cache = SummonerCache(negative_ttl=0.05)
+    calls = []
+
+    def loader(summoner_name):
+        calls.append(summoner_name)
+        raise SummonerNotFound(summoner_name)
+
+    for i in range(3):
+        with pytest.raises(SummonerNotFound):
+            cache.get("typo", loader)
+    assert len(calls) == 1
+
+    time.sleep(0.06)
+    with pytest.raises(SummonerNotFound):
+        cache.get("typo", loader)
+    assert len(calls) == 2
+
+
+def test_cached_summoner_not_found_is_raised_fresh():
+    """
+    Test every hit on a cached SummonerNotFound raises its own exception.
+    """
+    cache = SummonerCache()
+    cache.store("typo", SummonerNotFound("typo"))
+
+    raised = []
+    for i in range(2):
+        with pytest.raises(SummonerNotFound) as e:
+            cache.get("typo", lambda name: summoner)
+        raised.append(e.value)
+
+    assert raised[0] is not raised[1]
+    assert raised[1].message == "Summoner 'typo' not found"
+
+
+def test_get_serves_stale_while_refreshing():
+    """
+    Test a stale entry is returned at once while a background refresh replaces it.
+    """
+    cache = SummonerCache(ttl=0.01)
+    refreshed = Summoner("Kid Orpheus", "new id", "puuid")
+    cache.store("Kid Orpheus", summoner)
+    time.sleep(0.02)
+
+    assert cache.get("Kid Orpheus", lambda name: refreshed) == summoner
+    for i in range(100):
+        if cache.lookup("Kid Orpheus")[0] == refreshed:
+            break
+        time.sleep(0.01)
+    assert cache.lookup("Kid Orpheus") == (refreshed, False)
+
+
+def test_get_async_serves_stale_while_refreshing():
+    """
+    Test get_async() returns a stale entry and refreshes it in a background task.
+    """
+    cache = SummonerCache(ttl=0.05)
+    refreshed = Summoner("Kid Orpheus", "new id", "puuid")
+    cache.store("Kid Orpheus", summoner)
+    time.sleep(0.06)
+
+    async def loader(summoner_name):
+        return refreshed
+
+    async def run():
+        stale = await cache.get_async("Kid Orpheus", loader)
+        await asyncio.sleep(0.01)
+        return stale
+
+    assert asyncio.run(run()) == summoner
+    assert cache.lookup("Kid Orpheus")[0] == refreshed
+    assert not cache._refresh_tasks
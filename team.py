@@ -10,6 +10,8 @@ class Team():
     participants: List of participants in the team
     win: Win result of the team
     """
+    __slots__ = ("id", "participants", "win")
+
     id: int
     participants: List[str]
     win: bool
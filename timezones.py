@@ -0,0 +1,42 @@
+import os
+from datetime import datetime, tzinfo
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+# Timezone of report buckets, the server's local timezone if unset
+report_timezone = os.getenv('REPORT_TIMEZONE')
+
+
+def get_timezone(name: Optional[str] = report_timezone) -> Optional[tzinfo]:
+    """
+    Return the timezone called name. None stands for the server's local time,
+    which datetime converts with the local daylight saving rules.
+
+    Args:
+        name: IANA timezone name, e.g. "America/Toronto"
+
+    Return:
+        The timezone, or None for local time
+    """
+    if not name:
+        return None
+    return ZoneInfo(name)
+
+
+def day_start(day: str, tz: Optional[tzinfo] = None) -> float:
+    """
+    Return the epoch seconds of midnight starting day in tz
+
+    Args:
+        day: date as "YYYY-MM-DD"
+        tz: timezone of the day, REPORT_TIMEZONE or local time by default
+
+    Return:
+        The start of day in epoch seconds
+
+    Raises:
+        ValueError: if day is not a "YYYY-MM-DD" date
+    """
+    if tz is None:
+        tz = get_timezone()
+    return datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=tz).timestamp()
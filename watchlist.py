@@ -0,0 +1,424 @@
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import time
+import riot_requests_async
+from report_state import ReportState
+from summoner import Summoner
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+# Poll budget of each platform, shared by every watched summoner on it
+watchlist_polls_per_second = float(
+    os.getenv('WATCHLIST_POLLS_PER_SECOND', '5'))
+watchlist_max_in_flight = int(os.getenv('WATCHLIST_MAX_IN_FLIGHT', '10'))
+
+# Poll intervals in seconds
+typical_game_length = 30 * 60
+in_game_slow_interval = 5 * 60
+in_game_fast_interval = 30
+in_game_fast_window = 10 * 60
+idle_interval = 2 * 60
+inactive_interval = 10 * 60
+inactive_after = 24 * 60 * 60
+dormant_interval = 30 * 60
+dormant_after = 3 * 24 * 60 * 60
+error_interval = 60
+
+# Share of a platform's budget kept for idle summoners when games in progress need the rest
+idle_min_share = 0.1
+
+
+class WatchedSummoner():
+    """
+    A summoner on the watchlist and what the poller knows about them
+
+    === Instance Attributes ===
+    summoner: Summoner DTO (Data Transfer Object)
+    channel_ids: Discord channels subscribed to the summoner
+    game_id: Id of the game the summoner is playing, None if not in game
+    game_start: Epoch seconds the current game started
+    last_played: Epoch seconds the summoner was last seen in game, None if never
+    added_at: Epoch seconds the summoner was added to the watchlist
+    next_poll: Epoch seconds of the next scheduled poll
+    poll_rate: Polls per second the summoner asks for at their unstretched interval
+    """
+    summoner: Summoner
+    channel_ids: Set[int]
+    game_id: Optional[int]
+    game_start: float
+    last_played: Optional[float]
+    added_at: float
+    next_poll: float
+    poll_rate: float
+
+    def __init__(self, summoner: Summoner, added_at: float = None) -> None:
+        """
+        Initialize a WatchedSummoner object
+
+        Args:
+            summoner: Summoner DTO (Data Transfer Object)
+            added_at: Epoch seconds the summoner was added, now by default
+
+        Return:
+            None
+        """
+        self.summoner = summoner
+        self.channel_ids = set()
+        self.game_id = None
+        self.game_start = 0.0
+        self.last_played = None
+        self.added_at = added_at if added_at is not None else time.time()
+        self.next_poll = 0.0
+        self.poll_rate = 0.0
+        # Whether poll_rate is counted with the games in progress of the watchlist's demand
+        self._in_game = False
+
+
+def next_interval(watched: WatchedSummoner, now: float) -> float:
+    """
+    Return the seconds until watched should be polled again.
+    A game in progress is polled slowly until it nears the typical game length, then quickly.
+    Idle summoners are polled less often the longer they have not played, counting from when
+    they were added if they have not been seen in game yet.
+
+    Args:
+        watched: the watched summoner
+        now: current epoch seconds
+
+    Return:
+        The seconds until the next poll
+    """
+    if watched.game_id is not None:
+        remaining = typical_game_length - (now - watched.game_start)
+        if remaining > in_game_fast_window:
+            return min(in_game_slow_interval, remaining - in_game_fast_window)
+        return in_game_fast_interval
+
+    last_seen = watched.last_played if watched.last_played is not None else watched.added_at
+    if now - last_seen > dormant_after:
+        return dormant_interval
+    if now - last_seen > inactive_after:
+        return inactive_interval
+    return idle_interval
+
+
+class Watchlist():
+    """
+    Background poller of the Spectator-V4 API for subscribed summoners.
+    Polls are scheduled on a heap by due time and dispatched within a fixed budget of
+    polls per second, so thousands of summoners fit one API key.
+    Every platform has its own heap, dispatcher and budget, as Riot rate limits each platform
+    separately, so a platform being throttled does not hold up polls on the others.
+    When a platform's summoners ask for more polls than its budget, games in progress keep
+    their intervals and idle summoners are polled less often to make room.
+    notify is awaited with (watched, event, match_info) where event is "started" or "ended".
+
+    === Instance Attributes ===
+    watched: Watched summoners by summoner id
+    polls_per_second: Maximum polls dispatched per second on each platform
+    max_in_flight: Maximum polls waiting on Riot at once on each platform
+    running: True while run() is dispatching polls
+    state: Where subscriptions are saved so they survive restarts, None to keep them in memory only
+    """
+    watched: Dict[str, WatchedSummoner]
+    polls_per_second: float
+    max_in_flight: int
+    running: bool
+    state: Optional[ReportState]
+
+    def __init__(self, notify: Callable[[WatchedSummoner, str, Optional[Dict]], Awaitable[None]],
+                 polls_per_second: float = watchlist_polls_per_second,
+                 max_in_flight: int = watchlist_max_in_flight, state: Optional[ReportState] = None) -> None:
+        """
+        Initialize a Watchlist object
+
+        Args:
+            notify: coroutine function called when a game starts or ends
+            polls_per_second: Maximum polls dispatched per second on each platform
+            max_in_flight: Maximum polls waiting on Riot at once on each platform
+            state: Where subscriptions are saved, None to keep them in memory only
+
+        Return:
+            None
+        """
+        self.notify = notify
+        self.state = state
+        self.polls_per_second = polls_per_second
+        self.max_in_flight = max_in_flight
+        self.watched = {}
+        # platform -> heap of (due time, tie breaker, summoner id)
+        self._heaps: Dict[str, List[Tuple[float, int, str]]] = {}
+        self._counter = itertools.count()
+        # (platform, in game) -> polls per second asked for by those summoners
+        self._demand: Dict[Tuple[str, bool], float] = {}
+        self.running = False
+        # Set when a platform gets its first summoner or on stop()
+        self._wakeup = None
+        self._platform_wakeups: Dict[str, asyncio.Event] = {}
+        self._tasks = set()
+
+    def watch(self, summoner: Summoner, channel_id: int) -> WatchedSummoner:
+        """
+        Subscribe channel_id to summoner, scheduling a poll right away for a new summoner
+
+        Args:
+            summoner: Summoner DTO (Data Transfer Object)
+            channel_id: Discord channel to alert
+
+        Return:
+            The watched summoner
+        """
+        watched = self.watched.get(summoner.id)
+        if watched is None:
+            watched = WatchedSummoner(summoner)
+            self.watched[summoner.id] = watched
+            self._schedule(watched, time.time())
+        if channel_id not in watched.channel_ids and self.state is not None:
+            self.state.save_watch(summoner, channel_id)
+        watched.channel_ids.add(channel_id)
+        return watched
+
+    def restore(self) -> int:
+        """
+        Subscribe again every channel saved in state, e.g. after a restart
+
+        Args:
+            None
+
+        Return:
+            The number of subscriptions restored
+        """
+        if self.state is None:
+            return 0
+        watches = self.state.watches()
+        for summoner, channel_id in watches:
+            self.watch(summoner, channel_id)
+        return len(watches)
+
+    def unwatch(self, summoner_id: str, channel_id: int) -> bool:
+        """
+        Unsubscribe channel_id from summoner_id, dropping the summoner once no channel is left
+
+        Args:
+            summoner_id: summoner id
+            channel_id: Discord channel
+
+        Return:
+            True if channel_id was subscribed
+        """
+        watched = self.watched.get(summoner_id)
+        if watched is None or channel_id not in watched.channel_ids:
+            return False
+        watched.channel_ids.discard(channel_id)
+        if self.state is not None:
+            self.state.delete_watch(summoner_id, channel_id)
+        if not watched.channel_ids:
+            self._set_poll_rate(watched, 0.0)
+            del self.watched[summoner_id]
+        return True
+
+    def _set_poll_rate(self, watched: WatchedSummoner, poll_rate: float) -> None:
+        """
+        Record the polls per second watched asks for in the demand of its platform
+
+        Args:
+            watched: the watched summoner
+            poll_rate: polls per second at watched's unstretched interval, 0 once unwatched
+
+        Return:
+            None
+        """
+        platform = watched.summoner.platform
+        old_key = (platform, watched._in_game)
+        self._demand[old_key] = max(0.0, self._demand.get(old_key, 0.0) - watched.poll_rate)
+        watched._in_game = watched.game_id is not None
+        new_key = (platform, watched._in_game)
+        self._demand[new_key] = self._demand.get(new_key, 0.0) + poll_rate
+        watched.poll_rate = poll_rate
+
+    def idle_stretch(self, platform: str) -> float:
+        """
+        Return the factor idle intervals on platform are multiplied by so its polls fit the budget.
+        Games in progress are served first, idle summoners share what is left of the budget,
+        and never less than idle_min_share of it.
+
+        Args:
+            platform: platform id
+
+        Return:
+            The factor, 1 when the platform is within budget
+        """
+        in_game = self._demand.get((platform, True), 0.0)
+        idle = self._demand.get((platform, False), 0.0)
+        spare = max(self.polls_per_second - in_game, self.polls_per_second * idle_min_share)
+        return max(1.0, idle / spare)
+
+    def _schedule(self, watched: WatchedSummoner, when: float) -> None:
+        """
+        Schedule the next poll of watched at when
+
+        Args:
+            watched: the watched summoner
+            when: epoch seconds of the poll
+
+        Return:
+            None
+        """
+        platform = watched.summoner.platform
+        watched.next_poll = when
+        heapq.heappush(self._heaps.setdefault(platform, []), (when, next(
+            self._counter), watched.summoner.id))
+        if platform in self._platform_wakeups:
+            self._platform_wakeups[platform].set()
+        elif self._wakeup is not None:
+            self._wakeup.set()
+
+    async def poll(self, watched: WatchedSummoner) -> None:
+        """
+        Poll watched once, send alerts for a started or ended game and schedule the next poll
+
+        Args:
+            watched: the watched summoner
+
+        Return:
+            None
+        """
+        try:
+            # Polls are already paced, each one refreshes the spectator cache for /active
+            match_info = await riot_requests_async.get_active_game_info(watched.summoner.id,
+                                                                        watched.summoner.platform, fresh=True)
+        except Exception:
+            self._schedule(watched, time.time() + error_interval)
+            return
+
+        now = time.time()
+        if match_info is not None and match_info.get("gameId") != watched.game_id:
+            watched.game_id = match_info.get("gameId")
+            # gameStartTime is 0 while the game is loading
+            game_start = match_info.get("gameStartTime", 0) / 1000
+            watched.game_start = game_start if game_start > 0 else now
+            watched.last_played = now
+            await self._notify(watched, "started", match_info)
+        elif match_info is None and watched.game_id is not None:
+            watched.game_id = None
+            watched.last_played = now
+            await self._notify(watched, "ended", None)
+        elif match_info is not None:
+            watched.last_played = now
+
+        if self.watched.get(watched.summoner.id) is not watched:
+            return
+        interval = next_interval(watched, now)
+        self._set_poll_rate(watched, 1 / interval)
+        if watched.game_id is None:
+            interval *= self.idle_stretch(watched.summoner.platform)
+        # Jitter keeps summoners added together from polling in lockstep
+        self._schedule(watched, now + interval * random.uniform(0.9, 1.1))
+
+    async def _notify(self, watched: WatchedSummoner, event: str, match_info: Optional[Dict]) -> None:
+        """
+        Await notify, keeping the poller alive if it fails
+
+        Args:
+            watched: the watched summoner
+            event: "started" or "ended"
+            match_info: the Spectator-V4 payload, None when a game ended
+
+        Return:
+            None
+        """
+        try:
+            await self.notify(watched, event, match_info)
+        except Exception as e:
+            print(e)
+
+    async def run(self) -> None:
+        """
+        Dispatch due polls of every platform in parallel until stop() is called
+
+        Args:
+            None
+
+        Return:
+            None
+        """
+        self.running = True
+        self._wakeup = asyncio.Event()
+        dispatchers = {}
+
+        try:
+            while self.running:
+                self._wakeup.clear()
+                for platform in self._heaps:
+                    if platform not in dispatchers:
+                        self._platform_wakeups[platform] = asyncio.Event()
+                        dispatchers[platform] = asyncio.create_task(
+                            self._dispatch(platform))
+                await self._wakeup.wait()
+
+            await asyncio.gather(*dispatchers.values())
+        finally:
+            # A dispatcher that crashed stops the others, so run() can be started again
+            self.stop()
+            self._platform_wakeups.clear()
+
+    async def _dispatch(self, platform: str) -> None:
+        """
+        Dispatch due polls of platform within its budget until stop() is called
+
+        Args:
+            platform: platform id
+
+        Return:
+            None
+        """
+        heap = self._heaps[platform]
+        wakeup = self._platform_wakeups[platform]
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+
+        async def poll(watched: WatchedSummoner) -> None:
+            try:
+                await self.poll(watched)
+            finally:
+                in_flight.release()
+
+        while self.running:
+            now = time.time()
+            if not heap or heap[0][0] > now:
+                timeout = heap[0][0] - now if heap else None
+                wakeup.clear()
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            when, _, summoner_id = heapq.heappop(heap)
+            watched = self.watched.get(summoner_id)
+            # Skip summoners that were unwatched or rescheduled since this entry was pushed
+            if watched is None or watched.next_poll != when:
+                continue
+
+            await in_flight.acquire()
+            task = asyncio.create_task(poll(watched))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            await asyncio.sleep(1 / self.polls_per_second)
+
+    def stop(self) -> None:
+        """
+        Stop run() after its current dispatch
+
+        Args:
+            None
+
+        Return:
+            None
+        """
+        self.running = False
+        if self._wakeup is not None:
+            self._wakeup.set()
+        for wakeup in self._platform_wakeups.values():
+            wakeup.set()
@@ -0,0 +1,231 @@
+import asyncio
+import pytest
+import watchlist
+from report_state import ReportState
+from summoner import Summoner
+from unittest.mock import patch
+from watchlist import Watchlist, WatchedSummoner, next_interval
+
+summoner = Summoner("Kid Orpheus", "ii9IPVp8k7MZ33wazChECinTlHDRzgkMMF5VCY-sFRjcnOg",
+                    "pfB-gQaB5s62NVK_YTWT7w6Y1NKIjpdzB38-8rFS2cssK-P6i5lFqqT2iVZHZ_rKmGceVc72TTU9Gw")
+
+
+def test_next_interval_in_game():
+    """
+    Test a game in progress is polled slowly at first and quickly near its typical end.
+    """
+    watched = WatchedSummoner(summoner)
+    watched.game_id = 1
+    watched.game_start = 0
+
+    assert next_interval(watched, 0) == watchlist.in_game_slow_interval
+    assert next_interval(watched, 17 * 60) == 3 * 60
+    assert next_interval(watched, 25 * 60) == watchlist.in_game_fast_interval
+
+
+def test_next_interval_idle():
+    """
+    Test idle summoners are polled less often the longer they have not played, and a summoner
+    never seen in game counts from when they were added.
+    """
+    watched = WatchedSummoner(summoner, added_at=0)
+    day = 24 * 60 * 60
+
+    assert next_interval(watched, 60) == watchlist.idle_interval
+    assert next_interval(watched, 2 * day) == watchlist.inactive_interval
+    assert next_interval(watched, 4 * day) == watchlist.dormant_interval
+    watched.last_played = 4 * day
+    assert next_interval(watched, 4 * day + 60) == watchlist.idle_interval
+    assert next_interval(watched, 6 * day) == watchlist.inactive_interval
+
+
+def test_poll_notifies_start_and_end():
+    """
+    Test poll() sends one alert when a game starts and one when it ends.
+    """
+    events = []
+    responses = [{"gameId": 42, "gameStartTime": 0}, {"gameId": 42, "gameStartTime": 0}, None, None]
+
+    async def notify(watched, event, match_info):
+        events.append((event, match_info))
+
+    async def mock_get_active_game_info(summoner_id, platform=None, fresh=False):
+        return responses.pop(0)
+
+    async def run():
+        watchers = Watchlist(notify)
+        watched = watchers.watch(summoner, 1)
+        for i in range(4):
+            await watchers.poll(watched)
+        return watched
+
+    with patch("riot_requests_async.get_active_game_info", mock_get_active_game_info):
+        watched = asyncio.run(run())
+
+    assert events == [("started", {"gameId": 42, "gameStartTime": 0}), ("ended", None)]
+    assert watched.game_id is None
+    assert watched.last_played is not None
+
+
+def test_poll_reschedules_after_error():
+    """
+    Test a failed poll is retried after error_interval without alerting.
+    """
+    events = []
+
+    async def notify(watched, event, match_info):
+        events.append(event)
+
+    async def mock_get_active_game_info(summoner_id, platform=None, fresh=False):
+        raise ConnectionError()
+
+    async def run():
+        watchers = Watchlist(notify)
+        watched = watchers.watch(summoner, 1)
+        await watchers.poll(watched)
+        return watched
+
+    with patch("riot_requests_async.get_active_game_info", mock_get_active_game_info), \
+            patch("time.time", return_value=1000.0):
+        watched = asyncio.run(run())
+
+    assert events == []
+    assert watched.next_poll == 1000.0 + watchlist.error_interval
+
+
+def test_unwatch_drops_summoner_with_no_channels():
+    """
+    Test a summoner is dropped once every channel has unwatched them.
+    """
+    async def notify(watched, event, match_info):
+        pass
+
+    watchers = Watchlist(notify)
+    watchers.watch(summoner, 1)
+    watchers.watch(summoner, 2)
+
+    assert watchers.unwatch(summoner.id, 1)
+    assert summoner.id in watchers.watched
+    assert not watchers.unwatch(summoner.id, 1)
+    assert watchers.unwatch(summoner.id, 2)
+    assert summoner.id not in watchers.watched
+
+
+def test_subscriptions_are_restored_from_state():
+    """
+    Test subscriptions saved by one watchlist are restored by the next, without the unwatched ones.
+    """
+    async def notify(watched, event, match_info):
+        pass
+
+    state = ReportState(":memory:")
+    watchers = Watchlist(notify, state=state)
+    watchers.watch(summoner, 1)
+    watchers.watch(summoner, 2)
+    watchers.unwatch(summoner.id, 1)
+
+    restarted = Watchlist(notify, state=state)
+
+    assert restarted.restore() == 1
+    assert restarted.watched[summoner.id].summoner == summoner
+    assert restarted.watched[summoner.id].channel_ids == {2}
+    state.close()
+
+
+def test_idle_summoners_are_stretched_to_fit_the_budget():
+    """
+    Test idle summoners on a platform over its budget are polled less often, while a summoner
+    in game keeps their interval.
+    """
+    async def notify(watched, event, match_info):
+        pass
+
+    async def mock_get_active_game_info(summoner_id, platform=None, fresh=False):
+        return {"gameId": 1, "gameStartTime": 0} if summoner_id == "playing" else None
+
+    async def run():
+        watchers = Watchlist(notify, polls_per_second=1)
+        everyone = [watchers.watch(Summoner(str(i), str(i), str(i)), 1) for i in range(240)]
+        everyone.append(watchers.watch(Summoner("playing", "playing", "playing"), 1))
+        for watched in everyone:
+            await watchers.poll(watched)
+        return watchers, everyone
+
+    with patch("riot_requests_async.get_active_game_info", mock_get_active_game_info), \
+            patch("random.uniform", return_value=1), patch("time.time", return_value=1000.0):
+        watchers, everyone = asyncio.run(run())
+
+    # 240 idle summoners ask for 2 polls per second and share what the game in progress leaves
+    stretch = 240 / watchlist.idle_interval / (1 - 1 / watchlist.in_game_slow_interval)
+    assert watchers.idle_stretch(summoner.platform) == pytest.approx(stretch)
+    assert everyone[-1].next_poll == 1000 + watchlist.in_game_slow_interval
+    # Polled before the game was seen, when the idle summoners alone were twice over budget
+    assert everyone[0].next_poll < everyone[-2].next_poll == pytest.approx(1000 + watchlist.idle_interval * 2)
+
+    watchers.unwatch("playing", 1)
+    assert watchers.idle_stretch(summoner.platform) == pytest.approx(2)
+
+
+def test_run_dispatches_due_polls():
+    """
+    Test run() polls a newly watched summoner and stops when asked.
+    """
+    polled = []
+
+    async def notify(watched, event, match_info):
+        pass
+
+    async def mock_get_active_game_info(summoner_id, platform=None, fresh=False):
+        polled.append(summoner_id)
+        watchers.stop()
+        return None
+
+    watchers = Watchlist(notify, polls_per_second=100)
+
+    async def run():
+        watchers.watch(summoner, 1)
+        await asyncio.wait_for(watchers.run(), 1)
+
+    with patch("riot_requests_async.get_active_game_info", mock_get_active_game_info):
+        asyncio.run(run())
+
+    assert polled == [summoner.id]
+    assert not watchers.running
+
+
+def test_throttled_region_does_not_stall_others():
+    """
+    Test summoners on another platform are polled while every poll on a throttled platform is stuck.
+    """
+    polled = []
+    polled_before_stop = []
+    throttled = asyncio.Event()
+
+    async def notify(watched, event, match_info):
+        pass
+
+    async def mock_get_active_game_info(summoner_id, platform=None, fresh=False):
+        polled.append(summoner_id)
+        if platform == "EUW1":
+            await throttled.wait()
+        elif len([summoner_id for summoner_id in polled if summoner_id.startswith("na")]) == 3:
+            polled_before_stop.extend(polled)
+            watchers.stop()
+            throttled.set()
+        return None
+
+    watchers = Watchlist(notify, polls_per_second=100, max_in_flight=1)
+
+    async def run():
+        for i in range(3):
+            watchers.watch(Summoner(f"EUW {i}", f"euw{i}", f"euw{i}", "EUW1"), 1)
+            watchers.watch(Summoner(f"NA {i}", f"na{i}", f"na{i}", "NA1"), 1)
+        await asyncio.wait_for(watchers.run(), 1)
+
+    with patch("riot_requests_async.get_active_game_info", mock_get_active_game_info):
+        asyncio.run(run())
+
+    assert sorted(summoner_id for summoner_id in polled_before_stop
+                  if summoner_id.startswith("na")) == ["na0", "na1", "na2"]
+    # The stuck poll holds the throttled platform's only slot
+    assert [summoner_id for summoner_id in polled_before_stop if summoner_id.startswith("euw")] == ["euw0"]
@@ -1,35 +1,90 @@
-from datetime import datetime, timedelta
+from aggregation import MatchArrays, Buckets, aggregate
+import metrics
+import numpy as np
+from datetime import datetime, timedelta, tzinfo
 from match import Match
+from match_table import MatchTable
+from report_state import day_format
 from summoner import Summoner
-from typing import List, Dict
+from typing import List, Dict, Optional, Union
 import time
-import matplotlib.pyplot as plt
-import matplotlib.figure as fig
+from functools import cached_property
+from io import BytesIO
+from typing import TYPE_CHECKING
+
+# matplotlib is imported by the functions that draw, so startup does not pay for it
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
+
+def render_png(figure: "Figure") -> bytes:
+    """
+    Render figure to PNG in memory with the Agg canvas and release it
+
+    Args:
+        figure: the figure to render
+
+    Return:
+        The PNG image
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    with metrics.report_seconds.time(stage="render"):
+        FigureCanvasAgg(figure)
+        buffer = BytesIO()
+        figure.savefig(buffer, format="png")
+        figure.clear()
+    return buffer.getvalue()
 
 
 class WeeklyReport():
     """
-    Weekly report for last week match played by summoner
+    Weekly report for last week match played by summoner.
+    matches_by_date and the charts are computed on first access and then kept.
+    Given the summoner's daily rollups, the day buckets and totals are read from them
+    instead of being summed over the matches.
 
     == Instance Attribute ==
     summoner: Summoner DTO (Data Transfer Object)
-    matches:  A list of matches played by summoner last week
+    matches:  The matches played by summoner last week, a list or a MatchTable
     number_of_matches: the total number of matches played by summoner last week
-    graph: A graph of the number of matches played by summoner last week
+    wins: the number of those matches summoner won, None without rollups
+    matches_by_date: matches played by summoner last week grouped by day
+    period: the days the report covers, written in the chart titles
+    games_played_graph: PNG of the number of matches played by summoner last week
+    total_time_played_graph: PNG of the total time played by summoner last week
+    stale: True if Riot could not be reached and the report was built from saved matches only
     """
-    matches: List[Match]
+    # Names accepted by chart()
+    CHARTS = ("games_played", "total_time_played")
+
+    # Bucket label format by bucket size
+    LABEL_FORMATS = {"hour": "%m-%d\n%H:00",
+                     "day": "%m-%d\n%a", "week": "%m-%d"}
+
+    matches: Union[List[Match], MatchTable]
     number_of_matches: int
+    wins: Optional[int]
     start_date: datetime
     matches_by_date: Dict
-    graph: fig.Figure
+    games_played_graph: bytes
+    total_time_played_graph: bytes
+    stale: bool
 
-    def __init__(self, summoner: Summoner, matches: List[Match], start_date: time.time) -> None:
+    def __init__(self, summoner: Summoner, matches: Union[List[Match], MatchTable], start_date: time.time,
+                 end_date: time.time = None, bucket: str = "day", tz: Optional[tzinfo] = None,
+                 rollups: Optional[Dict[str, Dict[str, int]]] = None) -> None:
         """
         Initialize a WeeklyReport object
 
         Args:
             summoner: Summoner DTO (Data Transfer Object)
-            matches: A list of matches played by summoner last week
+            matches: The matches played by summoner last week, newest first, a list or a MatchTable
+            start_date: start of the report in epoch seconds
+            end_date: end of the report in epoch seconds, a week after start_date by default
+            bucket: bucket size of the charts, one of aggregation.BUCKETS
+            tz: timezone of the buckets, REPORT_TIMEZONE or local time by default
+            rollups: {"games", "seconds", "wins"} by day from report_state, None to sum the matches
         Return:
             None
         """
@@ -37,10 +92,121 @@ class WeeklyReport():
         # reverse the list so that the most recent match is at the end
         self.matches = matches[::-1]
         self.start_date = datetime.fromtimestamp(start_date)
+        self.end_date = datetime.fromtimestamp(
+            end_date if end_date is not None else start_date + 7 * 24 * 60 * 60)
+        self.bucket = bucket
+        self.tz = tz
+        self.rollups = rollups
         self.number_of_matches = self.__get_total_matches_played()
-        self.matches_by_date = self.__get_matches_by_date()
-        self.games_played_graph = self.__get_games_played_graph()
-        self.total_time_played_graph = self.__get_total_time_played_graph()
+        self.wins = None if rollups is None else sum(day["wins"] for day in rollups.values())
+        self.stale = False
+
+    @cached_property
+    def buckets(self) -> Buckets:
+        """
+        Return the number of matches and time played per bucket, computed once
+
+        Args:
+            None
+
+        Return:
+            The aggregated buckets
+        """
+        with metrics.report_seconds.time(stage="aggregate"):
+            # A MatchTable already holds its start times and durations as arrays
+            arrays = self.matches if isinstance(
+                self.matches, MatchArrays) else MatchArrays.from_matches(self.matches)
+            buckets = aggregate(arrays, self.start_date.timestamp(),
+                                self.end_date.timestamp(), self.bucket, self.tz)
+            if self.rollups is not None and self.bucket == "day":
+                days = [self.rollups.get(day, {}) for day in buckets.labels(day_format)]
+                buckets.counts = np.array([day.get("games", 0) for day in days], dtype=np.int64)
+                buckets.total_seconds = np.array([day.get("seconds", 0) for day in days], dtype=np.int64)
+            return buckets
+
+    @cached_property
+    def labels(self) -> List[str]:
+        """
+        Return the label of every bucket, computed once
+
+        Args:
+            None
+
+        Return:
+            A list of bucket labels
+        """
+        return self.buckets.labels(self.LABEL_FORMATS[self.bucket])
+
+    @cached_property
+    def period(self) -> str:
+        """
+        Return the days the report covers, as written in the chart titles
+
+        Args:
+            None
+
+        Return:
+            "from MM/DD/YYYY to MM/DD/YYYY", the last day being the one holding the report's last second
+        """
+        last_day = self.end_date - timedelta(seconds=1)
+        return f"from {self.start_date:%m/%d/%Y} to {last_day:%m/%d/%Y}"
+
+    @cached_property
+    def matches_by_date(self) -> Dict:
+        """
+        Return matches played by summoner last week grouped by day, computed once
+
+        Args:
+            None
+
+        Return:
+            A dictionary of matches played by summoner last week
+        """
+        return self.__get_matches_by_date()
+
+    @cached_property
+    def games_played_graph(self) -> bytes:
+        """
+        Return the PNG of the number of matches played by summoner last week, rendered once
+
+        Args:
+            None
+
+        Return:
+            The PNG image
+        """
+        return render_png(self.__get_games_played_graph())
+
+    @cached_property
+    def total_time_played_graph(self) -> bytes:
+        """
+        Return the PNG of the total time played by summoner last week, rendered once
+
+        Args:
+            None
+
+        Return:
+            The PNG image
+        """
+        return render_png(self.__get_total_time_played_graph())
+
+    def chart(self, name: str) -> bytes:
+        """
+        Return the PNG of the chart called name, rendering it on first request
+
+        Args:
+            name: one of WeeklyReport.CHARTS
+
+        Return:
+            The PNG image
+
+        Raises:
+            ValueError: if name is not one of WeeklyReport.CHARTS
+        """
+        if name not in self.CHARTS:
+            raise ValueError(
+                f"Unknown chart '{name}', expected one of {', '.join(self.CHARTS)}")
+        return getattr(self, f"{name}_graph")
 
     def __get_total_matches_played(self) -> int:
         """
@@ -52,6 +218,8 @@ class WeeklyReport():
         Return:
             The total number of matches played by summoner last week
         """
+        if self.rollups is not None:
+            return sum(day["games"] for day in self.rollups.values())
         return len(self.matches)
 
     def __get_matches_by_date(self) -> Dict:
@@ -65,78 +233,70 @@ class WeeklyReport():
             A dictionary of matches played by summoner last week
         """
 
-        matches_by_date = {}
-        start_date = self.start_date
-
-        for i in range(8):
-            key = start_date.strftime("%m-%d\n%a")
-            print(f"key: {key}")
-            matches_by_date[key] = []
-            start_date += timedelta(days=1)
+        labels = self.labels
+        matches_by_date = {label: [] for label in labels}
 
-        for match in self.matches:
-            match_date = match.start_time.strftime("%m-%d\n%a")
-
-            # if match_date not in matches_by_date:
-            #     matches_by_date[match_date] = []
-            if match_date in matches_by_date:
-                matches_by_date[match_date].append(match)
+        for match, index in zip(self.matches, self.buckets.indices):
+            if index >= 0:
+                matches_by_date[labels[index]].append(match)
 
         return matches_by_date
 
-    def __get_games_played_graph(self) -> fig.Figure:
+    def __get_games_played_graph(self) -> "Figure":
         """
-        Return a graph of the number of matches played by summoner last week
+        Return a graph of the number of matches played by summoner over the report's period
 
         Args:
             None
 
         Return:
-            A graph of the number of matches played by summoner last week
+            A graph of the number of matches played by summoner over the report's period
         """
-        fig = plt.figure()
+        from matplotlib.figure import Figure
 
-        x = list(self.matches_by_date.keys())
-        y = [len(matches) for matches in self.matches_by_date.values()]
+        fig = Figure()
+        ax = fig.subplots()
 
-        barplot = plt.bar(x, y)
-        plt.bar_label(barplot, labels=y, label_type='edge')
-        # plt.bar_label(barplot, labels=y, label_type='center')
+        x = self.labels
+        y = self.buckets.counts.tolist()
 
-        plt.title(f"Number of Games Played by {self.summoner.name} Last Week")
+        barplot = ax.bar(x, y)
+        ax.bar_label(barplot, labels=y, label_type='edge')
 
-        # plt.xlabel("Date")
+        ax.set_title(
+            f"Number of Games Played by {self.summoner.name}\n{self.period}")
 
-        plt.ylabel("Number of Game Played")
+        ax.set_ylabel("Number of Game Played")
 
         return fig
 
-    def __get_total_time_played_graph(self) -> fig.Figure:
+    def __get_total_time_played_graph(self) -> "Figure":
         """
-        Return a graph of the total time played by summoner last week
+        Return a graph of the total time played by summoner over the report's period
 
         Args:
             None
 
         Return: 
-            A graph of the total time played by summoner last week
+            A graph of the total time played by summoner over the report's period
         """
-        fig = plt.figure()
+        from matplotlib.figure import Figure
+
+        fig = Figure()
+        ax = fig.subplots()
 
-        x = list(self.matches_by_date.keys())
-        # y is the duration of match played on that day in minutes, cannot use sum() because it is a timedelta object
-        y = [sum([match.duration.total_seconds() for match in matches]
-                 ) / 60 for matches in self.matches_by_date.values()]
+        x = self.labels
+        # y is the duration of match played in each bucket in minutes
+        y = (self.buckets.total_seconds / 60).tolist()
 
         y_labels = [f"{int(time / 60)}h {int(time % 60)}m" for time in y]
 
-        barplot = plt.bar(x, y)
-        plt.bar_label(barplot, labels=y_labels, label_type='edge')
-        # plt.bar_label(barplot, labels=y, label_type='center')
+        barplot = ax.bar(x, y)
+        ax.bar_label(barplot, labels=y_labels, label_type='edge')
 
-        plt.title(f"Total Time Played by {self.summoner.name} Last Week")
+        ax.set_title(f"Total Time Played by {self.summoner.name}\n{self.period}")
 
-        plt.ylabel("Total Time Played (minutes)")
+        ax.set_ylabel("Total Time Played (minutes)")
 
         return fig
 
@@ -0,0 +1,69 @@
+import json
+import pytest
+from datetime import datetime
+from riot_requests import parse_past_match
+from summoner import Summoner
+from weekly_report import WeeklyReport
+
+summoner = Summoner("Kid Orpheus", "ii9IPVp8k7MZ33wazChECinTlHDRzgkMMF5VCY-sFRjcnOg",
+                    "pfB-gQaB5s62NVK_YTWT7w6Y1NKIjpdzB38-8rFS2cssK-P6i5lFqqT2iVZHZ_rKmGceVc72TTU9Gw")
+
+
+@pytest.fixture
+def past_match():
+    with open("test/mock_get_matches_by_match_id.json") as f:
+        return parse_past_match(json.load(f))
+
+
+def test_charts_are_rendered_in_memory(past_match, tmp_path, monkeypatch):
+    """
+    Test both charts are PNG bytes and nothing is written to the working directory.
+    """
+    monkeypatch.chdir(tmp_path)
+    report = WeeklyReport(summoner, [past_match],
+                          past_match.start_time.timestamp() - 60 * 60)
+
+    assert report.games_played_graph.startswith(b"\x89PNG")
+    assert report.total_time_played_graph.startswith(b"\x89PNG")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_charts_are_lazy(past_match):
+    """
+    Test no chart is rendered until it is requested, and each is rendered once.
+    """
+    report = WeeklyReport(summoner, [past_match],
+                          past_match.start_time.timestamp() - 60 * 60)
+
+    assert report.number_of_matches == 1
+    assert "games_played_graph" not in report.__dict__
+    assert "matches_by_date" not in report.__dict__
+
+    png = report.chart("games_played")
+    assert report.chart("games_played") is png
+    assert "total_time_played_graph" not in report.__dict__
+
+    with pytest.raises(ValueError):
+        report.chart("graph")
+
+
+def test_matches_by_date_uses_eight_day_buckets(past_match):
+    """
+    Test a weekly report keeps the eight day buckets of the original report.
+    """
+    report = WeeklyReport(summoner, [past_match],
+                          past_match.start_time.timestamp() - 60 * 60)
+
+    assert len(report.matches_by_date) == 8
+    assert sum(len(matches) for matches in report.matches_by_date.values()) == 1
+    assert report.buckets.total_seconds.sum() == past_match.duration.total_seconds()
+
+
+def test_period_is_derived_from_the_dates(past_match):
+    """
+    Test the chart titles name the days the report covers instead of "Last Week".
+    """
+    start = datetime(2023, 4, 1).timestamp()
+    report = WeeklyReport(summoner, [past_match], start, start + 30 * 24 * 60 * 60)
+
+    assert report.period == "from 04/01/2023 to 04/30/2023"
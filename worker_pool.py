@@ -0,0 +1,164 @@
+import asyncio
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable
+
+# Worker threads for blocking work and commands run at once per guild
+worker_pool_size = int(os.getenv('WORKER_POOL_SIZE', '4'))
+guild_concurrency = int(os.getenv('GUILD_CONCURRENCY', '2'))
+
+
+class WorkerPool():
+    """
+    Runs blocking work (report building, chart rendering) off the event loop
+    in a bounded thread pool, and limits how many commands each guild runs at once.
+
+    === Instance Attributes ===
+    max_workers: Number of worker threads
+    per_guild_limit: Number of commands a guild may run at once
+    queued: Number of jobs submitted but not started yet
+    running: Number of jobs currently running
+    """
+    max_workers: int
+    per_guild_limit: int
+    queued: int
+    running: int
+
+    def __init__(self, max_workers: int = worker_pool_size, per_guild_limit: int = guild_concurrency) -> None:
+        """
+        Initialize a WorkerPool object. Threads are started on first use.
+
+        Args:
+            max_workers: Number of worker threads
+            per_guild_limit: Number of commands a guild may run at once
+
+        Return:
+            None
+        """
+        self.max_workers = max_workers
+        self.per_guild_limit = per_guild_limit
+        self.queued = 0
+        self.running = 0
+        self._executor = None
+        # (event loop, guild id) -> semaphore, dropped once no command holds or waits on it
+        self._guild_semaphores = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Return the number of jobs waiting for a worker thread
+
+        Args:
+            None
+
+        Return:
+            The number of jobs waiting for a worker thread
+        """
+        return self.queued
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """
+        Return the thread pool, creating it on first use
+
+        Args:
+            None
+
+        Return:
+            The thread pool
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="worker")
+        return self._executor
+
+    def _track(self, func: Callable, *args) -> Any:
+        """
+        Run func(*args) on a worker thread while keeping queued and running up to date
+
+        Args:
+            func: blocking function
+            args: arguments of func
+
+        Return:
+            The value returned by func
+        """
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    async def run(self, func: Callable, *args) -> Any:
+        """
+        Run the blocking func(*args) on a worker thread and wait for it without blocking the event loop
+
+        Args:
+            func: blocking function
+            args: arguments of func
+
+        Return:
+            The value returned by func
+        """
+        with self._lock:
+            self.queued += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), self._track, func, *args)
+
+    def guild_limit(self, guild_id: Hashable) -> asyncio.Semaphore:
+        """
+        Return the semaphore limiting the commands guild_id runs at once on the running event loop.
+        Use it as "async with pool.guild_limit(interaction.guild_id):".
+        A guild's semaphore is forgotten once it is idle, so guilds that stopped sending commands
+        do not pile up, and an asyncio semaphore is never shared between event loops.
+
+        Args:
+            guild_id: Discord guild id, None for direct messages
+
+        Return:
+            The semaphore of the guild
+        """
+        key = (asyncio.get_running_loop(), guild_id)
+        with self._lock:
+            semaphore = self._guild_semaphores.get(key)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.per_guild_limit)
+                self._guild_semaphores[key] = semaphore
+        return semaphore
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the pool's queue depth and number of running jobs
+
+        Args:
+            None
+
+        Return:
+            A dictionary of the pool's gauges
+        """
+        with self._lock:
+            return {"queue_depth": self.queued, "running": self.running,
+                    "max_workers": self.max_workers}
+
+    def shutdown(self) -> None:
+        """
+        Stop the worker threads once their jobs are done
+
+        Args:
+            None
+
+        Return:
+            None
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+# Shared pool used by responses and discord_bot
+pool = WorkerPool()
@@ -0,0 +1,94 @@
+import asyncio
+import gc
+import threading
+import time
+from worker_pool import WorkerPool
+
+
+def test_run_keeps_event_loop_responsive():
+    """
+    Test run() executes blocking work on a worker thread while the event loop keeps running.
+    """
+    pool = WorkerPool(max_workers=2)
+    ticks = []
+
+    async def ticker():
+        for i in range(5):
+            ticks.append(i)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        result, _ = await asyncio.gather(pool.run(lambda: time.sleep(0.1) or threading.current_thread().name), ticker())
+        return result
+
+    thread_name = asyncio.run(run())
+    pool.shutdown()
+
+    assert thread_name.startswith("worker")
+    assert ticks == [0, 1, 2, 3, 4]
+
+
+def test_queue_depth_counts_waiting_jobs():
+    """
+    Test queue_depth counts jobs waiting for a busy worker thread.
+    """
+    pool = WorkerPool(max_workers=1)
+    release = threading.Event()
+    depths = []
+
+    async def run():
+        jobs = [asyncio.ensure_future(pool.run(release.wait)) for i in range(3)]
+        await asyncio.sleep(0.05)
+        depths.append(pool.queue_depth)
+        release.set()
+        await asyncio.gather(*jobs)
+        depths.append(pool.queue_depth)
+
+    asyncio.run(run())
+    pool.shutdown()
+
+    assert depths == [2, 0]
+
+
+def test_guild_limit():
+    """
+    Test a guild never runs more commands at once than per_guild_limit, while other guilds are not held back.
+    """
+    pool = WorkerPool(per_guild_limit=2)
+    active = {1: 0, 2: 0}
+    peak = {1: 0, 2: 0}
+
+    async def command(guild_id):
+        async with pool.guild_limit(guild_id):
+            active[guild_id] += 1
+            peak[guild_id] = max(peak[guild_id], active[guild_id])
+            await asyncio.sleep(0.01)
+            active[guild_id] -= 1
+
+    async def run():
+        await asyncio.gather(*(command(1) for i in range(6)), command(2))
+
+    asyncio.run(run())
+
+    assert peak == {1: 2, 2: 1}
+
+
+def test_guild_limit_is_dropped_when_idle_and_not_shared_between_loops():
+    """
+    Test idle guild semaphores are forgotten, and a guild can be limited again from a new event loop.
+    """
+    pool = WorkerPool(per_guild_limit=1)
+
+    async def command():
+        async with pool.guild_limit(1):
+            await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(command(), command())
+
+    asyncio.run(run())
+    gc.collect()
+    assert len(pool._guild_semaphores) == 0
+
+    # Semaphores bind to the loop they first wait on, a second loop needs its own
+    asyncio.run(run())